@@ -1,17 +1,140 @@
 from fastapi import APIRouter, HTTPException, Query, File, UploadFile, Request
-from app.services.excel_service import excel_service
-from app.services.openai_service import openai_service
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.services.excel_service import excel_service, normalize_case_number
+from app.services.openai_service import openai_service, DEFAULT_REPORT_CONCURRENCY
+from app.services.chunking import resolve_chunk_params
+from app.services.rag_collections import CollectionNotFound, validate_collection_name
+from app.services.reranking import DEFAULT_RERANK
+from app.services.grounded_report import agenerate_grounded_report, DEFAULT_QUERY_TOP_K, DEFAULT_MAX_EXCERPTS
+from app.core.profiling import PROFILES, SLOW_REQUESTS, PROFILE_FORMATS, ADMIN_KEY_HEADER, is_admin_key
 from app.models.schemas import (
-    FallnummerResponse, ExcelInfoResponse, ErrorResponse,
-    CombinedReportRequest, CombinedReportResponse,
-    RAGQueryRequest, RAGQueryResponse, RAGStatusResponse
+    FallnummerResponse, ExcelInfoResponse, ExcelReloadResponse, CaseListResponse, ErrorResponse,
+    CombinedReportRequest, CombinedReportResponse, CombinedReportBatchRequest,
+    GroundedReportRequest, GroundedReportResponse,
+    FallnummerBatchRequest, FallnummerBatchResponse,
+    RAGQueryRequest, RAGQueryResponse, RAGStatusResponse, IndexJobResponse, CollectionResponse
 )
-from typing import Optional
-from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from datetime import date, datetime
+import json
 import os
 
 router = APIRouter()
 
+# Page sizes for case listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Cases per batch request
+MAX_BATCH_SIZE = 200
+MAX_REPORT_CONCURRENCY = 64
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx-style proxies from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+def _ndjson_line(data: dict) -> str:
+    """Format one newline-delimited JSON record"""
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+def _rank_chunks(relevant_chunks: List[dict]) -> List[dict]:
+    """Add rank and percentage to chunks returned by RAGSystem"""
+    return [
+        {
+            "rank": idx + 1,
+            "text": chunk["text"],
+            "similarity": chunk["similarity"],
+            "similarity_percentage": round(chunk["similarity"] * 100, 2),
+            "pages": chunk.get("pages"),
+            "source": chunk.get("source")
+        }
+        for idx, chunk in enumerate(relevant_chunks)
+    ]
+
+
+def _peek_service(req: Request, name: str):
+    """A service from the app's container if it has been started, else None"""
+    container = getattr(req.app.state, 'container', None)
+    return container.peek(name) if container is not None else None
+
+
+def _get_rag_system(req: Request):
+    """Return the RAG system from the service container or fail with 503"""
+    rag_system = _peek_service(req, 'rag_system')
+    if rag_system is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG system not initialized"
+        )
+    return rag_system
+
+
+def _get_queryable_rag_system(req: Request, collections: Optional[List[str]] = None):
+    """Return the RAG system from the service container or raise if it cannot answer queries"""
+    rag_system = _peek_service(req, 'rag_system')
+    
+    if rag_system is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG system not initialized. Please ensure the S3 Guideline PDF has been indexed."
+        )
+    
+    if collections:
+        for name in collections:
+            if not rag_system.collections.exists(name):
+                raise HTTPException(status_code=404, detail=f"No collection found: {name}")
+        return rag_system
+    
+    if not rag_system.has_embeddings():
+        raise HTTPException(
+            status_code=400,
+            detail="No embeddings loaded. Please index a PDF first using /api/v1/indexPDF"
+        )
+    return rag_system
+
+
+def _get_index_jobs(req: Request):
+    """Return the background indexing job manager or fail with 503"""
+    index_jobs = _peek_service(req, 'index_jobs') if req else None
+    if index_jobs is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG system not initialized"
+        )
+    return index_jobs
+
+
+def _fallnummer_response(fallnummer: str) -> Response:
+    """
+    FallnummerResponse body built around the record's pre-serialized JSON,
+    skipping per-request validation and encoding of the record.
+    """
+    data = excel_service.get_record_json(fallnummer)
+    if data is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No data found for Fallnummer: {fallnummer}"
+        )
+    body = b'{"fallnummer":%s,"data":%s,"message":"Data retrieved successfully"}' % (
+        json.dumps(fallnummer, ensure_ascii=False).encode("utf-8"), data
+    )
+    return Response(content=body, media_type="application/json")
+
 
 @router.get("/fallnummer/{fallnummer}", response_model=FallnummerResponse)
 async def get_fallnummer_data(fallnummer: str):
@@ -19,18 +142,47 @@ async def get_fallnummer_data(fallnummer: str):
     Get all data for a specific Fallnummer from the Excel file
     """
     try:
-        data = excel_service.get_data_by_fallnummer(fallnummer)
-        if data is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No data found for Fallnummer: {fallnummer}"
-            )
+        return _fallnummer_response(fallnummer)
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error retrieving data: {str(e)}"
+        )
+
+
+@router.post("/fallnummer/batch", response_model=FallnummerBatchResponse)
+async def get_fallnummer_batch(request: FallnummerBatchRequest):
+    """
+    Get the data of many Fallnummers in one request (e.g. a whole board session).
+    
+    Returns:
+    - results: One entry per found Fallnummer, in request order
+    - not_found: Fallnummers without data
+    """
+    if len(request.fallnummers) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_SIZE} Fallnummers per request"
+        )
 
-        return FallnummerResponse(
-            fallnummer=fallnummer,
-            data=data,
-            message="Data retrieved successfully"
+    try:
+        results = []
+        not_found = []
+        for fallnummer, data in excel_service.get_many_json(request.fallnummers):
+            if data is None:
+                not_found.append(fallnummer)
+            else:
+                results.append(b'{"fallnummer":%s,"data":%s,"message":"Data retrieved successfully"}' % (
+                    json.dumps(fallnummer, ensure_ascii=False).encode("utf-8"), data
+                ))
+        # Assembled from the pre-serialized records, see _fallnummer_response
+        body = b'{"results":[%s],"not_found":%s,"message":"Data retrieved successfully"}' % (
+            b",".join(results), json.dumps(not_found, ensure_ascii=False).encode("utf-8")
         )
+        return Response(content=body, media_type="application/json")
 
     except Exception as e:
         raise HTTPException(
@@ -45,20 +197,10 @@ async def get_fallnummer_data_query(fallnummer: str = Query(..., description="Th
     Get all data for a specific Fallnummer using query parameter
     """
     try:
-        data = excel_service.get_data_by_fallnummer(fallnummer)
-
-        if data is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No data found for Fallnummer: {fallnummer}"
-            )
-
-        return FallnummerResponse(
-            fallnummer=fallnummer,
-            data=data,
-            message="Data retrieved successfully"
-        )
+        return _fallnummer_response(fallnummer)
 
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -72,14 +214,8 @@ async def get_excel_info():
     Get information about the Excel file (columns, available Fallnummers, etc.)
     """
     try:
-        columns = excel_service.get_columns()
-        fallnummers = excel_service.get_all_fallnummers()
-
-        return ExcelInfoResponse(
-            total_records=len(fallnummers),
-            columns=columns,
-            available_fallnummers=fallnummers[:10]  # Limit to first 10 for display
-        )
+        # First 10 Fallnummers only, for display
+        return ExcelInfoResponse(**excel_service.get_info(sample=10), last_reload=excel_service.last_reload)
 
     except Exception as e:
         raise HTTPException(
@@ -89,17 +225,34 @@ async def get_excel_info():
 
 
 @router.get("/excel/fallnummers")
-async def get_all_fallnummers():
+async def get_all_fallnummers(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for the full list")
+):
     """
     Get all available Fallnummers
+    
+    Without limit the full list is returned. With limit the response is one
+    page plus next_cursor for the following page.
     """
     try:
-        fallnummers = excel_service.get_all_fallnummers()
+        if limit is None and cursor is None:
+            fallnummers = excel_service.get_all_fallnummers()
+            return {
+                "fallnummers": fallnummers,
+                "total_count": len(fallnummers)
+            }
+
+        page = excel_service.list_cases(cursor=cursor, limit=limit or DEFAULT_PAGE_SIZE)
+        case_field = page["fields"][0]
         return {
-            "fallnummers": fallnummers,
-            "total_count": len(fallnummers)
+            "fallnummers": [normalize_case_number(item[case_field]) for item in page["items"]],
+            "total_count": page["total"],
+            "next_cursor": page["next_cursor"]
         }
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -107,6 +260,73 @@ async def get_all_fallnummers():
         )
 
 
+@router.get("/excel/cases", response_model=CaseListResponse)
+async def list_cases(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, '*' for all (default: case number)"),
+    date_from: Optional[date] = Query(None, description="Earliest tumor board Date (inclusive)"),
+    date_to: Optional[date] = Query(None, description="Latest tumor board Date (inclusive)"),
+    curative: Optional[bool] = None,
+    palliative: Optional[bool] = None,
+    diagnosis: Optional[str] = Query(None, description="Case-insensitive substring of Tumor diagnosis"),
+    uicc: Optional[str] = Query(None, description="UICC stage (clinical or pathological), e.g. IA2")
+):
+    """
+    List cases page by page with server-side filters and column projection.
+    
+    Filters run against indexes built when the workbook is loaded. Pass
+    next_cursor from the response as cursor to get the following page.
+    
+    Returns:
+    - items: Cases in workbook order, each with the requested fields
+    - next_cursor: Cursor for the next page, null on the last page
+    - total: Number of cases matching the filters
+    """
+    try:
+        projection = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+        page = excel_service.list_cases(
+            cursor=cursor, limit=limit, fields=projection,
+            date_from=date_from, date_to=date_to, curative=curative, palliative=palliative,
+            diagnosis=diagnosis, uicc=uicc
+        )
+        return CaseListResponse(**page)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error listing cases: {str(e)}"
+        )
+
+
+@router.post("/excel/reload", response_model=ExcelReloadResponse)
+async def reload_excel():
+    """
+    Re-read the Tumorboard workbook without restarting the API.
+    
+    The new data is parsed and indexed in a worker thread and swapped in once
+    complete; requests in flight keep using the previous data. The workbook
+    is also reloaded automatically when it changes on disk
+    (EXCEL_RELOAD_INTERVAL).
+    
+    Returns:
+    - rows: Number of rows now loaded
+    - duration_seconds: Time taken to parse and index the workbook
+    - source: "xlsx" (parsed) or "snapshot" (columnar cache)
+    """
+    try:
+        stats = await run_in_threadpool(excel_service.reload)
+        return ExcelReloadResponse(**stats)
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reloading Excel file: {str(e)}"
+        )
+
+
 @router.post("/getCombinedReport", response_model=CombinedReportResponse)
 async def get_combined_report(request: CombinedReportRequest):
     """
@@ -115,9 +335,12 @@ async def get_combined_report(request: CombinedReportRequest):
     Request body should contain:
     - fallnummer: The case number
     - data: Patient data dictionary with case information
+    - force_refresh: Regenerate even if a cached report exists (optional)
     
     Returns:
     - Clinical report summary generated by AI
+    - cache_hit / cache_age_seconds: Whether the report came from the report
+      cache, which is keyed on the fields the prompt uses
     """
     try:
         if not request.fallnummer or not request.data:
@@ -127,13 +350,17 @@ async def get_combined_report(request: CombinedReportRequest):
             )
         
         # Generate clinical report using OpenAI
-        clinical_report = openai_service.generate_clinical_report(request.data)
+        clinical_report, cache_age = await openai_service.aget_clinical_report(
+            request.data, force_refresh=request.force_refresh
+        )
         
         return CombinedReportResponse(
             fallnummer=request.fallnummer,
             clinical_report=clinical_report,
             timestamp=datetime.now().isoformat(),
-            message="Report generated successfully"
+            message="Report generated successfully",
+            cache_hit=cache_age is not None,
+            cache_age_seconds=None if cache_age is None else round(cache_age, 1)
         )
     
     except HTTPException as he:
@@ -145,6 +372,200 @@ async def get_combined_report(request: CombinedReportRequest):
         )
 
 
+@router.post("/getCombinedReport/stream")
+async def get_combined_report_stream(request: CombinedReportRequest):
+    """
+    Streaming variant of /getCombinedReport using Server-Sent Events.
+    
+    Accepts the same request body as /getCombinedReport. Events:
+    - start: {"fallnummer", "timestamp", "cache_hit", "cache_age_seconds"} sent immediately
+    - token: {"content": "..."} pieces of the report as they are generated
+      (a cached report is sent as a single token)
+    - done: end of the report
+    - error: {"detail": "..."} if generation fails mid-stream
+    """
+    if not request.fallnummer or not request.data:
+        raise HTTPException(
+            status_code=400,
+            detail="Both fallnummer and data are required"
+        )
+
+    cached = None if request.force_refresh else openai_service.lookup_report(request.data)
+
+    async def events():
+        yield _sse_event("start", {
+            "fallnummer": request.fallnummer,
+            "timestamp": datetime.now().isoformat(),
+            "cache_hit": cached is not None,
+            "cache_age_seconds": None if cached is None else round(cached[1], 1)
+        })
+        if cached is not None:
+            yield _sse_event("token", {"content": cached[0]})
+            yield _sse_event("done", {"message": "Report generated successfully"})
+            return
+        try:
+            async for content in openai_service.astream_clinical_report(request.data):
+                yield _sse_event("token", {"content": content})
+            yield _sse_event("done", {"message": "Report generated successfully"})
+        except Exception as e:
+            yield _sse_event("error", {"detail": str(e)})
+
+    return _sse_response(events())
+
+
+@router.post("/getCombinedReport/batch")
+async def get_combined_report_batch(request: CombinedReportBatchRequest):
+    """
+    Generate the clinical reports of many cases concurrently, streamed as
+    newline-delimited JSON (application/x-ndjson) in completion order.
+    
+    Request body:
+    - cases: Cases with their data, as for /getCombinedReport
+    - fallnummers: Cases whose data is looked up in the Excel file
+    - max_concurrency: Reports generated at once (default: REPORT_BATCH_CONCURRENCY)
+    - force_refresh: Regenerate all reports instead of serving cached ones
+    
+    One line per case as it finishes:
+    - {"type": "report", "index", "fallnummer", "clinical_report", "timestamp", "cache_hit", "cache_age_seconds"}
+    - {"type": "error", "index", "fallnummer", "detail"} (unknown Fallnummer or failed generation)
+    
+    followed by {"type": "done", "completed", "failed", "elapsed_seconds"}.
+    "index" is the position of the case in cases followed by fallnummers.
+    """
+    cases = [(case.fallnummer, case.data) for case in request.cases]
+    cases += [(fallnummer, data) for fallnummer, data in excel_service.get_many(request.fallnummers)]
+
+    if not cases:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide cases or fallnummers"
+        )
+    if len(cases) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_SIZE} cases per request"
+        )
+    max_concurrency = min(request.max_concurrency or DEFAULT_REPORT_CONCURRENCY, MAX_REPORT_CONCURRENCY)
+
+    async def lines():
+        start = datetime.now()
+        completed = 0
+        failed = 0
+
+        runnable = []
+        for index, (fallnummer, data) in enumerate(cases):
+            if data:
+                runnable.append((index, fallnummer, data))
+            else:
+                failed += 1
+                yield _ndjson_line({
+                    "type": "error", "index": index, "fallnummer": fallnummer,
+                    "detail": f"No data found for Fallnummer: {fallnummer}"
+                })
+
+        results = openai_service.agenerate_clinical_reports(
+            [(fallnummer, data) for _, fallnummer, data in runnable], max_concurrency, request.force_refresh
+        )
+        try:
+            async for position, fallnummer, report, cache_age, error in results:
+                index = runnable[position][0]
+                if error is None:
+                    completed += 1
+                    yield _ndjson_line({
+                        "type": "report", "index": index, "fallnummer": fallnummer,
+                        "clinical_report": report, "timestamp": datetime.now().isoformat(),
+                        "cache_hit": cache_age is not None,
+                        "cache_age_seconds": None if cache_age is None else round(cache_age, 1)
+                    })
+                else:
+                    failed += 1
+                    yield _ndjson_line({
+                        "type": "error", "index": index, "fallnummer": fallnummer,
+                        "detail": f"Error generating report: {str(error)}"
+                    })
+        finally:
+            # Client gone: cancel the completions still in flight
+            await results.aclose()
+
+        yield _ndjson_line({
+            "type": "done", "completed": completed, "failed": failed,
+            "elapsed_seconds": round((datetime.now() - start).total_seconds(), 3)
+        })
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        # Let proxies pass each line through as soon as it is written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/getCombinedReport/grounded", response_model=GroundedReportResponse)
+async def get_grounded_report(request: GroundedReportRequest, req: Request):
+    """
+    Generate a clinical report grounded in the indexed guidelines in one call.
+    
+    Retrieval queries are derived from the case (Tumor diagnosis and
+    staging, Histo Cyto, Question, therapy so far) and searched concurrently;
+    the retrieved chunks are deduplicated and sent with the case in a single
+    completion that cites them as [n].
+    
+    Request body:
+    - fallnummer: The case number
+    - data: Patient data (optional, looked up in the Excel file if omitted)
+    - top_k: Chunks retrieved per derived query (default: GROUNDED_REPORT_TOP_K)
+    - max_excerpts: Distinct excerpts sent to the model (default: GROUNDED_REPORT_MAX_EXCERPTS)
+    - context_tokens: Token budget for the excerpts (optional)
+    - retrieval_mode, collections, rerank: As for /queryRAG
+    
+    Returns:
+    - clinical_report: Report ending with guideline-based recommendations
+    - queries: The derived retrieval queries
+    - citations: The excerpts [id] with pages, source, the queries that found
+      them and whether the report cites them
+    - timings: Milliseconds per stage (derive_queries, embed, search, merge,
+      completion, total)
+    """
+    try:
+        data = request.data or excel_service.get_data_by_fallnummer(request.fallnummer)
+        if not data:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No data found for Fallnummer: {request.fallnummer}"
+            )
+        rag_system = _get_queryable_rag_system(req, request.collections)
+        
+        result = await agenerate_grounded_report(
+            rag_system, data,
+            top_k=request.top_k or DEFAULT_QUERY_TOP_K,
+            max_excerpts=request.max_excerpts or DEFAULT_MAX_EXCERPTS,
+            retrieval_mode=request.retrieval_mode,
+            collections=request.collections,
+            rerank=request.rerank,
+            context_tokens=request.context_tokens
+        )
+        
+        return GroundedReportResponse(
+            fallnummer=request.fallnummer,
+            clinical_report=result["report"],
+            queries=result["queries"],
+            citations=result["citations"],
+            timings=result["timings"],
+            timestamp=datetime.now().isoformat(),
+            message="Report generated successfully using the indexed guidelines"
+        )
+    
+    except HTTPException as he:
+        raise he
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating report: {str(e)}"
+        )
+
+
 # RAG (Retrieval-Augmented Generation) Endpoints
 
 @router.post("/queryRAG", response_model=RAGQueryResponse)
@@ -160,45 +581,51 @@ async def query_rag(request: RAGQueryRequest, req: Request):
     - model: LLM model to use (default: gpt-4o-mini)
     - temperature: Response creativity (default: 0.3)
     - top_k: Number of relevant chunks to retrieve (default: 3)
+    - nprobe: IVF clusters to probe (optional, IVF index only)
+    - ef_search: HNSW candidate list size, or rows the binary index rescores
+      (optional, HNSW and binary indexes only)
+    - force_refresh: Skip the semantic answer cache (optional)
+    - retrieval_mode: dense, lexical (BM25 only, no embeddings call) or hybrid
+      (reciprocal rank fusion of both); default RAG_RETRIEVAL_MODE
+    - collections: Names of collections to search together instead of the
+      main index (optional)
+    - rerank: mmr (fetch 4x top_k candidates and keep diverse ones, dropping
+      near-duplicate overlapping chunks) or none; default RAG_RERANK
+    - context_tokens: Fill this many tokens with chunks instead of taking
+      exactly top_k (optional, default RAG_CONTEXT_TOKENS)
     
     Returns:
     - answer: AI-generated answer based on guideline content
-    - relevant_chunks: Source chunks from the PDF used for context
+    - relevant_chunks: Source chunks from the PDF used for context, with the
+      document (and collection) they come from. In lexical mode similarity
+      is the BM25 score relative to the best chunk
+    - cache: Set when the answer of a similar earlier question was reused
+      (that question, its cosine similarity and the answer's age)
     """
     try:
-        rag_system = getattr(req.app.state, 'rag_system', None)
-        
-        if rag_system is None:
-            raise HTTPException(
-                status_code=503,
-                detail="RAG system not initialized. Please ensure the S3 Guideline PDF has been indexed."
-            )
-        
-        if not rag_system.embeddings:
-            raise HTTPException(
-                status_code=400,
-                detail="No embeddings loaded. Please index a PDF first using /api/v1/indexPDF"
-            )
+        rag_system = _get_queryable_rag_system(req, request.collections)
         
-        answer, relevant_chunks = rag_system.query(
+        answer, relevant_chunks, cache_info = await rag_system.aquery(
             request.question,
             model=request.model,
             temperature=request.temperature,
-            top_k=request.top_k
+            top_k=request.top_k,
+            nprobe=request.nprobe,
+            ef_search=request.ef_search,
+            force_refresh=request.force_refresh,
+            retrieval_mode=request.retrieval_mode,
+            collections=request.collections,
+            rerank=request.rerank,
+            context_tokens=request.context_tokens
         )
         
         return RAGQueryResponse(
             answer=answer,
-            relevant_chunks=[
-                {
-                    "rank": idx + 1,
-                    "text": chunk["text"],
-                    "similarity": chunk["similarity"],
-                    "similarity_percentage": round(chunk["similarity"] * 100, 2)
-                }
-                for idx, chunk in enumerate(relevant_chunks)
-            ],
-            message="Query answered successfully using S3 Guideline Breast Cancer"
+            relevant_chunks=_rank_chunks(relevant_chunks),
+            message="Query answered successfully using S3 Guideline Breast Cancer",
+            retrieval_mode=request.retrieval_mode or rag_system.retrieval_mode,
+            cache_hit=cache_info is not None,
+            cache=cache_info
         )
     
     except HTTPException as he:
@@ -210,38 +637,77 @@ async def query_rag(request: RAGQueryRequest, req: Request):
         )
 
 
-@router.post("/indexPDF")
+@router.post("/queryRAG/stream")
+async def query_rag_stream(request: RAGQueryRequest, req: Request):
+    """
+    Streaming variant of /queryRAG using Server-Sent Events.
+    
+    Accepts the same request body as /queryRAG. Events:
+    - chunks: the retrieved chunks with similarity scores (sent first), and
+      "cache" when a cached answer of a similar question follows
+    - token: {"content": "..."} pieces of the answer as they are generated
+    - done: end of the answer
+    - error: {"detail": "..."} if generation fails mid-stream
+    """
+    rag_system = _get_queryable_rag_system(req, request.collections)
+
+    async def events():
+        try:
+            async for event in rag_system.astream_query(
+                request.question,
+                model=request.model,
+                temperature=request.temperature,
+                top_k=request.top_k,
+                nprobe=request.nprobe,
+                ef_search=request.ef_search,
+                force_refresh=request.force_refresh,
+                retrieval_mode=request.retrieval_mode,
+                collections=request.collections,
+                rerank=request.rerank,
+                context_tokens=request.context_tokens
+            ):
+                if event["type"] == "chunks":
+                    yield _sse_event("chunks", {
+                        "relevant_chunks": _rank_chunks(event["chunks"]),
+                        "cache": event["cache"]
+                    })
+                else:
+                    yield _sse_event("token", {"content": event["content"]})
+            yield _sse_event("done", {"message": "Query answered successfully using S3 Guideline Breast Cancer"})
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Error querying RAG system: {str(e)}"})
+
+    return _sse_response(events())
+
+
+@router.post("/indexPDF", response_model=IndexJobResponse, status_code=202)
 async def index_pdf(file: UploadFile = File(...), 
-                   chunk_size: int = 1000, 
-                   overlap: int = 200,
+                   collection: Optional[str] = None,
+                   chunker: Optional[str] = None,
+                   chunk_size: Optional[int] = None, 
+                   overlap: Optional[int] = None,
                    req: Request = None):
     """
     Index a PDF file for RAG queries.
     
-    This endpoint uploads and processes a PDF file, extracting text, creating chunks,
-    and generating embeddings for semantic search.
+    This endpoint uploads a PDF file and queues it for indexing (text extraction,
+    chunking and embedding) on a background worker. Poll /indexJobs/{job_id} for
+    progress; the new index replaces the current one only when the job completes.
     
     Parameters:
     - file: PDF file to upload and index
-    - chunk_size: Size of text chunks in characters (default: 1000)
-    - overlap: Overlap between chunks in characters (default: 200)
+    - collection: Add the PDF to this collection (created if needed) instead
+      of replacing the main index; the collection's other documents are kept
+    - chunker: "structure" (headings and recommendation blocks, sizes in
+      tokens) or "chars" (fixed character windows); default RAG_CHUNKER
+    - chunk_size: Size of text chunks (default: 300 tokens / 1000 characters)
+    - overlap: Overlap between chunks (default: 50 tokens / 200 characters)
     
     Returns:
-    - message: Status message
-    - chunks_count: Number of chunks created from the PDF
+    - The queued job (job_id, status, progress counters)
     """
     try:
-        # Get RAG system from app state (passed via dependency injection below)
-        from fastapi import Depends
-        
-        # We need to get the request context from the endpoint caller
-        rag_system = getattr(req.app.state, 'rag_system', None) if req else None
-        
-        if rag_system is None:
-            raise HTTPException(
-                status_code=503,
-                detail="RAG system not initialized"
-            )
+        index_jobs = _get_index_jobs(req)
         
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(
@@ -249,25 +715,18 @@ async def index_pdf(file: UploadFile = File(...),
                 detail="Only PDF files are supported"
             )
         
-        # Save uploaded file temporarily
-        temp_path = f"temp_{file.filename}"
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
         try:
-            # Process PDF
-            rag_system.load_pdf(temp_path, chunk_size, overlap)
-            
-            return {
-                "message": "PDF indexed successfully",
-                "chunks_count": len(rag_system.chunks),
-                "embeddings_file": rag_system.embeddings_path
-            }
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            resolve_chunk_params(chunker, chunk_size, overlap)
+            if collection is not None:
+                validate_collection_name(collection)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        content = await file.read()
+        job = await run_in_threadpool(
+            index_jobs.submit, content, os.path.basename(file.filename), chunk_size, overlap, chunker, collection
+        )
+        return IndexJobResponse(**job.to_dict())
     
     except HTTPException as he:
         raise he
@@ -275,6 +734,45 @@ async def index_pdf(file: UploadFile = File(...),
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/indexJobs", response_model=List[IndexJobResponse])
+async def list_index_jobs(req: Request):
+    """
+    List PDF indexing jobs, newest first.
+    """
+    index_jobs = _get_index_jobs(req)
+    return [IndexJobResponse(**job.to_dict()) for job in index_jobs.list()]
+
+
+@router.get("/indexJobs/{job_id}", response_model=IndexJobResponse)
+async def get_index_job(job_id: str, req: Request):
+    """
+    Get the status of a PDF indexing job.
+    
+    Returns:
+    - status: queued, running, completed, failed or cancelled
+    - pages_extracted / pages_total: Text extraction progress
+    - chunks_embedded / chunks_total: Embedding progress
+    - progress: Overall completion between 0 and 1
+    - eta_seconds: Estimated time remaining while running
+    - result: chunks_count and embedding cache hits/misses once completed
+    """
+    job = _get_index_jobs(req).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No indexing job found: {job_id}")
+    return IndexJobResponse(**job.to_dict())
+
+
+@router.post("/indexJobs/{job_id}/cancel", response_model=IndexJobResponse)
+async def cancel_index_job(job_id: str, req: Request):
+    """
+    Cancel a queued or running PDF indexing job. The current index is kept.
+    """
+    job = _get_index_jobs(req).cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No indexing job found: {job_id}")
+    return IndexJobResponse(**job.to_dict())
+
+
 @router.get("/ragStatus", response_model=RAGStatusResponse)
 async def get_rag_status(req: Request):
     """
@@ -283,10 +781,20 @@ async def get_rag_status(req: Request):
     Returns:
     - indexed: Whether the system has loaded embeddings
     - chunks_count: Number of chunks currently loaded
-    - embeddings_file: Path to the embeddings file
+    - embeddings_file: Path to the embeddings index directory
+    - vector_index: Nearest-neighbour backend in use (flat, ivf, hnsw or binary)
+    - index_dtype: Storage of the vectors (float32, float16 or int8)
+    - dimensions: Embedding dimensions stored per chunk
+    - retrieval_mode: Default retrieval mode (dense, lexical or hybrid)
+    - rerank: Default post-retrieval reranking (mmr or none)
+    - embedding_cache: Embedding cache entries and lifetime hit/miss counts
+    - query_cache: Hit rates and estimated seconds saved by the query
+      embedding LRU and the semantic answer cache
+    - collections: Number of collections, those open in memory (least
+      recently used first) and load/eviction counts
     """
     try:
-        rag_system = getattr(req.app.state, 'rag_system', None)
+        rag_system = _peek_service(req, 'rag_system')
         
         if rag_system is None:
             raise HTTPException(
@@ -297,7 +805,15 @@ async def get_rag_status(req: Request):
         return RAGStatusResponse(
             indexed=len(rag_system.chunks) > 0,
             chunks_count=len(rag_system.chunks),
-            embeddings_file=rag_system.embeddings_path,
+            embeddings_file=rag_system.index_path,
+            vector_index=rag_system.vector_index.kind,
+            index_dtype=str(rag_system.embeddings.dtype) if rag_system.has_embeddings() else rag_system.index_dtype,
+            dimensions=rag_system.embeddings.shape[1] if rag_system.has_embeddings() else None,
+            retrieval_mode=rag_system.retrieval_mode,
+            rerank=DEFAULT_RERANK,
+            embedding_cache=rag_system.embedding_cache.stats() if rag_system.embedding_cache else None,
+            query_cache=rag_system.query_cache_stats(),
+            collections=rag_system.collections.stats(),
             message="RAG status retrieved successfully"
         )
     except HTTPException as he:
@@ -320,11 +836,13 @@ async def get_embeddings_info(req: Request):
       - embedding_dimension: Dimension of the embedding vector
       - embedding_sample: First 10 values of the embedding vector (for inspection)
       - embedding_vector: Complete embedding vector (full precision)
-    - embeddings_file: Path to the embeddings file
-    - embeddings_file_size_mb: Size of embeddings file in MB
+    - embeddings_file: Path to the embeddings index directory
+    - index_dtype: Storage precision of the memory-mapped vectors
+    - index_metadata: Embedding model, chunking parameters and source PDF hash
+    - embeddings_file_size_mb: Size of the index on disk in MB
     """
     try:
-        rag_system = getattr(req.app.state, 'rag_system', None)
+        rag_system = _peek_service(req, 'rag_system')
         
         if rag_system is None:
             raise HTTPException(
@@ -347,7 +865,7 @@ async def get_embeddings_info(req: Request):
         
         for idx in range(last_5_start, total_chunks):
             chunk_text = rag_system.chunks[idx]
-            embedding_vector = rag_system.embeddings[idx]
+            embedding_vector = rag_system.embeddings[idx].tolist()
             
             last_5_chunks_info.append({
                 "chunk_index": idx,
@@ -360,16 +878,16 @@ async def get_embeddings_info(req: Request):
                 "embedding_magnitude": sum(x**2 for x in embedding_vector) ** 0.5  # L2 norm
             })
         
-        # Get file size
-        embeddings_file_size_mb = 0
-        if os.path.exists(rag_system.embeddings_path):
-            embeddings_file_size_mb = os.path.getsize(rag_system.embeddings_path) / (1024 * 1024)
+        # Get index size on disk
+        embeddings_file_size_mb = rag_system.index_size_bytes() / (1024 * 1024)
         
         return {
             "total_chunks": total_chunks,
             "total_embeddings": total_embeddings,
             "embeddings_match": total_chunks == total_embeddings,
-            "embeddings_file": rag_system.embeddings_path,
+            "embeddings_file": rag_system.index_path,
+            "index_dtype": str(rag_system.embeddings.dtype),
+            "index_metadata": rag_system.index_metadata,
             "embeddings_file_size_mb": round(embeddings_file_size_mb, 2),
             "last_5_chunks": last_5_chunks_info,
             "message": f"Retrieved information about {total_chunks} total chunks and last 5 chunks with embeddings"
@@ -385,10 +903,11 @@ async def delete_embeddings(req: Request):
     """
     Delete stored embeddings and clear the RAG system.
     
-    This removes the embeddings file and resets the system.
+    This removes the embeddings index directory (and any legacy pickle) and resets the system.
+    Collections are not affected; delete them with DELETE /collections/{name}.
     """
     try:
-        rag_system = getattr(req.app.state, 'rag_system', None)
+        rag_system = _peek_service(req, 'rag_system')
         
         if rag_system is None:
             raise HTTPException(
@@ -396,14 +915,140 @@ async def delete_embeddings(req: Request):
                 detail="RAG system not initialized"
             )
         
-        if os.path.exists(rag_system.embeddings_path):
-            os.remove(rag_system.embeddings_path)
-        
-        rag_system.chunks = []
-        rag_system.embeddings = []
+        rag_system.delete_embeddings()
         
         return {"message": "Embeddings deleted successfully"}
     except HTTPException as he:
         raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/collections", response_model=List[CollectionResponse])
+async def list_collections(req: Request):
+    """
+    List RAG collections with their documents. Add documents with
+    /indexPDF?collection=<name>.
+    """
+    try:
+        rag_system = _get_rag_system(req)
+        collections = rag_system.collections
+        return [CollectionResponse(**collections.describe(name)) for name in collections.names()]
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/collections/{name}", response_model=CollectionResponse)
+async def get_collection(name: str, req: Request):
+    """
+    Get one collection: its documents, chunk count, size on disk and
+    whether it is currently open in memory.
+    """
+    try:
+        rag_system = _get_rag_system(req)
+        return CollectionResponse(**rag_system.collections.describe(name))
+    except (CollectionNotFound, ValueError):
+        raise HTTPException(status_code=404, detail=f"No collection found: {name}")
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/collections/{name}")
+async def delete_collection(name: str, req: Request):
+    """
+    Delete a collection and the index files of all its documents.
+    """
+    try:
+        rag_system = _get_rag_system(req)
+        await run_in_threadpool(rag_system.collections.delete, name)
+        return {"message": f"Collection {name} deleted successfully"}
+    except (CollectionNotFound, ValueError):
+        raise HTTPException(status_code=404, detail=f"No collection found: {name}")
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/collections/{name}/documents/{document_id}")
+async def delete_collection_document(name: str, document_id: str, req: Request):
+    """
+    Remove one document from a collection. The other documents are not
+    re-embedded or rewritten.
+    """
+    try:
+        rag_system = _get_rag_system(req)
+        document = await run_in_threadpool(rag_system.collections.remove_document, name, document_id)
+        return {
+            "message": f"Removed {document['source_name']} from collection {name}",
+            "document_id": document_id
+        }
+    except (CollectionNotFound, ValueError):
+        raise HTTPException(status_code=404, detail=f"No document {document_id} in collection {name}")
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _require_admin(req: Request) -> None:
+    """Refuse debug endpoints without a valid admin key (see PROFILING_ADMIN_KEY)"""
+    if not is_admin_key(req.headers.get(ADMIN_KEY_HEADER)):
+        raise HTTPException(status_code=403, detail=f"A valid {ADMIN_KEY_HEADER} header is required")
+
+
+@router.get("/debug/slowRequests")
+def get_slow_requests(req: Request):
+    """
+    The slowest recent requests, slowest first, each with the milliseconds
+    spent per stage (vector_search, embed_query, llm_call, excel_lookup, ...)
+    and the id of its profile if it was profiled. Requires X-Admin-Key.
+    """
+    _require_admin(req)
+    return {
+        "size": SLOW_REQUESTS.size,
+        "window_seconds": SLOW_REQUESTS.window,
+        "requests": SLOW_REQUESTS.entries()
+    }
+
+
+@router.get("/debug/profiles")
+def list_profiles(req: Request):
+    """
+    Profiles of recent requests sent with X-Profile or ?profile=, newest
+    first. Requires X-Admin-Key.
+    """
+    _require_admin(req)
+    return {"profiles": [profile.summary() for profile in PROFILES.list()]}
+
+
+@router.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: str, req: Request, format: Optional[str] = Query(
+        None, description=f"One of {', '.join(PROFILE_FORMATS)}; defaults to the format the request asked for")):
+    """
+    Download a profile as speedscope JSON (open it at https://www.speedscope.app)
+    or as collapsed stacks (flamegraph.pl, inferno). Requires X-Admin-Key.
+    """
+    _require_admin(req)
+    profile = PROFILES.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No profile found: {profile_id}")
+    profile_format = format or profile.default_format
+    if profile_format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(PROFILE_FORMATS)}")
+
+    if profile_format == "collapsed":
+        return Response(
+            profile.collapsed(),
+            media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.txt"'}
+        )
+    return Response(
+        json.dumps(profile.speedscope()),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.speedscope.json"'}
+    )
@@ -0,0 +1,96 @@
+import time
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ServiceContainer:
+    """
+    Application services, constructed lazily.
+
+    Each service is registered with a factory that runs on the first get(),
+    once even when several threads ask at the same time. Different services
+    are constructed concurrently, and a factory may get() the services it
+    depends on. A factory that raises is retried on the next get().
+
+    warm_up() constructs a set of services in parallel worker threads, so
+    slow ones (workbook parse, index load, SDK imports) overlap at startup
+    instead of running one after another.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # Construction time and last failure per service
+        self.seconds: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        """Return the service, constructing it on first use"""
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"No service registered as '{name}'")
+        with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+            start = time.perf_counter()
+            try:
+                instance = self._factories[name]()
+            except Exception as e:
+                self.errors[name] = str(e)
+                raise
+            self.seconds[name] = round(time.perf_counter() - start, 4)
+            self.errors.pop(name, None)
+            self._instances[name] = instance
+            return instance
+
+    def peek(self, name: str) -> Optional[Any]:
+        """The service if it has been constructed, without constructing it"""
+        return self._instances.get(name)
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._instances
+
+    def set(self, name: str, instance: Any) -> None:
+        """Use an existing instance for a service (tests, benchmarks)"""
+        with self._lock:
+            self._locks.setdefault(name, threading.Lock())
+            self._instances[name] = instance
+
+    def discard(self, name: str) -> Optional[Any]:
+        """Forget a constructed service; the next get() constructs it again"""
+        return self._instances.pop(name, None)
+
+    async def warm_up(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Construct the given services concurrently in worker threads.
+
+        A failing service does not stop the others.
+
+        Returns:
+            Service name -> error message, or None if it is ready
+        """
+        names = list(names)
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.get, name) for name in names), return_exceptions=True
+        )
+        return {
+            name: str(result) if isinstance(result, BaseException) else None
+            for name, result in zip(names, results)
+        }
+
+    def status(self) -> Dict[str, dict]:
+        """Readiness, construction seconds and last error of every registered service"""
+        return {
+            name: {"ready": name in self._instances, "seconds": self.seconds.get(name),
+                   "error": self.errors.get(name)}
+            for name in self._factories
+        }
@@ -0,0 +1,409 @@
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format served by /metrics (the response adds charset=utf-8)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Upper bounds (seconds) of the latency buckets: from in-memory lookups to
+# slow completions
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class Metric:
+    """
+    A named metric with a fixed set of label names. Label values are passed
+    as keyword arguments and every combination seen becomes its own series.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple([str(labels[name]) for name in self.labelnames])
+        except KeyError:
+            pass
+        raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+
+    def samples(self) -> List[Tuple[str, LabelValues, float, Tuple[Tuple[str, str], ...]]]:
+        """(name suffix, label values, value, extra (name, value) labels) of every series"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, value, extra in self.samples():
+            names = self.labelnames + tuple(name for name, _ in extra)
+            labels = values + tuple(label for _, label in extra)
+            lines.append(f"{self.name}{suffix}{_format_labels(names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count (requests, tokens)"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            return [("", key, value, ()) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """
+    Value that goes up and down. Either set directly, or computed at scrape
+    time by a function set with set_function (index size, memory).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], object]] = None
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], object]) -> None:
+        """
+        Compute the gauge at scrape time. The function returns a number, a
+        {label values tuple: number} dict for labelled gauges, or None when
+        there is nothing to report yet.
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                result = self._function()
+            except Exception:
+                # A failing probe must not break the whole scrape
+                return []
+            if result is None:
+                return []
+            if not isinstance(result, dict):
+                result = {(): result}
+            return [("", tuple(str(v) for v in key), float(value), ())
+                    for key, value in sorted(result.items()) if value is not None]
+        with self._lock:
+            return [("", key, value, ()) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their count and sum"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [bucket counts..., sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 1)
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels) -> Tuple[int, float]:
+        """(count, sum) of one series"""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return 0, 0.0
+            return int(sum(series[:-1])), series[-1]
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            series_items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in series_items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                samples.append(("_bucket", key, cumulative, (("le", _format_value(bound)),)))
+            samples.append(("_count", key, cumulative, ()))
+            samples.append(("_sum", key, series[-1], ()))
+        return samples
+
+
+class MetricsRegistry:
+    """The process's metrics, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; everything below is registered on import
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "agathon_http_requests_total", "HTTP requests by route template, method and status",
+    ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "agathon_http_request_duration_seconds",
+    "Time from request to the last byte of the response, by route template",
+    ("method", "route"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("agathon_http_requests_in_flight", "Requests being handled")
+
+# Stages: pdf_extract, chunk, embed_batch, embed_query, vector_search,
+# lexical_search, rerank, llm_call, excel_lookup, excel_reload
+STAGE_LATENCY = REGISTRY.histogram(
+    "agathon_stage_duration_seconds", "Duration of one processing stage", ("stage",))
+STAGE_ERRORS = REGISTRY.counter(
+    "agathon_stage_errors_total", "Stages that raised", ("stage",))
+
+OPENAI_TOKENS = REGISTRY.counter(
+    "agathon_openai_tokens_total", "Tokens reported by Azure OpenAI responses",
+    ("operation", "model", "type"))
+
+PROCESS_MEMORY = REGISTRY.gauge(
+    "agathon_process_resident_memory_bytes", "Resident set size of this process")
+
+# Set to scrape-time functions by app.main, which owns the services
+RAG_INDEX_CHUNKS = REGISTRY.gauge("agathon_rag_index_chunks", "Chunks in the main RAG index")
+RAG_INDEX_DISK_BYTES = REGISTRY.gauge("agathon_rag_index_disk_bytes", "Size of the main RAG index directory")
+RAG_INDEX_VECTOR_BYTES = REGISTRY.gauge(
+    "agathon_rag_index_vector_bytes", "Bytes of the main index's (memory-mapped) vectors")
+RAG_COLLECTIONS_RESIDENT = REGISTRY.gauge(
+    "agathon_rag_collections_resident", "Collections currently open in memory")
+EXCEL_ROWS = REGISTRY.gauge("agathon_excel_rows", "Rows of the loaded workbook")
+
+# (stage, seconds) of every stage timed while serving the current request, set
+# by app.core.profiling for the slow request log. Context variables follow the
+# request into the threadpool, and list.append is safe across its threads.
+REQUEST_STAGES: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+def stage_breakdown(stages: List[Tuple[str, float]]) -> Dict[str, dict]:
+    """Total milliseconds and count per stage, slowest stage first"""
+    totals: Dict[str, List[float]] = {}
+    for stage, seconds in stages:
+        total = totals.setdefault(stage, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+    return {
+        stage: {"ms": round(seconds * 1000, 3), "count": count}
+        for stage, (seconds, count) in sorted(totals.items(), key=lambda item: -item[1][0])
+    }
+
+
+class stage_timer:
+    """
+    Time a block as one observation of ``stage``; exceptions are counted
+    and re-raised. A class rather than @contextmanager because it wraps
+    microsecond-scale lookups.
+    """
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        STAGE_LATENCY.observe(seconds, stage=self.stage)
+        stages = REQUEST_STAGES.get()
+        if stages is not None:
+            stages.append((self.stage, seconds))
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.inc(stage=self.stage)
+        return False
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration measured elsewhere"""
+    STAGE_LATENCY.observe(seconds, stage=stage)
+    stages = REQUEST_STAGES.get()
+    if stages is not None:
+        stages.append((stage, seconds))
+
+
+class TimedIterator:
+    """
+    Iterator wrapper adding up the time spent producing items, for stages
+    that are interleaved with their consumer (PDF pages fed to the chunker)
+    """
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def record_usage(operation: str, model: Optional[str], usage) -> None:
+    """
+    Count the tokens of an OpenAI response's ``usage`` (chat or embeddings).
+    Responses without usage (e.g. streamed chunks) are ignored.
+    """
+    if usage is None:
+        return
+    model = model or "unknown"
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens:
+        OPENAI_TOKENS.inc(prompt_tokens, operation=operation, model=model, type="prompt")
+    if completion_tokens:
+        OPENAI_TOKENS.inc(completion_tokens, operation=operation, model=model, type="completion")
+
+
+def resident_memory_bytes() -> Optional[int]:
+    """Current RSS from /proc on Linux; peak RSS from getrusage elsewhere"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+PROCESS_MEMORY.set_function(resident_memory_bytes)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the count and latency of every HTTP request.
+
+    Requests are labelled with the matched route template (e.g.
+    ``/api/v1/fallnummer/{fallnummer}``) rather than the raw path, so case
+    numbers do not create a series each; unmatched paths share one label.
+    Streaming responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
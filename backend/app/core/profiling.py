@@ -0,0 +1,377 @@
+import os
+import sys
+import hmac
+import json
+import time
+import heapq
+import uuid
+import itertools
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from app.core.metrics import REQUEST_STAGES, stage_breakdown
+
+# Admin key that unlocks per-request profiling and the /api/v1/debug endpoints;
+# both are disabled while it is unset
+PROFILING_ADMIN_KEY = os.getenv("PROFILING_ADMIN_KEY", "")
+# Milliseconds between two stack samples of a profiled request
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "2"))
+# Profiles kept in memory for download, oldest dropped first
+PROFILES_KEPT = int(os.getenv("PROFILES_KEPT", "20"))
+# Slowest requests kept for /api/v1/debug/slowRequests, and how many seconds
+# a request stays recent enough to be listed
+SLOW_REQUESTS_SIZE = int(os.getenv("SLOW_REQUESTS_SIZE", "20"))
+SLOW_REQUESTS_WINDOW = float(os.getenv("SLOW_REQUESTS_WINDOW", "3600"))
+
+ADMIN_KEY_HEADER = "X-Admin-Key"
+PROFILE_HEADER = "X-Profile"
+PROFILE_FORMATS = ("speedscope", "collapsed")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Leaf frames of threads that are parked waiting for work. They are left out
+# of the samples, except on the event loop, where waiting in select() is
+# time spent on the network.
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("selectors.py", "select"),
+}
+
+Frame = Tuple[str, str, int]
+
+
+def is_admin_key(key: Optional[str]) -> bool:
+    """Constant-time check of a key against PROFILING_ADMIN_KEY"""
+    if not PROFILING_ADMIN_KEY or not key:
+        return False
+    return hmac.compare_digest(key.encode("utf-8"), PROFILING_ADMIN_KEY.encode("utf-8"))
+
+
+def _short_path(filename: str) -> str:
+    """Path of a source file relative to site-packages or the backend directory"""
+    marker = f"site-packages{os.sep}"
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    if filename.startswith(BACKEND_DIR + os.sep):
+        return os.path.relpath(filename, BACKEND_DIR)
+    return os.path.basename(filename)
+
+
+def frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    # ';' separates frames in the collapsed format
+    return f"{name} ({_short_path(filename)}:{line})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler in the style of py-spy, but in-process: a daemon
+    thread reads the Python stack of every other thread from
+    sys._current_frames() every ``interval`` seconds and counts identical
+    stacks. Sampling costs the profiled request little beyond the GIL
+    hand-offs; C code (NumPy, pandas, json) shows up as time in the Python
+    frame that called it.
+
+    Every thread is sampled, so requests served concurrently with the
+    profiled one also appear in its profile.
+    """
+
+    def __init__(self, interval: float, loop_thread: Optional[int] = None):
+        self.interval = interval
+        self.loop_thread = loop_thread
+        # (thread label, frames from root to leaf) -> number of samples
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if not stack:
+                continue
+            if ident == self.loop_thread:
+                label = "event-loop"
+            elif (os.path.basename(stack[0][1]), stack[0][0].rsplit(".", 1)[-1]) in _IDLE_FRAMES:
+                continue
+            else:
+                label = names.get(ident, f"thread-{ident}")
+            self.samples[(label, tuple(reversed(stack)))] += 1
+
+
+class Profile:
+    """Samples of one profiled request, renderable as collapsed stacks or speedscope JSON"""
+
+    def __init__(self, profile_id: str, method: str, path: str, started_at: str,
+                 duration: float, interval: float, samples: Counter, default_format: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.started_at = started_at
+        self.duration = duration
+        self.interval = interval
+        self.samples = samples
+        self.default_format = default_format
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": sum(self.samples.values()),
+            "format": self.default_format,
+        }
+
+    def collapsed(self) -> str:
+        """
+        Brendan Gregg's collapsed stack format, one ``thread;root;...;leaf count``
+        line per distinct stack, for flamegraph.pl, speedscope or inferno
+        """
+        lines = [
+            ";".join([thread] + [frame_label(frame) for frame in stack]) + f" {count}"
+            for (thread, stack), count in sorted(self.samples.items())
+        ]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """speedscope file format: one sampled profile per thread, weights in milliseconds"""
+        frame_ids: Dict[Frame, int] = {}
+        frames: List[dict] = []
+        threads: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+        weight = round(self.interval * 1000, 3)
+        for (thread, stack), count in sorted(self.samples.items()):
+            ids = []
+            for frame in stack:
+                if frame not in frame_ids:
+                    frame_ids[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({"name": name, "file": _short_path(filename), "line": line})
+                ids.append(frame_ids[frame])
+            stacks, weights = threads.setdefault(thread, ([], []))
+            stacks.append(ids)
+            weights.append(count * weight)
+
+        profiles = []
+        for thread, (stacks, weights) in threads.items():
+            profiles.append({
+                "type": "sampled",
+                "name": thread,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": stacks,
+                "weights": weights,
+            })
+        # The event loop first: speedscope opens the first profile
+        profiles.sort(key=lambda profile: profile["name"] != "event-loop")
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.method} {self.path} ({self.started_at})",
+            "exporter": "agathon",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class ProfileStore:
+    """The most recent ``size`` profiles, looked up by id"""
+
+    def __init__(self, size: int):
+        self._profiles: deque = deque(maxlen=max(size, 1))
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def list(self) -> List[Profile]:
+        """Newest first"""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+
+class SlowRequestLog:
+    """
+    The ``size`` slowest requests finished in the last ``window`` seconds.
+
+    A min-heap keyed on duration, so a request that is faster than every
+    kept one costs a single comparison.
+    """
+
+    def __init__(self, size: int, window: float):
+        self.size = size
+        self.window = window
+        self._heap: List[Tuple[float, int, float, dict]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        if self.window > 0 and any(now - finished > self.window for _, _, finished, _ in self._heap):
+            self._heap = [item for item in self._heap if now - item[2] <= self.window]
+            heapq.heapify(self._heap)
+
+    def offer(self, duration: float, entry: dict) -> None:
+        if self.size <= 0:
+            return
+        now = time.monotonic()
+        item = (duration, next(self._counter), now, entry)
+        with self._lock:
+            self._prune(now)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def entries(self) -> List[dict]:
+        """Slowest first"""
+        with self._lock:
+            self._prune(time.monotonic())
+            items = sorted(self._heap, key=lambda item: -item[0])
+        return [entry for _, _, _, entry in items]
+
+
+PROFILES = ProfileStore(PROFILES_KEPT)
+SLOW_REQUESTS = SlowRequestLog(SLOW_REQUESTS_SIZE, SLOW_REQUESTS_WINDOW)
+
+
+def _requested_format(scope) -> Optional[str]:
+    """
+    Profile format asked for with the X-Profile header or a ``profile`` query
+    parameter (``speedscope``, ``collapsed`` or any other value for the
+    default), or None when the request is not to be profiled
+    """
+    value = None
+    header = PROFILE_HEADER.lower().encode("latin-1")
+    for name, raw in scope.get("headers", ()):
+        if name == header:
+            value = raw.decode("latin-1")
+            break
+    if value is None and b"profile=" in scope.get("query_string", b""):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+        value = values[0] if values else None
+    if value is None or value.strip().lower() in ("", "0", "false", "no", "off"):
+        return None
+    value = value.strip().lower()
+    return value if value in PROFILE_FORMATS else PROFILE_FORMATS[0]
+
+
+def _header(scope, name: str) -> Optional[str]:
+    key = name.lower().encode("latin-1")
+    for header, value in scope.get("headers", ()):
+        if header == key:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware behind the slow request log and on-demand profiling.
+
+    Every request collects the stages timed while serving it (see
+    app.core.metrics.stage_timer) and is offered to SLOW_REQUESTS with its
+    stage breakdown. A request carrying ``X-Profile`` or ``?profile=`` plus a
+    valid ``X-Admin-Key`` is also sampled by a SamplingProfiler; the profile
+    is kept in PROFILES and its id returned in the ``X-Profile-Id`` header.
+    Profiling without a valid key is refused with 403.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile_format = _requested_format(scope)
+        if profile_format is not None and not is_admin_key(_header(scope, ADMIN_KEY_HEADER)):
+            await _forbidden(send)
+            return
+
+        status = 500
+        profile_id = uuid.uuid4().hex[:12] if profile_format else None
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        stages: List[Tuple[str, float]] = []
+        token = REQUEST_STAGES.set(stages)
+        profiler = None
+        if profile_format:
+            profiler = SamplingProfiler(PROFILING_INTERVAL_MS / 1000.0, threading.get_ident())
+            profiler.start()
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            duration = time.perf_counter() - start
+            REQUEST_STAGES.reset(token)
+            method = scope.get("method", "")
+            path = scope.get("path", "")
+            if profiler is not None:
+                profiler.stop()
+                PROFILES.add(Profile(profile_id, method, path, started_at, duration,
+                                     profiler.interval, profiler.samples, profile_format))
+            SLOW_REQUESTS.offer(duration, {
+                "method": method,
+                "path": path,
+                "route": getattr(scope.get("route"), "path", None),
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+                "started_at": started_at,
+                "stages": stage_breakdown(stages),
+                "profile_id": profile_id,
+            })
+
+
+async def _forbidden(send) -> None:
+    body = json.dumps({"detail": f"Profiling requires a valid {ADMIN_KEY_HEADER} header"}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 403,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
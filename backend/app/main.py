@@ -1,8 +1,21 @@
-from fastapi import FastAPI
+import time
+
+# Start of the import-to-ready measurement reported by /health/ready
+IMPORT_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router as api_router
+from app.core.container import ServiceContainer
+from app.core import metrics
+from app.core.profiling import ProfilingMiddleware
 from app.services.rag_service import RAGSystem
+from app.services.index_jobs import IndexJobManager
 from app.services.excel_service import excel_service
+from app.services.openai_clients import get_async_client, close_async_clients
+import asyncio
+import gc
 import os
 import logging
 
@@ -10,10 +23,118 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "blocking" finishes the warm-up before the first request is accepted;
+# "background" accepts requests at once and /health/ready answers 503 until done
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "blocking")
+
+GUIDELINE_PDF = os.path.join(os.path.dirname(__file__), "..", "asset", "S3_Guideline_Breast_Cancer.pdf")
+
+
+def create_rag_system() -> RAGSystem:
+    """RAG system with the main index loaded, indexing the S3 Guideline Breast Cancer PDF if there is none"""
+    logger.info("Initializing RAG system...")
+
+    # Opens the existing index, if any
+    rag_system = RAGSystem(embeddings_path="embeddings.pkl")
+
+    if rag_system.has_embeddings():
+        logger.info("Loaded existing embeddings from disk")
+    elif os.path.exists(GUIDELINE_PDF):
+        logger.info(f"Creating new embeddings for S3 Guideline Breast Cancer PDF at {GUIDELINE_PDF}...")
+        rag_system.load_pdf(GUIDELINE_PDF)
+        logger.info(f"Successfully indexed PDF with {len(rag_system.chunks)} chunks")
+    else:
+        logger.warning(f"S3 Guideline Breast Cancer PDF not found at {GUIDELINE_PDF}")
+        logger.info("You can upload a PDF using the /api/v1/indexPDF endpoint")
+
+    logger.info("RAG system initialization complete")
+    return rag_system
+
+
+# Services are built on first use; the startup warm-up builds these in parallel
+container = ServiceContainer()
+container.register("excel", excel_service.ensure_loaded)
+# The shared async Azure OpenAI client (connection pool, SDK modules)
+container.register("openai_client", get_async_client)
+container.register("rag_system", create_rag_system)
+# Uploaded PDFs are indexed by background workers
+container.register("index_jobs", lambda: IndexJobManager(container.get("rag_system")))
+WARM_UP_SERVICES = ("excel", "openai_client", "rag_system", "index_jobs")
+
+
+def _service_gauge(name: str, read):
+    """Scrape-time gauge of a service; nothing is reported (or constructed) before it exists"""
+    def gauge():
+        service = container.peek(name)
+        return None if service is None else read(service)
+    return gauge
+
+
+metrics.RAG_INDEX_CHUNKS.set_function(_service_gauge("rag_system", lambda rag: len(rag.chunks)))
+metrics.RAG_INDEX_DISK_BYTES.set_function(_service_gauge("rag_system", lambda rag: rag.index_size_bytes()))
+metrics.RAG_INDEX_VECTOR_BYTES.set_function(_service_gauge("rag_system", lambda rag: rag.embeddings.nbytes))
+metrics.RAG_COLLECTIONS_RESIDENT.set_function(
+    _service_gauge("rag_system", lambda rag: len(rag.collections.resident_names())))
+metrics.EXCEL_ROWS.set_function(_service_gauge("excel", lambda excel: excel.last_reload.get("rows")))
+
+
+async def warm_up(app: FastAPI) -> None:
+    """Construct the services concurrently, then start the workbook watcher"""
+    start = time.perf_counter()
+    errors = await container.warm_up(WARM_UP_SERVICES)
+    for name, error in errors.items():
+        if error is not None:
+            # The API keeps serving without the failed service (e.g. no RAG
+            # system without Azure credentials); its routes answer 503
+            logger.error(f"Error initializing {name}: {error}")
+
+    # Pick up workbook edits without a restart
+    excel_service.start_watcher()
+
+    # Move everything allocated during startup (pandas frames, SDK modules,
+    # index structures) out of the collector's reach. Otherwise every full
+    # collection rescans it and stalls the event loop for 100ms+.
+    gc.freeze()
+
+    ready = time.perf_counter()
+    app.state.startup.update(
+        ready=True,
+        warm_up_seconds=round(ready - start, 3),
+        import_to_ready_seconds=round(ready - IMPORT_STARTED, 3),
+    )
+    logger.info(
+        f"Ready {ready - IMPORT_STARTED:.2f}s after import (warm-up {ready - start:.2f}s: "
+        + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in container.seconds.items()) + ")"
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.container = container
+    app.state.startup = {"ready": False, "warm_up_seconds": None, "import_to_ready_seconds": None}
+    warm_up_task = None
+    if STARTUP_WARMUP == "background":
+        warm_up_task = asyncio.create_task(warm_up(app))
+    else:
+        await warm_up(app)
+
+    yield
+
+    # Stop background workers and close the shared Azure OpenAI connection pools
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    excel_service.stop_watcher()
+    index_jobs = container.peek("index_jobs")
+    if index_jobs is not None:
+        index_jobs.shutdown()
+    await close_async_clients()
+
+
 app = FastAPI(
     title="Agathon Tumorboard API",
     description="API for accessing Tumorboard data by Fallnummer and RAG-based breast cancer guidelines",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -25,48 +146,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(api_router, prefix="/api/v1")
+# Slow request log and admin-gated per-request profiling
+app.add_middleware(ProfilingMiddleware)
+# Request count and latency per route for /metrics (outermost, so refused
+# profiling requests are counted too)
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Global RAG system instance
-rag_system = None
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize RAG system on startup and load S3 Guideline Breast Cancer PDF"""
-    global rag_system
-    try:
-        logger.info("Initializing RAG system...")
-        
-        # Initialize RAG system
-        rag_system = RAGSystem(embeddings_path="embeddings.pkl")
-        
-        # Store RAG system in app state for access in routes
-        app.state.rag_system = rag_system
-        
-        # Try to load the S3 Guideline Breast Cancer PDF if it exists
-        pdf_path = os.path.join(os.path.dirname(__file__), "..", "asset", "S3_Guideline_Breast_Cancer.pdf")
-        
-        if os.path.exists(pdf_path):
-            logger.info(f"Found S3 Guideline Breast Cancer PDF at {pdf_path}")
-            
-            # Check if embeddings already exist
-            if rag_system.load_embeddings():
-                logger.info("Loaded existing embeddings from disk")
-            else:
-                logger.info("Creating new embeddings for S3 Guideline Breast Cancer PDF...")
-                rag_system.load_pdf(pdf_path, chunk_size=800, overlap=150)
-                logger.info(f"Successfully indexed PDF with {len(rag_system.chunks)} chunks")
-        else:
-            logger.warning(f"S3 Guideline Breast Cancer PDF not found at {pdf_path}")
-            logger.info("You can upload a PDF using the /api/v1/indexPDF endpoint")
-        
-        logger.info("RAG system initialization complete")
-    except Exception as e:
-        logger.error(f"Error initializing RAG system: {str(e)}")
-        # Continue even if RAG initialization fails
-        rag_system = None
-        app.state.rag_system = None
+app.include_router(api_router, prefix="/api/v1")
 
 
 @app.get("/")
@@ -74,6 +160,47 @@ def read_root():
     return {"message": "Welcome to the Agathon Tumorboard API!"}
 
 
+@app.get("/health/live")
+def health_live():
+    """Liveness probe: the process is up and answering requests"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def health_ready(response: Response):
+    """
+    Readiness probe: 200 once the startup warm-up has finished, 503 before.
+
+    A service that failed to start does not keep the API from being ready
+    (the others still serve); it is listed with its error and the status is
+    "degraded".
+    """
+    startup = app.state.startup
+    services = container.status()
+    if not startup["ready"]:
+        response.status_code = 503
+        status = "starting"
+    elif any(service["error"] for service in services.values()):
+        status = "degraded"
+    else:
+        status = "ready"
+    return {
+        "status": status,
+        "import_to_ready_seconds": startup["import_to_ready_seconds"],
+        "warm_up_seconds": startup["warm_up_seconds"],
+        "services": services,
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Prometheus text exposition of the request, stage, token and resource
+    metrics (see app/core/metrics.py), for scraping or reading directly.
+    """
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/hello")
 def hello_world():
     return {"message": "Hello World from FastAPI!"}
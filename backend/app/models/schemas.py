@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Any, Dict, List
+from pydantic import BaseModel, Field
+from typing import Optional, Any, Dict, List, Literal
 
 class FallnummerResponse(BaseModel):
     """Response model for Fallnummer data"""
@@ -28,6 +28,53 @@ class ExcelInfoResponse(BaseModel):
     total_records: int
     columns: list[str]
     available_fallnummers: list[str]
+    last_reload: Optional[Dict[str, Any]] = None
+
+
+class CaseListResponse(BaseModel):
+    """One page of cases from the Excel file"""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    total: int
+    limit: int
+    fields: List[str]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {"Case number": 18759158, "Date": "2025-03-25T00:00:00", "Staging Clinic UICC": "IA2"}
+                ],
+                "next_cursor": "eyJyIjo0OSwiYyI6IjE4NzU5MTU4In0",
+                "total": 51,
+                "limit": 50,
+                "fields": ["Case number", "Date", "Staging Clinic UICC"]
+            }
+        }
+
+
+class ExcelReloadResponse(BaseModel):
+    """Result of reloading the Tumorboard workbook"""
+    reloaded: bool
+    rows: int
+    duration_seconds: float
+    source: str
+    loaded_at: str
+    reload_count: int
+    message: str = "Excel file reloaded successfully"
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "reloaded": True,
+                "rows": 51,
+                "duration_seconds": 0.3121,
+                "source": "xlsx",
+                "loaded_at": "2025-03-25T07:45:12.418233",
+                "reload_count": 2,
+                "message": "Excel file reloaded successfully"
+            }
+        }
     
 class ErrorResponse(BaseModel):
     """Error response model"""
@@ -38,6 +85,7 @@ class CombinedReportRequest(BaseModel):
     """Request model for combined clinical report generation"""
     fallnummer: str
     data: Dict[str, Any]
+    force_refresh: bool = False
     
     class Config:
         schema_extra = {
@@ -70,6 +118,105 @@ class CombinedReportResponse(BaseModel):
     clinical_report: str
     timestamp: Optional[str] = None
     message: str = "Report generated successfully"
+    cache_hit: bool = False
+    cache_age_seconds: Optional[float] = None
+
+
+class GroundedReportRequest(BaseModel):
+    """Request model for a clinical report grounded in the indexed guidelines"""
+    fallnummer: str
+    # Case fields; None looks the case up in the Excel file
+    data: Optional[Dict[str, Any]] = None
+    # Chunks retrieved per query derived from the case; None uses GROUNDED_REPORT_TOP_K
+    top_k: Optional[int] = Field(None, ge=1, le=20)
+    # Distinct guideline excerpts sent with the case; None uses GROUNDED_REPORT_MAX_EXCERPTS
+    max_excerpts: Optional[int] = Field(None, ge=1, le=30)
+    # Token budget for the excerpts (0: no budget)
+    context_tokens: int = Field(0, ge=0)
+    retrieval_mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
+    collections: Optional[List[str]] = None
+    rerank: Optional[Literal["mmr", "none"]] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "fallnummer": "18693120",
+                "data": {
+                    "Tumor diagnosis": "Invasive ductal carcinoma of the left breast",
+                    "Histo Cyto": "HR+ HER2-, Ki-67 30%",
+                    "Staging clinic cT": "2",
+                    "Staging Clinic N": "1",
+                    "Staging Clinic M": "0",
+                    "therapy so far": "neoadjuvant EC-Paclitaxel",
+                    "Question": "Adjuvant therapy?",
+                    "curative": 1,
+                    "Old": 54
+                },
+                "top_k": 4,
+                "max_excerpts": 8,
+                "retrieval_mode": "hybrid"
+            }
+        }
+
+
+class ReportCitation(BaseModel):
+    """A guideline excerpt sent with a grounded report, cited as [id]"""
+    id: int
+    text: str
+    similarity: float
+    pages: Optional[List[int]] = None
+    source: Optional[Dict[str, Optional[str]]] = None
+    # Positions in queries of the queries that retrieved the excerpt
+    queries: List[int]
+    # Whether the report cites it
+    cited: bool
+
+
+class GroundedReportResponse(BaseModel):
+    """Response model for a guideline-grounded clinical report"""
+    fallnummer: str
+    clinical_report: str
+    queries: List[str]
+    citations: List[ReportCitation]
+    # Milliseconds per stage: derive_queries, embed, search, merge, completion, total
+    timings: Dict[str, float]
+    timestamp: Optional[str] = None
+    message: str = "Report generated successfully"
+
+
+class FallnummerBatchRequest(BaseModel):
+    """Request model for looking up many Fallnummers at once"""
+    fallnummers: List[str]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "fallnummers": ["18759158", "18683836", "18731151"]
+            }
+        }
+
+
+class FallnummerBatchResponse(BaseModel):
+    """Response model for a batch Fallnummer lookup"""
+    results: List[FallnummerResponse]
+    not_found: List[str]
+    message: str = "Data retrieved successfully"
+
+
+class CombinedReportBatchRequest(BaseModel):
+    """Request model for generating the reports of a whole board session"""
+    cases: List[CombinedReportRequest] = []
+    fallnummers: List[str] = []
+    max_concurrency: Optional[int] = None
+    force_refresh: bool = False
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "fallnummers": ["18759158", "18683836", "18731151"],
+                "max_concurrency": 8
+            }
+        }
 
 
 class RAGChunkInfo(BaseModel):
@@ -78,6 +225,9 @@ class RAGChunkInfo(BaseModel):
     text: str
     similarity: float
     similarity_percentage: float
+    pages: Optional[List[int]] = None
+    # collection, document_id and source_name of the document the chunk is from
+    source: Optional[Dict[str, Optional[str]]] = None
     
     class Config:
         json_schema_extra = {
@@ -85,7 +235,13 @@ class RAGChunkInfo(BaseModel):
                 "rank": 1,
                 "text": "Sample text from guideline...",
                 "similarity": 0.8542,
-                "similarity_percentage": 85.42
+                "similarity_percentage": 85.42,
+                "pages": [112, 113],
+                "source": {
+                    "collection": "breast",
+                    "document_id": "9c1f0a7d3b2e4f15",
+                    "source_name": "S3_Guideline_Breast_Cancer.pdf"
+                }
             }
         }
 
@@ -96,6 +252,20 @@ class RAGQueryRequest(BaseModel):
     model: str = "gpt-4o-mini"
     temperature: float = 0.3
     top_k: int = 3
+    # ANN search knobs; None uses the index default, ignored by the exact index
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    # Skip the semantic answer cache
+    force_refresh: bool = False
+    # dense (embeddings), lexical (BM25, no embeddings call) or hybrid (both,
+    # fused by rank); None uses RAG_RETRIEVAL_MODE
+    retrieval_mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
+    # Collections to search together; None searches the main index
+    collections: Optional[List[str]] = None
+    # mmr (diversify an over-fetched candidate list) or none; None uses RAG_RERANK
+    rerank: Optional[Literal["mmr", "none"]] = None
+    # Token budget for the retrieved chunks (0: top_k chunks); None uses RAG_CONTEXT_TOKENS
+    context_tokens: Optional[int] = Field(None, ge=0)
     
     class Config:
         schema_extra = {
@@ -103,7 +273,13 @@ class RAGQueryRequest(BaseModel):
                 "question": "What are the treatment recommendations for early-stage breast cancer?",
                 "model": "gpt-4o-mini",
                 "temperature": 0.3,
-                "top_k": 3
+                "top_k": 3,
+                "nprobe": 8,
+                "ef_search": 64,
+                "retrieval_mode": "hybrid",
+                "collections": ["breast", "gyn-onco"],
+                "rerank": "mmr",
+                "context_tokens": 1200
             }
         }
 
@@ -113,6 +289,10 @@ class RAGQueryResponse(BaseModel):
     answer: str
     relevant_chunks: List[RAGChunkInfo]
     message: str = "Query answered successfully"
+    retrieval_mode: Optional[str] = None
+    cache_hit: bool = False
+    # question, similarity and age_seconds of the reused answer
+    cache: Optional[Dict[str, Any]] = None
 
 
 class RAGStatusResponse(BaseModel):
@@ -120,4 +300,100 @@ class RAGStatusResponse(BaseModel):
     indexed: bool
     chunks_count: int
     embeddings_file: str
-    message: str = "Status retrieved successfully"
\ No newline at end of file
+    vector_index: Optional[str] = None
+    index_dtype: Optional[str] = None
+    dimensions: Optional[int] = None
+    retrieval_mode: Optional[str] = None
+    rerank: Optional[str] = None
+    embedding_cache: Optional[Dict[str, Any]] = None
+    query_cache: Optional[Dict[str, Any]] = None
+    collections: Optional[Dict[str, Any]] = None
+    message: str = "Status retrieved successfully"
+
+
+class CollectionDocument(BaseModel):
+    """A document indexed into a collection"""
+    document_id: str
+    source_name: str
+    source_sha256: str
+    chunks_count: int
+    chunker: Optional[str] = None
+    chunk_size: Optional[int] = None
+    overlap: Optional[int] = None
+    added_at: Optional[str] = None
+
+
+class CollectionResponse(BaseModel):
+    """A named RAG collection and its documents"""
+    name: str
+    created_at: Optional[str] = None
+    documents: List[CollectionDocument]
+    chunks_count: int
+    size_bytes: int
+    # Whether the collection is currently open in memory
+    resident: bool
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "breast",
+                "created_at": "2026-10-17T09:12:44.120391",
+                "documents": [{
+                    "document_id": "9c1f0a7d3b2e4f15",
+                    "source_name": "S3_Guideline_Breast_Cancer.pdf",
+                    "source_sha256": "9c1f0a7d3b2e4f15a8...",
+                    "chunks_count": 2143,
+                    "chunker": "structure",
+                    "chunk_size": 300,
+                    "overlap": 50,
+                    "added_at": "2026-10-17T09:14:02.554210"
+                }],
+                "chunks_count": 2143,
+                "size_bytes": 27183104,
+                "resident": True
+            }
+        }
+
+class IndexJobResponse(BaseModel):
+    """Status of a background PDF indexing job"""
+    job_id: str
+    filename: str
+    collection: Optional[str] = None
+    chunker: str = "chars"
+    chunk_size: int
+    overlap: int
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pages_total: int = 0
+    pages_extracted: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    progress: float = 0.0
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "job_id": "3f2c9d0e8a7b4c1d9e6f5a4b3c2d1e0f",
+                "filename": "S3_Guideline_Breast_Cancer.pdf",
+                "chunker": "structure",
+                "chunk_size": 300,
+                "overlap": 50,
+                "status": "running",
+                "created_at": 1760000000.0,
+                "started_at": 1760000001.2,
+                "finished_at": None,
+                "pages_total": 420,
+                "pages_extracted": 420,
+                "chunks_total": 1850,
+                "chunks_embedded": 640,
+                "progress": 0.4114,
+                "eta_seconds": 35.6,
+                "error": None,
+                "result": None
+            }
+        }
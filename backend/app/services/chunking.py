@@ -0,0 +1,263 @@
+import os
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.services.embedding_pipeline import estimate_tokens
+from app.services.pdf_extraction import chunk_pages
+
+try:
+    import tiktoken
+except ImportError:  # optional; token counts fall back to estimate_tokens
+    tiktoken = None
+
+# "structure" splits on the guideline's headings and recommendation blocks
+# with sizes in tokens; "chars" is the original fixed character window
+CHUNKERS = ("structure", "chars")
+DEFAULT_CHUNKER = os.getenv("RAG_CHUNKER", "structure")
+# Default chunk size and overlap per chunker (tokens for structure, characters for chars)
+DEFAULT_CHUNK_PARAMS = {
+    "structure": (300, 50),
+    "chars": (1000, 200),
+}
+
+# Numbered section heading: "4.2 Adjuvante Therapie", "3. Diagnostik"
+_HEADING = re.compile(r"^\d{1,2}(?:\.\d{1,2}){0,4}\.?\s+[A-ZÄÖÜ][^.!?]{0,100}$")
+# First line of a recommendation or statement box
+_RECOMMENDATION = re.compile(
+    r"^(?:\d{1,2}(?:\.\d{1,3}){1,3}\.?\s+)?(?:evidenzbasierte|konsensbasierte|evidence-based|consensus-based)?\s*"
+    r"(?:empfehlung|statement|recommendation|expertenkonsens|expert consensus)\b",
+    re.IGNORECASE,
+)
+# Rows of the evidence/grade tables that follow a recommendation; kept whole
+_TABLE_ROW = re.compile(
+    r"^(?:empfehlungsgrad|evidenzgrad|level of evidence|loe|gor|grade of recommendation|"
+    r"konsensstärke|strength of consensus|starker konsens|strong consensus|konsens|consensus|"
+    r"oxford|grade|ek)\b",
+    re.IGNORECASE,
+)
+_PAGE_NUMBER = re.compile(r"^\d{1,4}$")
+# Sentence end: terminator, optional closing quote/bracket, whitespace
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]?\s+")
+_ABBREVIATIONS = {
+    "z.b", "bzw", "ggf", "vs", "ca", "abb", "tab", "dr", "prof", "etc", "i.e", "e.g", "u.a", "d.h",
+    "nr", "inkl", "evtl", "sog", "max", "min", "kap", "vgl", "al", "bzgl", "s", "i.v", "p.o", "s.c",
+}
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in the embedding model's encoding (cl100k) if tiktoken is installed, else an estimate"""
+    global _encoder
+    if tiktoken is None:
+        return estimate_tokens(text)
+    if _encoder is None:
+        _encoder = tiktoken.get_encoding("cl100k_base")
+    return len(_encoder.encode(text, disallowed_special=()))
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split prose into sentences, not breaking after abbreviations or enumerations"""
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+        previous = text[start:match.start() + 1].rsplit(None, 1)[-1].strip("([\"'.!?").lower()
+        following = text[end:end + 1]
+        if previous in _ABBREVIATIONS or (previous.isdigit() and len(previous) <= 2):
+            continue
+        if following and not (following.isupper() or following.isdigit() or following in "\"'(["):
+            continue
+        sentences.append(text[start:end].strip())
+        start = end
+    if text[start:].strip():
+        sentences.append(text[start:].strip())
+    return sentences
+
+
+class _Unit:
+    """A sentence or table row: the smallest piece a chunk boundary may not cut"""
+
+    __slots__ = ("text", "first_page", "last_page", "tokens", "prose")
+
+    def __init__(self, text: str, first_page: int, last_page: int, prose: bool):
+        self.text = text
+        self.first_page = first_page
+        self.last_page = last_page
+        self.tokens = count_tokens(text)
+        self.prose = prose
+
+
+class _Block:
+    """A heading or recommendation with the prose and table rows that follow it"""
+
+    def __init__(self, heading: Optional[str]):
+        self.heading = heading
+        self.units: List[_Unit] = []
+        self._prose = ""
+        self._prose_pages: List[Tuple[int, int]] = []  # (offset in _prose, page)
+
+    def add_prose(self, line: str, page: int) -> None:
+        if self._prose.endswith("-") and line[:1].islower():
+            # Word hyphenated across a line break
+            self._prose = self._prose[:-1]
+        elif self._prose:
+            self._prose += " "
+        self._prose_pages.append((len(self._prose), page))
+        self._prose += line
+
+    def add_row(self, line: str, page: int) -> None:
+        self.flush_prose()
+        self.units.append(_Unit(line, page, page, prose=False))
+
+    def flush_prose(self) -> None:
+        if not self._prose:
+            return
+        offset = 0
+        for sentence in split_sentences(self._prose):
+            start = self._prose.find(sentence, offset)
+            offset = start + len(sentence)
+            self.units.append(_Unit(sentence, self._page_at(start), self._page_at(offset - 1), prose=True))
+        self._prose = ""
+        self._prose_pages = []
+
+    def _page_at(self, offset: int) -> int:
+        page = self._prose_pages[0][1]
+        for start, number in self._prose_pages:
+            if start > offset:
+                break
+            page = number
+        return page
+
+
+def iter_blocks(pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[Optional[str], List[_Unit]]]:
+    """
+    Group page texts into structural blocks, streaming.
+
+    A block starts at a numbered heading or a recommendation/statement line;
+    wrapped lines are re-joined and split into sentences, evidence-table rows
+    are kept as whole lines. Yields (current section heading, units).
+    """
+    section: Optional[str] = None
+    block = _Block(None)
+
+    for number, text in pages:
+        for raw in text.splitlines():
+            line = " ".join(raw.split())
+            if not line or _PAGE_NUMBER.match(line):
+                continue
+            is_heading = bool(_HEADING.match(line)) and not _RECOMMENDATION.match(line)
+            if is_heading or _RECOMMENDATION.match(line):
+                block.flush_prose()
+                # A heading directly followed by a recommendation stays with it
+                carried = block.units if len(block.units) == 1 and block.units[0].text == section else []
+                if block.units and not carried:
+                    yield section, block.units
+                if is_heading:
+                    section = line
+                block = _Block(line)
+                block.units.extend(carried)
+                block.add_row(line, number)
+            elif _TABLE_ROW.match(line):
+                block.add_row(line, number)
+            else:
+                block.add_prose(line, number)
+
+    block.flush_prose()
+    if block.units:
+        yield section, block.units
+
+
+def _split_long_unit(unit: _Unit, max_tokens: int) -> List[_Unit]:
+    """Cut a unit longer than max_tokens at word boundaries"""
+    pieces = []
+    words = []
+    for word in unit.text.split():
+        if words and count_tokens(" ".join(words + [word])) > max_tokens:
+            pieces.append(_Unit(" ".join(words), unit.first_page, unit.last_page, unit.prose))
+            words = []
+        words.append(word)
+    if words:
+        pieces.append(_Unit(" ".join(words), unit.first_page, unit.last_page, unit.prose))
+    return pieces
+
+
+def chunk_structured(pages: Iterable[Tuple[int, str]], max_tokens: int = 300,
+                     overlap_tokens: int = 50) -> Iterator[Tuple[str, int, int]]:
+    """
+    Pack structural blocks into chunks of at most ``max_tokens`` tokens, streaming.
+
+    Whole blocks are packed together while they fit, so a chunk boundary
+    falls between recommendations rather than inside one. A block that is
+    too large on its own is split between sentences; each continuation chunk
+    repeats the trailing sentences of the previous one (up to
+    ``overlap_tokens``) and starts with the section heading for context.
+
+    Yields:
+        (chunk text, first page, last page), like pdf_extraction.chunk_pages
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap must be smaller than chunk_size")
+
+    current: List[_Unit] = []
+    current_tokens = 0
+
+    def emit(units: List[_Unit]) -> Tuple[str, int, int]:
+        return "\n".join(u.text for u in units), units[0].first_page, max(u.last_page for u in units)
+
+    for section, units in iter_blocks(pages):
+        block_tokens = sum(u.tokens for u in units)
+        if current and current_tokens + block_tokens <= max_tokens:
+            current.extend(units)
+            current_tokens += block_tokens
+            continue
+        if current:
+            yield emit(current)
+            current, current_tokens = [], 0
+        if block_tokens <= max_tokens:
+            current, current_tokens = list(units), block_tokens
+            continue
+
+        # Oversized block: fill chunks sentence by sentence
+        context = [_Unit(section, units[0].first_page, units[0].first_page, prose=False)] if section else []
+        for unit in units:
+            for piece in (_split_long_unit(unit, max_tokens // 2) if unit.tokens > max_tokens // 2 else [unit]):
+                if current and current_tokens + piece.tokens > max_tokens:
+                    yield emit(current)
+                    overlap, overlap_size = [], 0
+                    for previous in reversed(current):
+                        if not previous.prose or overlap_size + previous.tokens > overlap_tokens:
+                            break
+                        overlap.insert(0, previous)
+                        overlap_size += previous.tokens
+                    current = context + overlap
+                    current_tokens = sum(u.tokens for u in current)
+                current.append(piece)
+                current_tokens += piece.tokens
+
+    if current:
+        yield emit(current)
+
+
+def resolve_chunk_params(chunker: Optional[str], chunk_size: Optional[int],
+                         overlap: Optional[int]) -> Tuple[str, int, int]:
+    """Fill in the chunker's default size and overlap and validate all three"""
+    chunker = chunker or DEFAULT_CHUNKER
+    if chunker not in CHUNKERS:
+        raise ValueError(f"chunker must be one of {CHUNKERS}, got '{chunker}'")
+    default_size, default_overlap = DEFAULT_CHUNK_PARAMS[chunker]
+    chunk_size = default_size if chunk_size is None else chunk_size
+    overlap = default_overlap if overlap is None else overlap
+    if chunk_size <= 0 or overlap < 0:
+        raise ValueError("chunk_size must be positive and overlap non-negative")
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+    return chunker, chunk_size, overlap
+
+
+def chunk_document(pages: Iterable[Tuple[int, str]], chunker: str, chunk_size: int,
+                   overlap: int) -> Iterator[Tuple[str, int, int]]:
+    """Stream (chunk text, first page, last page) from page texts with the named chunker"""
+    if chunker == "chars":
+        return chunk_pages(pages, chunk_size, overlap)
+    return chunk_structured(pages, chunk_size, overlap)
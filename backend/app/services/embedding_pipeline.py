@@ -0,0 +1,194 @@
+import os
+import asyncio
+import random
+import concurrent.futures
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+import openai
+
+from app.core.metrics import stage_timer, record_usage
+
+# Azure OpenAI embedding limits: 2048 inputs per request and a per-request
+# token cap well above what we send. The token budget keeps single requests
+# small enough to stay under the deployment's tokens-per-minute limit.
+MAX_INPUTS_PER_REQUEST = 2048
+DEFAULT_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "20000"))
+DEFAULT_BATCH_INPUTS = int(os.getenv("EMBEDDING_BATCH_INPUTS", "256"))
+DEFAULT_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+DEFAULT_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative token estimate for the cl100k tokenizer used by
+    text-embedding-3-*. English averages ~4 characters per token; guideline
+    text with German terms, numbers and abbreviations tokenizes denser, so
+    assume 3.
+    """
+    return len(text) // 3 + 1
+
+
+def plan_batches(texts: List[str], max_tokens: int = DEFAULT_BATCH_TOKENS,
+                 max_inputs: int = DEFAULT_BATCH_INPUTS) -> List[Tuple[int, int]]:
+    """
+    Split texts into consecutive (start, end) batches bounded by an estimated
+    token budget and an input count. A single text larger than the budget is
+    sent on its own.
+    """
+    max_inputs = max(1, min(max_inputs, MAX_INPUTS_PER_REQUEST))
+    batches = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if i > start and (tokens + cost > max_tokens or i - start >= max_inputs):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += cost
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read Retry-After / retry-after-ms from an API error response, if present"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return float(retry_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        when = parsedate_to_datetime(retry_after)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """429s, 5xx, timeouts and connection errors are worth retrying"""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+
+    If the caller is already inside an event loop (e.g. a sync helper called
+    from an async route), the coroutine runs on a fresh loop in a helper
+    thread instead of failing with "asyncio.run() cannot be called from a
+    running event loop".
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+class EmbeddingPipeline:
+    """
+    Batched, concurrent embedding requests against an async OpenAI client.
+
+    - batches are sized by an estimated token budget instead of a fixed count
+    - at most ``max_concurrency`` requests are in flight at once
+    - 429/5xx/connection errors are retried with exponential backoff and full
+      jitter, honouring Retry-After when the server sends it
+    - results are reassembled in input order regardless of completion order
+
+    The client should be created with ``max_retries=0`` so retries are not
+    stacked on top of the SDK's own.
+    """
+
+    def __init__(self, client: openai.AsyncAzureOpenAI, model: str,
+                 max_batch_tokens: int = DEFAULT_BATCH_TOKENS,
+                 max_batch_inputs: int = DEFAULT_BATCH_INPUTS,
+                 max_concurrency: int = DEFAULT_CONCURRENCY,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = 0.5, max_delay: float = 60.0):
+        self.client = client
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    async def embed(self, texts: List[str],
+                    progress: Optional[Callable[[int], None]] = None) -> List[List[float]]:
+        """
+        Embed all texts and return vectors in the same order.
+
+        Args:
+            texts: Texts to embed
+            progress: Optional callback invoked with the number of texts in
+                each batch as it completes
+        """
+        if not texts:
+            return []
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_batch(start: int, end: int):
+            async with semaphore:
+                vectors = await self._embed_batch(texts[start:end])
+            results[start:end] = vectors
+            if progress is not None:
+                progress(end - start)
+
+        tasks = [asyncio.create_task(run_batch(start, end))
+                 for start, end in plan_batches(texts, self.max_batch_tokens, self.max_batch_inputs)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        return results
+
+    async def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                with stage_timer("embed_batch"):
+                    response = await self.client.embeddings.create(input=batch, model=self.model)
+                record_usage("embeddings", self.model, response.usage)
+                # The API returns items with their input index; never rely on order
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(min(delay, self.max_delay))
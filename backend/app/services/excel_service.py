@@ -1,95 +1,469 @@
 import pandas as pd
-from typing import Optional, Dict, Any
+import numpy as np
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import date, datetime
 import os
+import json
+import base64
+import time
+import logging
+import threading
 from pathlib import Path
 
+from app.core.metrics import stage_timer, observe_stage
+from app.services.excel_snapshot import read_excel_cached
+
+logger = logging.getLogger(__name__)
+
+# Column names tried, in order, for the case number (Fallnummer)
+CASE_NUMBER_COLUMNS = ['Case number', 'Fallnummer', 'fallnummer', 'Fall-Nr', 'Fall Nr', 'Case Number', 'Case_Number']
+
+# Columns with precomputed filter indexes for case listings
+DATE_COLUMN = 'Date'
+DIAGNOSIS_COLUMN = 'Tumor diagnosis'
+UICC_COLUMNS = ['Staging Clinic UICC', 'Staging Path UICC']
+FLAG_COLUMNS = ['curative', 'palliative']
+
+
+def resolve_case_column(columns) -> Optional[str]:
+    """Pick the case number column, falling back to the first column"""
+    for col in CASE_NUMBER_COLUMNS:
+        if col in columns:
+            return col
+    return columns[0] if len(columns) > 0 else None
+
+
+def normalize_case_number(value) -> Optional[str]:
+    """
+    Canonical string form of a case number, used as the lookup key.
+
+    Strips whitespace and renders integral floats without the trailing
+    ".0" (a case number column containing blanks is read as float64).
+    """
+    if value is None:
+        return None
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        if float(value).is_integer():
+            return str(int(value))
+    text = str(value).strip()
+    return text or None
+
+
+def normalize_uicc(value) -> Optional[str]:
+    """UICC stage as an index key: upper case without spaces ("I A2" -> "IA2")"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    text = "".join(str(value).split()).upper()
+    return text or None
+
+
+def encode_cursor(row: int, case: Optional[str]) -> str:
+    raw = json.dumps({"r": int(row), "c": case}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, Optional[str]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return int(data["r"]), data.get("c")
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def json_ready_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Convert every row to a dict of plain Python values: NaN/NaT become None
+    and timestamps ISO strings (what the API serialized them to before).
+    """
+    columns = {}
+    for name in frame.columns:
+        series = frame[name]
+        missing = series.isna().to_numpy()
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = np.datetime_as_string(series.to_numpy(dtype="datetime64[s]"), unit="s").astype(object)
+        else:
+            values = series.to_numpy(dtype=object, na_value=None)
+            if values.size and isinstance(values[0], np.generic):
+                values = np.array([value.item() for value in values], dtype=object)
+        values[missing] = None
+        columns[name] = values.tolist()
+
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))]
+
+
+class CaseStore:
+    """
+    Lookup structures for one loaded workbook, built once.
+
+    Maps the normalized case number to its JSON-ready record (first row
+    wins, as with the previous DataFrame filter) and keeps the case number
+    list precomputed. Lookups are a single dict access; the returned records
+    are shared and must not be modified.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.columns = list(frame.columns)
+        self.case_column = resolve_case_column(self.columns)
+        self.records: List[Dict[str, Any]] = json_ready_records(frame) if self.case_column else []
+        self.row_by_case: Dict[str, int] = {}
+        self.fallnummers: List[str] = []
+        # Rows that have a case number; only those are listed
+        self.has_case = np.zeros(len(frame), dtype=bool)
+
+        if self.case_column is not None:
+            for row, value in enumerate(frame[self.case_column].tolist()):
+                key = normalize_case_number(value)
+                if key is None:
+                    continue
+                self.fallnummers.append(key)
+                self.row_by_case.setdefault(key, row)
+                self.has_case[row] = True
+
+        # Serialized records, filled on first request per case
+        self._json: Dict[str, bytes] = {}
+        self._build_filter_indexes(frame)
+
+    def _build_filter_indexes(self, frame: pd.DataFrame) -> None:
+        """Column indexes used by filter_rows, so listings never scan the frame"""
+        # Rows ordered by date; a date range is two binary searches
+        self.sorted_dates = None
+        self.rows_by_date = None
+        if DATE_COLUMN in frame.columns and pd.api.types.is_datetime64_any_dtype(frame[DATE_COLUMN]):
+            dates = frame[DATE_COLUMN].to_numpy(dtype="datetime64[ns]")
+            valid = np.flatnonzero(~np.isnat(dates))
+            order = valid[np.argsort(dates[valid], kind="stable")]
+            self.rows_by_date = order
+            self.sorted_dates = dates[order]
+
+        self.flags: Dict[str, np.ndarray] = {
+            name: (pd.to_numeric(frame[name], errors="coerce") == 1).to_numpy()
+            for name in FLAG_COLUMNS if name in frame.columns
+        }
+
+        self.diagnoses: Optional[List[str]] = None
+        if DIAGNOSIS_COLUMN in frame.columns:
+            self.diagnoses = [
+                value.lower() if isinstance(value, str) else ""
+                for value in frame[DIAGNOSIS_COLUMN].tolist()
+            ]
+
+        rows_by_uicc: Dict[str, set] = {}
+        for name in UICC_COLUMNS:
+            if name in frame.columns:
+                for row, value in enumerate(frame[name].tolist()):
+                    key = normalize_uicc(value)
+                    if key is not None:
+                        rows_by_uicc.setdefault(key, set()).add(row)
+        self.rows_by_uicc: Dict[str, np.ndarray] = {
+            key: np.fromiter(sorted(rows), dtype=np.int64) for key, rows in rows_by_uicc.items()
+        }
+
+    def filter_rows(self, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    curative: Optional[bool] = None, palliative: Optional[bool] = None,
+                    diagnosis: Optional[str] = None, uicc: Optional[str] = None) -> np.ndarray:
+        """
+        Row positions (ascending) of cases matching all given filters.
+
+        Args:
+            date_from / date_to: Inclusive range on the Date column
+            curative / palliative: Required value of the 0/1 flag columns
+            diagnosis: Case-insensitive substring of Tumor diagnosis
+            uicc: UICC stage in the clinical or pathological staging column
+        """
+        mask = self.has_case.copy()
+
+        if date_from is not None or date_to is not None:
+            if self.sorted_dates is None:
+                raise ValueError(f"Column '{DATE_COLUMN}' is not available for filtering")
+            lo = 0 if date_from is None else np.searchsorted(self.sorted_dates, np.datetime64(date_from, "ns"), "left")
+            hi = len(self.sorted_dates) if date_to is None else np.searchsorted(
+                self.sorted_dates, np.datetime64(date_to, "ns") + np.timedelta64(1, "D"), "left"
+            )
+            in_range = np.zeros(len(mask), dtype=bool)
+            in_range[self.rows_by_date[lo:hi]] = True
+            mask &= in_range
+
+        for name, wanted in (("curative", curative), ("palliative", palliative)):
+            if wanted is None:
+                continue
+            if name not in self.flags:
+                raise ValueError(f"Column '{name}' is not available for filtering")
+            mask &= self.flags[name] == wanted
+
+        if uicc:
+            staged = np.zeros(len(mask), dtype=bool)
+            staged[self.rows_by_uicc.get(normalize_uicc(uicc), np.empty(0, dtype=np.int64))] = True
+            mask &= staged
+
+        rows = np.flatnonzero(mask)
+        if diagnosis:
+            if self.diagnoses is None:
+                raise ValueError(f"Column '{DIAGNOSIS_COLUMN}' is not available for filtering")
+            # Substring match only over rows left by the indexed filters
+            needle = diagnosis.lower()
+            rows = np.fromiter((row for row in rows if needle in self.diagnoses[row]), dtype=np.int64)
+        return rows
+
+    def case_at(self, row: int) -> Optional[str]:
+        return normalize_case_number(self.frame[self.case_column].iat[row]) if self.case_column else None
+
+    def resolve_fields(self, fields: Optional[List[str]]) -> List[str]:
+        """Validate a projection; None means the case number only, "*" all columns"""
+        if not fields:
+            return [self.case_column] if self.case_column else []
+        if fields == ["*"]:
+            return list(self.columns)
+        unknown = [name for name in fields if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+
+    def get(self, fallnummer) -> Optional[Dict[str, Any]]:
+        row = self.row_by_case.get(normalize_case_number(fallnummer))
+        return None if row is None else self.records[row]
+
+    def get_json(self, fallnummer) -> Optional[bytes]:
+        """The record as UTF-8 JSON, serialized once and reused"""
+        key = normalize_case_number(fallnummer)
+        cached = self._json.get(key)
+        if cached is None:
+            record = self.get(key)
+            if record is None:
+                return None
+            cached = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._json[key] = cached
+        return cached
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+
+# Seconds between checks of the workbook for changes; 0 disables the watcher
+DEFAULT_RELOAD_INTERVAL = float(os.getenv("EXCEL_RELOAD_INTERVAL", "10"))
+
+
 class ExcelService:
     def __init__(self):
         # Path to the Excel file
         self.excel_path = Path(__file__).parent.parent.parent / "asset" / "Tumorboard_final_eng.xlsx"
-        self._data = None
-        self._load_data()
-    
+        # Readers take self._store once per call; reloads replace it with a
+        # fully built CaseStore in a single assignment and never mutate it
+        self._current = CaseStore(pd.DataFrame())
+        self._reload_lock = threading.Lock()
+        self._loaded_signature: Optional[Tuple[int, int]] = None
+        self._reload_count = 0
+        self.last_reload: Dict[str, Any] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watcher = threading.Event()
+        # The workbook is read on first use (or by the startup warm-up), not on import
+        self._loaded = False
+        self._first_load_lock = threading.Lock()
+
+    @property
+    def _store(self) -> CaseStore:
+        if not self._loaded:
+            self.ensure_loaded()
+        return self._current
+
+    @property
+    def _data(self) -> pd.DataFrame:
+        return self._store.frame
+
+    def ensure_loaded(self) -> "ExcelService":
+        """Read the workbook unless that was already done; concurrent callers wait for the first"""
+        if not self._loaded:
+            with self._first_load_lock:
+                if not self._loaded:
+                    self._load_data()
+                    self._loaded = True
+        return self
+
     def _load_data(self):
-        """Load the Excel file into memory"""
+        """Load the Excel file into memory and build the case index"""
         try:
-            if os.path.exists(self.excel_path):
-                # Read Excel file - you might need to specify the sheet name
-                self._data = pd.read_excel(self.excel_path)
-                print(f"Loaded Excel file with {len(self._data)} rows")
-                print(f"Columns: {list(self._data.columns)}")
-            else:
-                print(f"Excel file not found at: {self.excel_path}")
-                self._data = pd.DataFrame()
+            self.reload()
         except Exception as e:
-            print(f"Error loading Excel file: {e}")
-            self._data = pd.DataFrame()
-    
-    def get_data_by_fallnummer(self, fallnummer: str) -> Optional[Dict[str, Any]]:
-        """Get all data for a specific Fallnummer"""
-        if self._data is None or self._data.empty:
-            return None
-        
-        # Assuming there's a column named 'Fallnummer' or similar
-        # We'll check different possible column names
-        possible_columns = ['Case number', 'Fallnummer', 'fallnummer', 'Fall-Nr', 'Fall Nr', 'Case Number', 'Case_Number']
-        
-        fallnummer_column = None
-        for col in possible_columns:
-            if col in self._data.columns:
-                fallnummer_column = col
-                break
-        
-        if fallnummer_column is None:
-            # If no standard column found, use the first column
-            if len(self._data.columns) > 0:
-                fallnummer_column = self._data.columns[0]
-            else:
-                return None
-        
-        # Filter data by Fallnummer
-        matching_rows = self._data[self._data[fallnummer_column].astype(str) == str(fallnummer)]
-        
-        if matching_rows.empty:
+            logger.error(f"Error loading Excel file: {e}")
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.excel_path)
+        except OSError:
             return None
-        
-        # Convert to dictionary and handle NaN values
-        result = matching_rows.iloc[0].to_dict()
-        
-        # Replace NaN values with None for JSON serialization
-        for key, value in result.items():
-            if pd.isna(value):
-                result[key] = None
-        
-        return result
-    
+        return stat.st_size, stat.st_mtime_ns
+
+    def reload(self, force: bool = True) -> Dict[str, Any]:
+        """
+        Re-read the workbook and swap in new lookup structures.
+
+        Parsing and indexing happen off to the side; requests keep using the
+        current store until the new one is complete. On error the current
+        store stays in place and the exception is raised.
+
+        Args:
+            force: Reload even if the file looks unchanged
+
+        Returns:
+            Reload statistics (see last_reload) plus "reloaded"
+        """
+        with self._reload_lock:
+            signature = self._file_signature()
+            if not force and signature == self._loaded_signature:
+                return {**self.last_reload, "reloaded": False}
+
+            start = time.perf_counter()
+            try:
+                if signature is not None:
+                    # Parsing xlsx is slow; later starts read the columnar snapshot
+                    data, source = read_excel_cached(str(self.excel_path))
+                    logger.info(f"Loaded Excel file with {len(data)} rows (from {source})")
+                    logger.debug(f"Columns: {list(data.columns)}")
+                else:
+                    logger.warning(f"Excel file not found at: {self.excel_path}")
+                    data, source = pd.DataFrame(), "missing"
+                store = CaseStore(data)
+            except Exception as e:
+                self.last_reload = {
+                    **self.last_reload,
+                    "error": str(e),
+                    "failed_at": datetime.now().isoformat(),
+                }
+                raise
+
+            duration = time.perf_counter() - start
+            observe_stage("excel_reload", duration)
+            self._current = store
+            self._loaded = True
+            self._loaded_signature = signature
+            self._reload_count += 1
+            self.last_reload = {
+                "loaded_at": datetime.now().isoformat(),
+                "duration_seconds": round(duration, 4),
+                "rows": len(store),
+                "source": source,
+                "reload_count": self._reload_count,
+                "error": None,
+            }
+            return {**self.last_reload, "reloaded": True}
+
+    def start_watcher(self, interval: float = DEFAULT_RELOAD_INTERVAL) -> None:
+        """Poll the workbook's size/mtime and reload in the background when it changes"""
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop_watcher.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="excel-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop_watcher.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch(self, interval: float) -> None:
+        pending = None
+        while not self._stop_watcher.wait(interval):
+            signature = self._file_signature()
+            if signature is None or signature == self._loaded_signature:
+                pending = None
+                continue
+            # Wait until the file has stopped changing for one interval so a
+            # workbook that is still being saved is not read half-written
+            if signature != pending:
+                pending = signature
+                continue
+            pending = None
+            try:
+                stats = self.reload(force=False)
+                if stats["reloaded"]:
+                    logger.info(f"Reloaded Excel file in {stats['duration_seconds']}s ({stats['rows']} rows)")
+            except Exception as e:
+                logger.error(f"Error reloading Excel file: {e}")
+
+    def get_data_by_fallnummer(self, fallnummer: str) -> Optional[Dict[str, Any]]:
+        """Get all data for a specific Fallnummer (shared record, do not modify)"""
+        store = self._store
+        with stage_timer("excel_lookup"):
+            return store.get(fallnummer)
+
+    def get_record_json(self, fallnummer: str) -> Optional[bytes]:
+        """Get the data for a Fallnummer as pre-serialized JSON"""
+        store = self._store
+        with stage_timer("excel_lookup"):
+            return store.get_json(fallnummer)
+
+    def get_many_json(self, fallnummers: List[str]) -> List[Tuple[str, Optional[bytes]]]:
+        """Pre-serialized records for many Fallnummers, all from the same loaded workbook"""
+        store = self._store
+        with stage_timer("excel_lookup"):
+            return [(fallnummer, store.get_json(fallnummer)) for fallnummer in fallnummers]
+
+    def get_many(self, fallnummers: List[str]) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Records for many Fallnummers (shared, do not modify), None where not found"""
+        store = self._store
+        with stage_timer("excel_lookup"):
+            return [(fallnummer, store.get(fallnummer)) for fallnummer in fallnummers]
+
     def get_all_fallnummers(self) -> list:
         """Get all available Fallnummers"""
-        if self._data is None or self._data.empty:
-            return []
-        
-        # Find the Fallnummer column
-        possible_columns = ['Case number', 'Fallnummer', 'fallnummer', 'Fall-Nr', 'Fall Nr', 'Case Number', 'Case_Number']
-        
-        fallnummer_column = None
-        for col in possible_columns:
-            if col in self._data.columns:
-                fallnummer_column = col
-                break
-        
-        if fallnummer_column is None and len(self._data.columns) > 0:
-            fallnummer_column = self._data.columns[0]
-        
-        if fallnummer_column:
-            return self._data[fallnummer_column].dropna().astype(str).tolist()
-        
-        return []
-    
+        return self._store.fallnummers
+
+    def get_info(self, sample: int = 10) -> Dict[str, Any]:
+        """Record count, columns and the first few Fallnummers from one consistent store"""
+        store = self._store
+        return {
+            "total_records": len(store.fallnummers),
+            "columns": store.columns,
+            "available_fallnummers": store.fallnummers[:sample],
+        }
+
+    def list_cases(self, cursor: Optional[str] = None, limit: int = 50,
+                   fields: Optional[List[str]] = None, **filters) -> Dict[str, Any]:
+        """
+        One page of cases matching the filters (see CaseStore.filter_rows),
+        in workbook order, projected to ``fields``.
+
+        The cursor names the last case of the previous page, so paging stays
+        consistent when the workbook is reloaded in between.
+
+        Returns:
+            items, next_cursor (None on the last page), total matches, fields
+        """
+        store = self._store
+        fields = store.resolve_fields(fields)
+        with stage_timer("excel_lookup"):
+            rows = store.filter_rows(**filters)
+
+        start = 0
+        if cursor:
+            after, case = decode_cursor(cursor)
+            if not (0 <= after < len(store) and store.case_at(after) == case):
+                # Rows moved since the cursor was issued (workbook reloaded)
+                after = store.row_by_case.get(case, after)
+            start = int(np.searchsorted(rows, after, side="right"))
+        page = rows[start:start + limit]
+
+        next_cursor = None
+        if start + limit < len(rows) and len(page):
+            last = int(page[-1])
+            next_cursor = encode_cursor(last, store.case_at(last))
+
+        return {
+            "items": [{name: store.records[row][name] for name in fields} for row in page.tolist()],
+            "next_cursor": next_cursor,
+            "total": int(len(rows)),
+            "limit": limit,
+            "fields": fields,
+        }
+
     def get_columns(self) -> list:
         """Get all column names"""
-        if self._data is None:
-            return []
-        return list(self._data.columns)
+        return self._store.columns
 
 # Create a singleton instance
-excel_service = ExcelService()
\ No newline at end of file
+excel_service = ExcelService()
@@ -0,0 +1,106 @@
+import os
+import glob
+import time
+import uuid
+import hashlib
+from typing import Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional; snapshots fall back to pickle
+    pa = None
+
+# Bump when the snapshot layout changes so old files are ignored
+SNAPSHOT_VERSION = 1
+# Directory for workbook snapshots; set EXCEL_CACHE_DIR to "" to disable
+DEFAULT_CACHE_DIR = os.getenv("EXCEL_CACHE_DIR", "excel_cache")
+
+
+def snapshot_key(excel_path: str) -> str:
+    """Identify a workbook version by absolute path, size and mtime"""
+    stat = os.stat(excel_path)
+    raw = f"{os.path.abspath(excel_path)}|{stat.st_size}|{stat.st_mtime_ns}|{SNAPSHOT_VERSION}|{pd.__version__}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _snapshot_paths(excel_path: str, cache_dir: str) -> Tuple[str, str]:
+    stem = os.path.splitext(os.path.basename(excel_path))[0]
+    prefix = os.path.join(cache_dir, f"{stem}.{snapshot_key(excel_path)}")
+    return f"{prefix}.arrow", f"{prefix}.pkl"
+
+
+def read_snapshot(path: str) -> pd.DataFrame:
+    """Read an Arrow IPC (memory-mapped) or pickle snapshot"""
+    if path.endswith(".arrow"):
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas()
+    return pd.read_pickle(path)
+
+
+def write_snapshot(frame: pd.DataFrame, excel_path: str, cache_dir: str) -> str:
+    """
+    Write the snapshot for the current workbook version and remove snapshots
+    of older versions. Uses Arrow IPC when pyarrow is installed and the
+    frame converts cleanly (no mixed-type columns), pickle otherwise.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    arrow_path, pickle_path = _snapshot_paths(excel_path, cache_dir)
+    tmp_path = os.path.join(cache_dir, f".tmp-{uuid.uuid4().hex[:8]}")
+
+    path = pickle_path
+    try:
+        if pa is not None:
+            try:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+                print(f"Workbook not representable in Arrow ({e}), using pickle snapshot")
+            else:
+                with pa.OSFile(tmp_path, "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                path = arrow_path
+        if path == pickle_path:
+            frame.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    stem = os.path.splitext(os.path.basename(excel_path))[0]
+    for stale in glob.glob(os.path.join(cache_dir, f"{stem}.*")):
+        if stale != path:
+            os.remove(stale)
+    return path
+
+
+def read_excel_cached(excel_path: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Tuple[pd.DataFrame, str]:
+    """
+    Load a workbook, from its snapshot when one matches the file's current
+    size and mtime, otherwise from the xlsx (then writing the snapshot).
+
+    Returns:
+        (data frame, "snapshot" or "xlsx")
+    """
+    if cache_dir:
+        for path in _snapshot_paths(excel_path, cache_dir):
+            if os.path.exists(path) and (pa is not None or not path.endswith(".arrow")):
+                try:
+                    return read_snapshot(path), "snapshot"
+                except Exception as e:
+                    print(f"Ignoring unreadable Excel snapshot {path}: {e}")
+
+    start = time.perf_counter()
+    frame = pd.read_excel(excel_path)
+    print(f"Parsed {excel_path} in {time.perf_counter() - start:.2f}s")
+
+    if cache_dir:
+        try:
+            print(f"Excel snapshot written to {write_snapshot(frame, excel_path, cache_dir)}")
+        except OSError as e:
+            # A read-only cache directory must not break loading
+            print(f"Could not write Excel snapshot: {e}")
+    return frame, "xlsx"
@@ -0,0 +1,183 @@
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.services.openai_service import openai_service, normalize_prompt_fields
+from app.services.reranking import pack_context
+
+# Guideline chunks retrieved per query derived from a case
+DEFAULT_QUERY_TOP_K = int(os.getenv("GROUNDED_REPORT_TOP_K", "4"))
+# Distinct excerpts sent with the case after merging the queries' chunks
+DEFAULT_MAX_EXCERPTS = int(os.getenv("GROUNDED_REPORT_MAX_EXCERPTS", "8"))
+
+# Characters of free-text fields (diagnosis, histology, prior therapy) used in a query
+QUERY_FIELD_CHARS = 200
+_CITATION = re.compile(r"\[(\d+)\]")
+
+# (path field, clinical field, TNM letter) in the order they are written
+_STAGING_FIELDS = (
+    ('Staging Path pT', 'Staging clinic cT', 'T'),
+    ('Staging Path N', 'Staging Clinic N', 'N'),
+    ('Staging Path M', 'Staging Clinic M', 'M'),
+)
+
+
+def _clip(text, limit: int = QUERY_FIELD_CHARS) -> str:
+    """Single-line text cut at a word boundary"""
+    text = " ".join(str(text).split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0]
+
+
+def _stage_value(prefix: str, letter: str, value) -> str:
+    value = str(value).strip()
+    # Bare values ("1a", "0", "X") get their prefix; "ypT0" or "cN1" stay as they are
+    if value[:1].isdigit() or value.upper() in ("X", "IS"):
+        return f"{prefix}{letter}{value}"
+    return value
+
+
+def case_staging(fields: dict) -> str:
+    """Pathological TNM where known, clinical otherwise, plus UICC stage, e.g. 'pT1a cN0 cM0 UICC IA3'"""
+    parts = []
+    for path_field, clinic_field, letter in _STAGING_FIELDS:
+        if fields.get(path_field) not in (None, ""):
+            parts.append(_stage_value("p", letter, fields[path_field]))
+        elif fields.get(clinic_field) not in (None, ""):
+            parts.append(_stage_value("c", letter, fields[clinic_field]))
+    uicc = fields.get('Staging Path UICC') or fields.get('Staging Clinic UICC')
+    if uicc:
+        parts.append(f"UICC {uicc}")
+    return " ".join(parts)
+
+
+def derive_queries(patient_data: dict) -> List[str]:
+    """
+    Guideline retrieval queries for a case: treatment of the diagnosis at its
+    stage, therapy by tumour biology, the question to the board and the next
+    step after the therapy so far. Fields a case lacks are skipped.
+    """
+    fields = normalize_prompt_fields(patient_data)
+    diagnosis = _clip(fields['Tumor diagnosis']) if fields.get('Tumor diagnosis') else ""
+    staging = case_staging(fields)
+    question = patient_data.get('Question')
+    question = _clip(question) if question else ""
+    if not diagnosis and not question:
+        raise ValueError("The case has neither a Tumor diagnosis nor a Question to retrieve guideline context for")
+
+    intent = {True: "Curative treatment", False: "Palliative treatment"}.get(fields.get('curative'), "Treatment")
+    queries = []
+    if diagnosis:
+        queries.append(f"{intent} recommendation for {diagnosis} {staging}".strip())
+        if fields.get('Histo Cyto'):
+            queries.append(f"Therapy by tumour biology for {_clip(fields['Histo Cyto'])}")
+    if question:
+        queries.append(f"{question} {diagnosis} {staging}".strip())
+    if diagnosis and fields.get('therapy so far'):
+        queries.append(f"Further treatment after {_clip(fields['therapy so far'])} for {diagnosis}")
+    return list(dict.fromkeys(queries))
+
+
+def merge_chunks(results: List[list], max_excerpts: int = DEFAULT_MAX_EXCERPTS,
+                 context_tokens: int = 0) -> List[Tuple[tuple, List[int]]]:
+    """
+    Deduplicate the chunks retrieved for several queries.
+
+    A chunk found by more than one query is kept once, with its best score
+    and the positions of all queries that found it. Chunks found by more
+    queries come first, then by score. At most ``max_excerpts`` are kept, and
+    with a ``context_tokens`` budget only as many as fit.
+
+    Returns:
+        [(RetrievedChunk, query positions)]
+    """
+    merged: Dict[tuple, list] = {}
+    for position, chunks in enumerate(results):
+        for chunk in chunks:
+            text, score, _, source = chunk
+            key = (text, tuple(sorted(source.items())) if source else None)
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [chunk, [position]]
+                continue
+            if score > entry[0][1]:
+                entry[0] = chunk
+            if position not in entry[1]:
+                entry[1].append(position)
+
+    ranked = sorted(merged.values(), key=lambda entry: (len(entry[1]), entry[0][1]), reverse=True)[:max_excerpts]
+    if context_tokens:
+        ranked = [ranked[j] for j in pack_context([chunk[0] for chunk, _ in ranked], context_tokens)]
+    return [(chunk, positions) for chunk, positions in ranked]
+
+
+def citation_label(pages: Optional[List[int]], source: Optional[dict]) -> str:
+    """Where an excerpt comes from, e.g. 'S3_Guideline_Breast_Cancer.pdf, p. 112-113'"""
+    label = (source or {}).get("source_name") or "Guideline"
+    if pages:
+        label += f", p. {pages[0]}" if pages[0] == pages[-1] else f", p. {pages[0]}-{pages[-1]}"
+    return label
+
+
+async def agenerate_grounded_report(rag_system, patient_data: dict, top_k: int = DEFAULT_QUERY_TOP_K,
+                                    max_excerpts: int = DEFAULT_MAX_EXCERPTS,
+                                    retrieval_mode: Optional[str] = None,
+                                    collections: Optional[List[str]] = None, rerank: Optional[str] = None,
+                                    context_tokens: int = 0) -> dict:
+    """
+    Clinical report grounded in the indexed guidelines, in one call.
+
+    Retrieval queries are derived from the case fields and searched
+    concurrently (their embeddings in one request), the retrieved chunks are
+    deduplicated and the case plus numbered excerpts go into a single
+    completion that cites them.
+
+    Args:
+        rag_system: RAGSystem to retrieve from
+        patient_data: Dictionary containing patient information
+        top_k: Chunks retrieved per derived query
+        max_excerpts: Distinct excerpts sent to the model
+        context_tokens: Token budget for the excerpts (0: no budget)
+
+    Returns:
+        {"report", "queries", "citations", "timings"}; timings are milliseconds per stage
+    """
+    timings = {}
+    start = time.perf_counter()
+    queries = derive_queries(patient_data)
+    timings["derive_queries_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    results, retrieval_timings = await rag_system.afind_relevant_chunks_many(
+        queries, top_k, retrieval_mode=retrieval_mode, collections=collections, rerank=rerank,
+        context_tokens=0
+    )
+    timings.update(retrieval_timings)
+
+    mark = time.perf_counter()
+    excerpts = merge_chunks(results, max_excerpts, context_tokens)
+    timings["merge_ms"] = round((time.perf_counter() - mark) * 1000, 2)
+
+    mark = time.perf_counter()
+    report = await openai_service.agenerate_grounded_report(patient_data, [
+        f"[{number}] ({citation_label(pages, source)}) {text}"
+        for number, ((text, _, pages, source), _) in enumerate(excerpts, 1)
+    ])
+    timings["completion_ms"] = round((time.perf_counter() - mark) * 1000, 2)
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    cited = {int(number) for number in _CITATION.findall(report or "")}
+    citations = [
+        {
+            "id": number,
+            "text": text[:300] + "..." if len(text) > 300 else text,
+            "similarity": float(score),
+            "pages": pages,
+            "source": source,
+            "queries": positions,
+            "cited": number in cited,
+        }
+        for number, ((text, score, pages, source), positions) in enumerate(excerpts, 1)
+    ]
+    return {"report": report, "queries": queries, "citations": citations, "timings": timings}
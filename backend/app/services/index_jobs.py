@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.services.rag_service import RAGSystem, IndexingCancelled
+from app.services.chunking import resolve_chunk_params
+from app.services.rag_collections import validate_collection_name
+
+# Number of PDFs that may be extracted/embedded at the same time
+DEFAULT_WORKERS = int(os.getenv("INDEX_JOB_WORKERS", "2"))
+DEFAULT_JOBS_DIR = os.getenv("INDEX_JOBS_DIR", "index_jobs")
+
+# Share of the overall progress attributed to text extraction; the rest is
+# embedding, which dominates wall-clock time
+EXTRACT_WEIGHT = 0.1
+# Minimum seconds between progress writes to the job file
+PERSIST_INTERVAL = 1.0
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class IndexJob:
+    """State of one background /indexPDF run"""
+
+    def __init__(self, job_id: str, filename: str, chunk_size: int, overlap: int, chunker: str = "chars",
+                 collection: Optional[str] = None):
+        self.id = job_id
+        self.filename = filename
+        # None replaces the main index, otherwise the PDF is added to this collection
+        self.collection = collection
+        self.chunker = chunker
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.pages_total = 0
+        self.pages_extracted = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.error: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.cancel_requested = threading.Event()
+
+    @property
+    def progress(self) -> float:
+        """Overall completion between 0 and 1"""
+        if self.status == COMPLETED:
+            return 1.0
+        done = 0.0
+        if self.pages_total:
+            done += EXTRACT_WEIGHT * self.pages_extracted / self.pages_total
+        if self.chunks_total:
+            done += (1 - EXTRACT_WEIGHT) * self.chunks_embedded / self.chunks_total
+        return min(done, 1.0)
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining time extrapolated from the progress rate so far"""
+        if self.status != RUNNING or self.started_at is None:
+            return None
+        progress = self.progress
+        if progress <= 0:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed * (1 - progress) / progress, 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "collection": self.collection,
+            "chunker": self.chunker,
+            "chunk_size": self.chunk_size,
+            "overlap": self.overlap,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "pages_total": self.pages_total,
+            "pages_extracted": self.pages_extracted,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded,
+            "progress": round(self.progress, 4),
+            "eta_seconds": self.eta_seconds,
+            "error": self.error,
+            "result": self.result,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndexJob":
+        # Jobs persisted before the structure chunker existed used character windows
+        job = cls(data["job_id"], data["filename"], data["chunk_size"], data["overlap"], data.get("chunker", "chars"),
+                  data.get("collection"))
+        for key in ("status", "created_at", "started_at", "finished_at", "pages_total",
+                    "pages_extracted", "chunks_total", "chunks_embedded", "error", "result"):
+            setattr(job, key, data.get(key))
+        return job
+
+
+class IndexJobManager:
+    """
+    Runs PDF indexing on a small worker pool instead of inside the request.
+
+    Each upload gets its own job id and file, so concurrent uploads never
+    overwrite each other. Job state is written to ``<jobs_dir>/<id>.json``
+    and survives restarts; jobs that were still queued or running when the
+    process stopped are marked failed on the next start. The RAG system swaps
+    in the new index only when a job completes, so queries keep using the
+    current index in the meantime.
+    """
+
+    def __init__(self, rag_system: RAGSystem, jobs_dir: str = DEFAULT_JOBS_DIR,
+                 max_workers: int = DEFAULT_WORKERS):
+        self.rag_system = rag_system
+        self.jobs_dir = jobs_dir
+        self._jobs: Dict[str, IndexJob] = {}
+        self._lock = threading.Lock()
+        self._last_persist: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="index-job")
+
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._restore_jobs()
+
+    def submit(self, content: bytes, filename: str, chunk_size: Optional[int] = None,
+               overlap: Optional[int] = None, chunker: Optional[str] = None,
+               collection: Optional[str] = None) -> IndexJob:
+        """
+        Store the uploaded PDF and queue it for indexing (None uses the
+        chunker's defaults). With ``collection`` the PDF is added to that
+        collection instead of replacing the main index.
+        """
+        chunker, chunk_size, overlap = resolve_chunk_params(chunker, chunk_size, overlap)
+        if collection is not None:
+            validate_collection_name(collection)
+        job = IndexJob(uuid.uuid4().hex, filename, chunk_size, overlap, chunker, collection)
+        with open(self._upload_path(job.id), "wb") as f:
+            f.write(content)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._persist(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IndexJob]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[IndexJob]:
+        """
+        Request cancellation. Queued jobs are cancelled immediately, running
+        jobs stop at the next page or embedding batch.
+        """
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_requested.set()
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED)
+        return job
+
+    def shutdown(self) -> None:
+        """Cancel outstanding work and wait for the workers to stop"""
+        for job in self.list():
+            if job.status not in FINISHED_STATES:
+                job.cancel_requested.set()
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job: IndexJob) -> None:
+        if job.cancel_requested.is_set() or job.status != QUEUED:
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._persist(job)
+        print(f"Index job {job.id} started for {job.filename}")
+
+        def on_progress(stage: str, done: int, total: int):
+            if stage == "extracting":
+                job.pages_extracted, job.pages_total = done, total
+            else:
+                job.chunks_embedded, job.chunks_total = done, total
+            self._persist(job, throttle=True)
+
+        if job.collection is None:
+            index = self.rag_system.build_index
+        else:
+            index = functools.partial(self.rag_system.collections.add_document, job.collection)
+
+        try:
+            job.result = index(
+                self._upload_path(job.id),
+                job.chunk_size,
+                job.overlap,
+                progress=on_progress,
+                should_cancel=job.cancel_requested.is_set,
+                source_name=job.filename,
+                chunker=job.chunker,
+            )
+            self._finish(job, COMPLETED)
+        except IndexingCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _finish(self, job: IndexJob, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        self._persist(job)
+        self._remove_upload(job.id)
+        print(f"Index job {job.id} {status}" + (f": {job.error}" if job.error else ""))
+
+    def _upload_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.pdf")
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _remove_upload(self, job_id: str) -> None:
+        try:
+            os.remove(self._upload_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def _persist(self, job: IndexJob, throttle: bool = False) -> None:
+        now = time.time()
+        if throttle and now - self._last_persist.get(job.id, 0.0) < PERSIST_INTERVAL:
+            return
+        self._last_persist[job.id] = now
+
+        path = self._job_path(job.id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(job.to_dict(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error saving index job {job.id}: {str(e)}")
+
+    def _restore_jobs(self) -> None:
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    job = IndexJob.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping unreadable index job {name}: {str(e)}")
+                continue
+            self._jobs[job.id] = job
+            if job.status not in FINISHED_STATES:
+                # Its worker died with the previous process
+                job.error = "Interrupted by server restart"
+                self._finish(job, FAILED)
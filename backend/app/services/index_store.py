@@ -0,0 +1,259 @@
+import os
+import json
+import pickle
+import shutil
+import uuid
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.quantization import Int8Vectors, quantize_int8
+
+# On-disk layout of a RAG index directory (e.g. ``embeddings.index/``):
+#
+#   manifest.json  small header: format version, dimension, dtype, model,
+#                  chunking parameters, source PDF hash, file names
+#   vectors.npy    (count, dim) float32/float16 matrix of unit-norm embeddings,
+#                  or int8 codes with quantization.npy holding the (2, dim)
+#                  per-dimension scale and offset
+#   chunks.bin     UTF-8 chunk texts concatenated back to back
+#   offsets.npy    (count + 1,) int64 byte offsets of each chunk in chunks.bin
+#
+# The binary files are opened with np.memmap, so loading parses nothing but the
+# manifest and every worker process shares the same pages via the OS page cache.
+
+INDEX_FORMAT = "agathon-rag-index"
+INDEX_FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+TEXTS_FILE = "chunks.bin"
+OFFSETS_FILE = "offsets.npy"
+PAGES_FILE = "pages.npy"
+QUANTIZATION_FILE = "quantization.npy"
+
+
+class MappedChunks(Sequence):
+    """Read-only list of chunk texts decoded lazily from a memory-mapped blob"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return max(len(self._offsets) - 1, 0)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+
+def index_path_for(embeddings_path: str) -> str:
+    """Derive the index directory from the legacy ``embeddings.pkl`` path"""
+    base, _ = os.path.splitext(embeddings_path)
+    return f"{base}.index"
+
+
+def index_size_bytes(index_path: str) -> int:
+    """Total size of all files in an index directory"""
+    if not os.path.isdir(index_path):
+        return 0
+    return sum(
+        os.path.getsize(os.path.join(index_path, name))
+        for name in os.listdir(index_path)
+        if os.path.isfile(os.path.join(index_path, name))
+    )
+
+
+def write_index(index_path: str, chunks: List[str], embeddings: np.ndarray,
+                metadata: Optional[dict] = None, dtype: str = "float32",
+                extra_writer: Optional[Callable[[str], None]] = None,
+                pages: Optional[np.ndarray] = None) -> dict:
+    """
+    Write chunks and embeddings to ``index_path`` and return the manifest.
+
+    ``pages`` optionally holds the (first, last) source page of each chunk.
+    With dtype "int8" the vectors are scalar-quantized per dimension.
+
+    The directory is written next to the target and swapped in with renames,
+    so a crash never leaves a half-written index behind. ``extra_writer`` is
+    called with the staging directory to add auxiliary files (e.g. an ANN
+    graph) that must be swapped in together with the vectors.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported index dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+
+    vectors = np.asarray(embeddings, dtype=np.float32 if dtype == "int8" else dtype)
+    if len(vectors) != len(chunks):
+        raise ValueError(f"Chunk/embedding count mismatch: {len(chunks)} chunks, {len(vectors)} embeddings")
+    if vectors.ndim != 2:
+        vectors = vectors.reshape(len(chunks), -1 if len(chunks) else 0)
+    if pages is not None:
+        pages = np.asarray(pages, dtype=np.int32).reshape(-1, 2)
+        if len(pages) != len(chunks):
+            raise ValueError(f"Chunk/page count mismatch: {len(chunks)} chunks, {len(pages)} page ranges")
+    quantization = None
+    if dtype == "int8":
+        vectors, scale, offset = quantize_int8(vectors)
+        quantization = np.stack([scale, offset])
+
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    manifest = {
+        "format": INDEX_FORMAT,
+        "format_version": INDEX_FORMAT_VERSION,
+        "count": int(len(vectors)),
+        "dim": int(vectors.shape[1]),
+        "dtype": dtype,
+        "created_at": datetime.now().isoformat(),
+        "files": {
+            "vectors": VECTORS_FILE,
+            "texts": TEXTS_FILE,
+            "offsets": OFFSETS_FILE,
+        },
+    }
+    if pages is not None:
+        manifest["files"]["pages"] = PAGES_FILE
+    if quantization is not None:
+        manifest["files"]["quantization"] = QUANTIZATION_FILE
+    manifest.update(metadata or {})
+
+    tmp_path = f"{index_path}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp_path)
+    try:
+        np.save(os.path.join(tmp_path, VECTORS_FILE), vectors)
+        np.save(os.path.join(tmp_path, OFFSETS_FILE), offsets)
+        if pages is not None:
+            np.save(os.path.join(tmp_path, PAGES_FILE), pages)
+        if quantization is not None:
+            np.save(os.path.join(tmp_path, QUANTIZATION_FILE), quantization)
+        with open(os.path.join(tmp_path, TEXTS_FILE), "wb") as f:
+            for b in encoded:
+                f.write(b)
+        if extra_writer is not None:
+            extra_writer(tmp_path)
+        # Manifest last: its presence marks the directory as complete
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        _replace_dir(tmp_path, index_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    return manifest
+
+
+def read_manifest(index_path: str) -> dict:
+    """Read and validate an index manifest"""
+    manifest_path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Index manifest not found: {manifest_path}")
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != INDEX_FORMAT:
+        raise ValueError(f"Not a RAG index: {index_path}")
+    if manifest.get("format_version") != INDEX_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported index format version {manifest.get('format_version')} "
+            f"(expected {INDEX_FORMAT_VERSION}); re-index the PDF"
+        )
+    return manifest
+
+
+def open_index(index_path: str) -> Tuple[MappedChunks, np.ndarray, dict]:
+    """
+    Memory-map an index directory.
+
+    Returns:
+        (chunks, vectors, manifest) where chunks decode lazily and vectors is a
+        read-only np.memmap of shape (count, dim), wrapped in Int8Vectors
+        for int8 indexes.
+    """
+    manifest = read_manifest(index_path)
+    files = manifest["files"]
+
+    vectors = np.load(os.path.join(index_path, files["vectors"]), mmap_mode="r")
+    offsets = np.load(os.path.join(index_path, files["offsets"]), mmap_mode="r")
+
+    if len(vectors) != manifest["count"] or len(offsets) != manifest["count"] + 1:
+        raise ValueError(f"Index files do not match manifest in {index_path}")
+    if manifest["dtype"] == "int8":
+        scale, offset = np.load(os.path.join(index_path, files["quantization"]))
+        vectors = Int8Vectors(vectors, scale, offset)
+
+    texts_path = os.path.join(index_path, files["texts"])
+    if os.path.getsize(texts_path) > 0:
+        blob = np.memmap(texts_path, dtype=np.uint8, mode="r")
+    else:
+        blob = np.empty(0, dtype=np.uint8)
+
+    return MappedChunks(blob, offsets), vectors, manifest
+
+
+def read_pages(index_path: str, manifest: dict) -> Optional[np.ndarray]:
+    """
+    Memory-map the (count, 2) array of first/last source page per chunk, or
+    return None for indexes written without page information.
+    """
+    name = manifest["files"].get("pages")
+    if name is None:
+        return None
+    pages = np.load(os.path.join(index_path, name), mmap_mode="r")
+    if len(pages) != manifest["count"]:
+        raise ValueError(f"Index files do not match manifest in {index_path}")
+    return pages
+
+
+def read_legacy_pickle(pickle_path: str, chunks_json_path: Optional[str] = None) -> Tuple[List[str], list]:
+    """
+    Read a legacy ``embeddings.pkl`` for one-shot migration to the index format.
+
+    Chunk texts come from the pickle; if it has none, they are read from the
+    companion ``*_chunks.json`` written by RAGSystem.save_chunks_json.
+    """
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+
+    chunks = list(data.get("chunks") or [])
+    if not chunks and chunks_json_path and os.path.exists(chunks_json_path):
+        with open(chunks_json_path, "r", encoding="utf-8") as f:
+            chunks = json.load(f).get("chunks", [])
+
+    embeddings = data.get("embeddings", [])
+    if len(chunks) != len(embeddings):
+        raise ValueError(
+            f"Legacy store is inconsistent: {len(chunks)} chunks, {len(embeddings)} embeddings"
+        )
+    return chunks, embeddings
+
+
+def remove_index(index_path: str) -> None:
+    """Delete an index directory if it exists"""
+    if os.path.isdir(index_path):
+        shutil.rmtree(index_path)
+
+
+def _replace_dir(src: str, dst: str) -> None:
+    """Move ``src`` to ``dst``, replacing any existing directory"""
+    if os.path.exists(dst):
+        old = f"{dst}.old-{uuid.uuid4().hex[:8]}"
+        os.rename(dst, old)
+        os.rename(src, dst)
+        # Processes that still map the old files keep their pages until they
+        # unmap; removing the directory only drops the names.
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.rename(src, dst)
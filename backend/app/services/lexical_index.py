@@ -0,0 +1,159 @@
+import os
+import re
+import json
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Files written next to the vectors in the index directory
+BM25_FILE = "bm25.json"
+BM25_OFFSETS_FILE = "bm25_offsets.npy"
+BM25_DOCS_FILE = "bm25_docs.npy"
+BM25_WEIGHTS_FILE = "bm25_weights.npy"
+# Bump when tokenize() changes so persisted indexes are rebuilt
+TOKENIZER_VERSION = 1
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+# Reciprocal rank fusion constant; 60 is the value from the original RRF paper
+RRF_K = 60
+
+# Words and numbers, keeping clinical compounds such as "pT1a", "ypN0",
+# "CDK4/6", "HER2+" or "5-FU" together
+_TOKEN = re.compile(r"[^\W_]+(?:[/.\-][^\W_]+)*\+?")
+_PART = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased tokens of a text. Compounds are emitted whole, split at
+    hyphens and as their alphanumeric parts, so "CDK4/6-Inhibitoren" matches
+    "cdk4/6", "cdk4" and "inhibitoren" queries.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1 or token.endswith("+"):
+            extras = dict.fromkeys(token.split("-") + parts)
+            extras.pop(token, None)
+            tokens.extend(extras)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists into (id, sum of 1 / (k + rank)) pairs, best first"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc] = scores.get(doc, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over chunk texts.
+
+    Postings are stored CSR-style: the postings of term t are
+    ``doc_ids[offsets[t]:offsets[t + 1]]`` with their BM25 term weights
+    (idf and length-normalized tf) precomputed in ``weights``, so scoring a
+    query is one gather and one bincount with no calls outside the process.
+    The arrays are saved as .npy files and memory-mapped on load.
+    """
+
+    kind = "bm25"
+
+    def __init__(self, vocabulary: Dict[str, int], offsets: np.ndarray, doc_ids: np.ndarray,
+                 weights: np.ndarray, doc_count: int, k1: float = 1.5, b: float = 0.75):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.doc_count = doc_count
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, chunks: Iterable[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocabulary: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        lengths = []
+        for doc, text in enumerate(chunks):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc, tf))
+
+        doc_count = len(lengths)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        avg_length = float(lengths.mean()) if doc_count else 0.0
+        norms = k1 * (1 - b + b * lengths / avg_length) if avg_length else np.full(doc_count, k1, dtype=np.float32)
+
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.float32)
+        idf = np.empty(len(postings), dtype=np.float32)
+        for term_id, term_postings in enumerate(postings):
+            start, end = offsets[term_id], offsets[term_id + 1]
+            doc_ids[start:end], tfs[start:end] = zip(*term_postings)
+            df = end - start
+            idf[term_id] = np.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+        term_of_posting = np.repeat(np.arange(len(postings)), np.diff(offsets))
+        weights = idf[term_of_posting] * tfs * (k1 + 1) / (tfs + norms[doc_ids])
+        return cls(vocabulary, offsets, doc_ids, weights.astype(np.float32), doc_count, k1, b)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """Return (chunk index, BM25 score) pairs of the top_k matching chunks"""
+        term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not term_ids or top_k <= 0:
+            return []
+        slices = [slice(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        docs = np.concatenate([self.doc_ids[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        scores = np.bincount(docs, weights=weights, minlength=self.doc_count)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in order]
+
+    def save(self, directory: str) -> None:
+        terms = [None] * len(self.vocabulary)
+        for term, term_id in self.vocabulary.items():
+            terms[term_id] = term
+        with open(os.path.join(directory, BM25_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "tokenizer_version": TOKENIZER_VERSION,
+                "doc_count": self.doc_count,
+                "k1": self.k1,
+                "b": self.b,
+                "terms": terms,
+            }, f, ensure_ascii=False)
+        np.save(os.path.join(directory, BM25_OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(directory, BM25_DOCS_FILE), self.doc_ids)
+        np.save(os.path.join(directory, BM25_WEIGHTS_FILE), self.weights)
+
+    @classmethod
+    def load(cls, directory: str, doc_count: int) -> Optional["BM25Index"]:
+        """Load a saved index, or None if missing, outdated or for other chunks"""
+        path = os.path.join(directory, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("tokenizer_version") != TOKENIZER_VERSION or header.get("doc_count") != doc_count:
+            return None
+        return cls(
+            {term: term_id for term_id, term in enumerate(header["terms"])},
+            np.load(os.path.join(directory, BM25_OFFSETS_FILE), mmap_mode="r"),
+            np.load(os.path.join(directory, BM25_DOCS_FILE), mmap_mode="r"),
+            np.load(os.path.join(directory, BM25_WEIGHTS_FILE), mmap_mode="r"),
+            doc_count, header["k1"], header["b"],
+        )
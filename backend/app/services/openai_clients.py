@@ -0,0 +1,129 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from openai import AzureOpenAI, AsyncAzureOpenAI
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_API_VERSION = "2025-01-01-preview"
+
+# Connection pool shared by every async Azure OpenAI call made by the API
+HTTP_MAX_CONNECTIONS = int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("OPENAI_HTTP_TIMEOUT", "120"))
+
+_async_clients: Dict[Tuple[str, str, str], AsyncAzureOpenAI] = {}
+_http_client: Optional[httpx.AsyncClient] = None
+_sync_clients: Dict[Tuple[str, str, str], AzureOpenAI] = {}
+_sync_http_client: Optional[httpx.Client] = None
+# Clients are created from startup warm-up threads and request handlers alike
+_clients_lock = threading.Lock()
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+
+
+def _shared_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=_pool_limits(),
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=10.0),
+        )
+    return _http_client
+
+
+def _shared_sync_http_client() -> httpx.Client:
+    global _sync_http_client
+    if _sync_http_client is None or _sync_http_client.is_closed:
+        _sync_http_client = httpx.Client(
+            limits=_pool_limits(),
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=10.0),
+        )
+    return _sync_http_client
+
+
+def _client_key(api_version: Optional[str]) -> Tuple[str, str, str]:
+    """(endpoint, api version, key) identifying the clients of one deployment"""
+    return (
+        os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_version or os.getenv("OPENAI_API_VERSION") or DEFAULT_API_VERSION,
+        os.getenv("AZURE_OPENAI_API_KEY"),
+    )
+
+
+def _resolve_resources(client) -> None:
+    # The SDK imports its resource modules lazily on first attribute access
+    # (~0.5s for chat); resolve them now rather than on the event loop in the
+    # middle of a request
+    client.chat.completions
+    client.embeddings
+
+
+def get_async_client(api_version: Optional[str] = None) -> AsyncAzureOpenAI:
+    """
+    Return the process-wide AsyncAzureOpenAI client for the configured endpoint.
+
+    All clients share one pooled httpx.AsyncClient, so concurrent requests
+    reuse keep-alive connections instead of opening a pool per service. The
+    client must be used from the server's event loop.
+    """
+    key = _client_key(api_version)
+    client = _async_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _async_clients.get(key)
+            if client is None:
+                endpoint, api_version, api_key = key
+                client = AsyncAzureOpenAI(
+                    api_version=api_version,
+                    azure_endpoint=endpoint,
+                    api_key=api_key,
+                    http_client=_shared_http_client(),
+                )
+                _resolve_resources(client)
+                _async_clients[key] = client
+    return client
+
+
+def get_sync_client(api_version: Optional[str] = None) -> AzureOpenAI:
+    """
+    Return the process-wide blocking AzureOpenAI client for the configured
+    endpoint, used by the synchronous code paths (index builds in worker
+    threads, the sync RAG query). All share one pooled httpx.Client.
+    """
+    key = _client_key(api_version)
+    client = _sync_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _sync_clients.get(key)
+            if client is None:
+                endpoint, api_version, api_key = key
+                client = AzureOpenAI(
+                    api_version=api_version,
+                    azure_endpoint=endpoint,
+                    api_key=api_key,
+                    http_client=_shared_sync_http_client(),
+                )
+                _resolve_resources(client)
+                _sync_clients[key] = client
+    return client
+
+
+async def close_async_clients() -> None:
+    """Close the shared connection pools (call on application shutdown)"""
+    global _http_client, _sync_http_client
+    with _clients_lock:
+        _async_clients.clear()
+        _sync_clients.clear()
+        http_client, _http_client = _http_client, None
+        sync_http_client, _sync_http_client = _sync_http_client, None
+    if sync_http_client is not None:
+        sync_http_client.close()
+    if http_client is not None:
+        await http_client.aclose()
@@ -1,10 +1,62 @@
 import os
+import json
+import math
+import asyncio
+import hashlib
 from dotenv import load_dotenv
+from typing import AsyncIterator, List, Optional, Tuple
 from openai import AzureOpenAI
 
+from app.core.metrics import stage_timer, record_usage
+from app.services.openai_clients import get_async_client, get_sync_client
+from app.services.report_cache import ReportCache, DEFAULT_CACHE_PATH
+
 # Load environment variables
 load_dotenv()
 
+# Reports generated at once by a batch request
+DEFAULT_REPORT_CONCURRENCY = int(os.getenv("REPORT_BATCH_CONCURRENCY", "16"))
+# Completion tokens of a guideline-grounded report (summary plus recommendations)
+GROUNDED_REPORT_MAX_TOKENS = int(os.getenv("GROUNDED_REPORT_MAX_TOKENS", "1200"))
+
+# Bump whenever the prompt text or completion parameters change, so cached
+# reports produced by the old prompt are no longer served
+PROMPT_TEMPLATE_VERSION = 1
+# Patient fields read by _construct_prompt; other fields do not affect the report
+PROMPT_FIELDS = (
+    'Case number', 'Old', 'Tumor history', 'Secondary diagnoses', 'Imaging',
+    'Tumor diagnosis', 'Histo Cyto', 'Staging clinic cT', 'Staging Clinic N',
+    'Staging Clinic M', 'Staging Clinic UICC', 'Staging Path pT', 'Staging Path N',
+    'Staging Path M', 'Staging Path UICC', 'curative', 'therapy so far',
+)
+
+
+def _normalize_value(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    if isinstance(value, str):
+        # Whitespace differences (trailing spaces, CRLF) do not change the case
+        return "\n".join(" ".join(line.split()) for line in value.strip().splitlines())
+    return value
+
+
+def normalize_prompt_fields(patient_data: dict) -> dict:
+    """
+    The prompt fields of a case with whitespace, NaN and integral floats
+    normalized. Fields absent from the case stay absent (the prompt shows a
+    placeholder for them). Cases with equal normalized fields get identical
+    prompts.
+    """
+    fields = {key: _normalize_value(patient_data[key]) for key in PROMPT_FIELDS if key in patient_data}
+    if 'curative' in fields:
+        # The prompt only distinguishes curative (== 1) from palliative
+        fields['curative'] = fields['curative'] == 1
+    return fields
+
+
 class OpenAIService:
     """Service for interacting with Azure OpenAI API"""
     
@@ -13,12 +65,12 @@ class OpenAIService:
         self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
         self.api_version = os.getenv("OPENAI_API_VERSION")
         self.deployment_name = os.getenv("OPENAI_DEPLOYMENT_NAME")
-        
-        self.client = AzureOpenAI(
-            api_version=self.api_version,
-            azure_endpoint=self.endpoint,
-            api_key=self.api_key,
-        )
+        self.report_cache = ReportCache(DEFAULT_CACHE_PATH) if DEFAULT_CACHE_PATH else None
+
+    @property
+    def client(self) -> AzureOpenAI:
+        """Shared blocking client, created on first use rather than at import"""
+        return get_sync_client(self.api_version)
     
     def generate_clinical_report(self, patient_data: dict) -> str:
         """
@@ -33,20 +85,186 @@ class OpenAIService:
         prompt = self._construct_prompt(patient_data)
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                temperature=0.0,  # deterministic output
-                top_p=1.0,
-                max_tokens=800,
-                messages=[
-                    {"role": "system", "content": "You are a clinical summarization assistant for tumor boards."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            with stage_timer("llm_call"):
+                response = self.client.chat.completions.create(**self._completion_args(prompt))
+            record_usage("chat", self.deployment_name, response.usage)
             
             return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"Error generating report: {str(e)}")
+
+    async def agenerate_clinical_report(self, patient_data: dict) -> str:
+        """
+        Async variant of generate_clinical_report.
+
+        Uses the shared pooled AsyncAzureOpenAI client so the request does not
+        block the event loop while the completion is generated.
+        """
+        prompt = self._construct_prompt(patient_data)
+
+        try:
+            with stage_timer("llm_call"):
+                response = await get_async_client(self.api_version).chat.completions.create(
+                    **self._completion_args(prompt)
+                )
+            record_usage("chat", self.deployment_name, response.usage)
+
+            return response.choices[0].message.content
+        except Exception as e:
+            raise Exception(f"Error generating report: {str(e)}")
+
+    async def aget_clinical_report(self, patient_data: dict, force_refresh: bool = False) -> Tuple[str, Optional[float]]:
+        """
+        agenerate_clinical_report served from the report cache when possible.
+
+        Args:
+            patient_data: Dictionary containing patient information
+            force_refresh: Generate a new report even if one is cached
+
+        Returns:
+            (report, age in seconds of the cached report or None if generated now)
+        """
+        if not force_refresh:
+            cached = self.lookup_report(patient_data)
+            if cached is not None:
+                return cached
+        report = await self.agenerate_clinical_report(patient_data)
+        self.store_report(patient_data, report)
+        return report, None
+
+    def report_cache_key(self, patient_data: dict) -> str:
+        """Cache key: deployment, prompt template version and normalized prompt fields"""
+        raw = json.dumps(
+            [self.deployment_name, PROMPT_TEMPLATE_VERSION, normalize_prompt_fields(patient_data)],
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup_report(self, patient_data: dict) -> Optional[Tuple[str, float]]:
+        """Cached (report, age in seconds) for this case's prompt, if any"""
+        if self.report_cache is None:
+            return None
+        try:
+            return self.report_cache.get(self.report_cache_key(patient_data))
+        except Exception as e:
+            # A broken cache must not fail report generation
+            print(f"Error reading report cache: {str(e)}")
+            return None
+
+    def store_report(self, patient_data: dict, report: str) -> None:
+        if self.report_cache is None or not report:
+            return
+        try:
+            self.report_cache.put(
+                self.report_cache_key(patient_data), report, self.deployment_name, PROMPT_TEMPLATE_VERSION
+            )
+        except Exception as e:
+            print(f"Error writing report cache: {str(e)}")
+
+    async def astream_clinical_report(self, patient_data: dict) -> AsyncIterator[str]:
+        """
+        Stream a clinical report as content deltas from a stream=True completion.
+        The complete report is added to the report cache once the stream ends.
+
+        Args:
+            patient_data: Dictionary containing patient information
+
+        Yields:
+            Pieces of the report text in generation order
+        """
+        prompt = self._construct_prompt(patient_data)
+        pieces = []
+
+        try:
+            with stage_timer("llm_call"):
+                stream = await get_async_client(self.api_version).chat.completions.create(
+                    **self._completion_args(prompt), stream=True
+                )
+                async for event in stream:
+                    record_usage("chat", self.deployment_name, getattr(event, "usage", None))
+                    # Azure sends a leading chunk with no choices (content filter results)
+                    if event.choices and event.choices[0].delta.content:
+                        pieces.append(event.choices[0].delta.content)
+                        yield event.choices[0].delta.content
+        except Exception as e:
+            raise Exception(f"Error generating report: {str(e)}")
+        self.store_report(patient_data, "".join(pieces))
+
+    async def agenerate_clinical_reports(
+        self, cases: List[Tuple[str, dict]], max_concurrency: int = DEFAULT_REPORT_CONCURRENCY,
+        force_refresh: bool = False
+    ) -> AsyncIterator[Tuple[int, str, Optional[str], Optional[float], Optional[Exception]]]:
+        """
+        Generate reports for many cases concurrently.
+
+        At most ``max_concurrency`` completions are in flight; results are
+        yielded as soon as each finishes, not in input order. Cached reports
+        are returned without a completion unless ``force_refresh``. A failing
+        case does not stop the others. Remaining work is cancelled if the
+        consumer stops iterating.
+
+        Args:
+            cases: (fallnummer, patient data) pairs
+
+        Yields:
+            (input index, fallnummer, report or None, cache age or None, exception or None)
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(index: int, fallnummer: str, patient_data: dict):
+            async with semaphore:
+                try:
+                    report, age = await self.aget_clinical_report(patient_data, force_refresh)
+                    return index, fallnummer, report, age, None
+                except Exception as e:
+                    return index, fallnummer, None, None, e
+
+        tasks = [asyncio.create_task(run(index, fallnummer, data)) for index, (fallnummer, data) in enumerate(cases)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def agenerate_grounded_report(self, patient_data: dict, excerpts: List[str]) -> str:
+        """
+        Generate a clinical report that also recommends next steps from the
+        given guideline excerpts, citing them by number.
+
+        Args:
+            patient_data: Dictionary containing patient information
+            excerpts: Guideline excerpts, each starting with its citation "[n]"
+
+        Returns:
+            Clinical report with a guideline-based recommendations section
+        """
+        prompt = self._construct_grounded_prompt(patient_data, excerpts)
+
+        try:
+            with stage_timer("llm_call"):
+                response = await get_async_client(self.api_version).chat.completions.create(
+                    **self._completion_args(prompt, GROUNDED_REPORT_MAX_TOKENS)
+                )
+            record_usage("chat", self.deployment_name, response.usage)
+
+            return response.choices[0].message.content
+        except Exception as e:
+            raise Exception(f"Error generating report: {str(e)}")
+
+    def _completion_args(self, prompt: str, max_tokens: int = 800) -> dict:
+        """Chat completion parameters shared by the sync and async paths"""
+        return {
+            "model": self.deployment_name,
+            "temperature": 0.0,  # deterministic output
+            "top_p": 1.0,
+            "max_tokens": max_tokens,
+            "messages": [
+                {"role": "system", "content": "You are a clinical summarization assistant for tumor boards."},
+                {"role": "user", "content": prompt}
+            ]
+        }
     
     @staticmethod
     def _construct_prompt(patient_data: dict) -> str:
@@ -59,6 +277,7 @@ class OpenAIService:
         Returns:
             Formatted prompt string
         """
+        patient_data = normalize_prompt_fields(patient_data)
         prompt = f"""
 You are an AI clinical summarization assistant for tumor boards. 
 Use the timeline below to generate a step-by-step summary of the case, identify outdated or missing information, 
@@ -81,7 +300,7 @@ Patient Data:
 - Histology & Cytology: {patient_data.get('Histo Cyto', 'Not provided')}
 - Clinical Staging: cT={patient_data.get('Staging clinic cT', 'N/A')}, cN={patient_data.get('Staging Clinic N', 'N/A')}, cM={patient_data.get('Staging Clinic M', 'N/A')}, UICC={patient_data.get('Staging Clinic UICC', 'N/A')}
 - Pathological Staging: pT={patient_data.get('Staging Path pT', 'N/A')}, pN={patient_data.get('Staging Path N', 'N/A')}, pM={patient_data.get('Staging Path M', 'N/A')}, UICC={patient_data.get('Staging Path UICC', 'N/A')}
-- Treatment Approach: {'Curative' if patient_data.get('curative') == 1 else 'Palliative'}
+- Treatment Approach: {'Curative' if patient_data.get('curative') else 'Palliative'}
 - Prior Therapy: {patient_data.get('therapy so far', 'None documented')}
 
 Instructions for AI:
@@ -101,6 +320,27 @@ Template for Output:
 """
         return prompt
 
+    @classmethod
+    def _construct_grounded_prompt(cls, patient_data: dict, excerpts: List[str]) -> str:
+        """
+        The clinical summary prompt extended with the board's question,
+        numbered guideline excerpts and instructions to cite them.
+        """
+        question = patient_data.get('Question')
+        question = " ".join(str(question).split()) if question else 'None stated'
+        context = "\n\n".join(excerpts) if excerpts else 'No guideline excerpts were found for this case.'
+        return cls._construct_prompt(patient_data) + f"""
+Question to the Tumor Board: {question}
+
+Guideline Excerpts (S3 Guideline and further indexed guidelines):
+{context}
+
+Additional Instructions:
+6. After the Final Assessment add **Guideline-Based Recommendations:** 3-6 bullet points on the next steps for this case, answering the question to the tumor board if one was asked.
+7. Base every recommendation only on the guideline excerpts above and end it with the numbers of the excerpts it relies on, e.g. [2][5]. Never cite an excerpt that does not support the statement.
+8. If the excerpts do not cover an aspect of the case, say so instead of recommending from general knowledge.
+"""
+
 
 # Singleton instance
 openai_service = OpenAIService()
@@ -0,0 +1,137 @@
+import os
+import bisect
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+# PDFs with fewer pages are extracted in-process; starting worker processes
+# costs more than it saves for short documents
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+DEFAULT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or (os.cpu_count() or 1)
+# Pages handed to a worker per task
+PAGES_PER_TASK = 16
+
+
+def count_pages(pdf_path: str) -> int:
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def iter_page_texts(pdf_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of pages [start, stop) one at a time"""
+    with open(pdf_path, 'rb') as file:
+        pages = PyPDF2.PdfReader(file).pages
+        stop = len(pages) if stop is None else min(stop, len(pages))
+        for number in range(start, stop):
+            yield pages[number].extract_text()
+
+
+# Per worker process: the PDF is parsed once when the worker starts rather
+# than once per task (opening a large PDF costs ~0.1s)
+_worker_reader: Optional[PyPDF2.PdfReader] = None
+
+
+def _open_worker_reader(pdf_path: str) -> None:
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(pdf_path)
+
+
+def _extract_page_range(start: int, stop: int) -> List[str]:
+    pages = _worker_reader.pages
+    return [pages[number].extract_text() for number in range(start, stop)]
+
+
+def extract_pages(pdf_path: str, progress: Optional[Callable[[int, int], None]] = None,
+                  max_workers: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page number starting at 1, page text) in document order.
+
+    Large PDFs are split into page ranges that are extracted by a process
+    pool (PyPDF2 is pure Python, so threads would not help); results are
+    still yielded in order as soon as the next range is ready. ``progress``
+    is called with (pages done, total pages) after each page.
+    """
+    total = count_pages(pdf_path)
+    workers = min(max_workers or DEFAULT_WORKERS, max(1, total // PAGES_PER_TASK))
+
+    if total < PARALLEL_MIN_PAGES or workers <= 1:
+        for number, text in enumerate(iter_page_texts(pdf_path), start=1):
+            if progress is not None:
+                progress(number, total)
+            yield number, text
+        return
+
+    # spawn, not fork: the server process has live threads and an event loop
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_open_worker_reader,
+        initargs=(pdf_path,),
+    )
+    try:
+        futures = [
+            executor.submit(_extract_page_range, start, min(start + PAGES_PER_TASK, total))
+            for start in range(0, total, PAGES_PER_TASK)
+        ]
+        number = 0
+        for future in futures:
+            for text in future.result():
+                number += 1
+                if progress is not None:
+                    progress(number, total)
+                yield number, text
+    finally:
+        # Also runs when the consumer stops early (e.g. indexing cancelled)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def chunk_pages(pages: Iterable[Tuple[int, str]], chunk_size: int = 800,
+                overlap: int = 150) -> Iterator[Tuple[str, int, int]]:
+    """
+    Split page texts into overlapping character windows, streaming.
+
+    Produces the same chunks as RAGSystem.chunk_text on the pages joined with
+    newlines, but keeps only about one chunk of text buffered and reports
+    the first and last page each chunk was taken from.
+
+    Yields:
+        (chunk text, first page, last page)
+    """
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError("overlap must be smaller than chunk_size")
+
+    buffer = ""
+    buffer_start = 0  # document offset of buffer[0]
+    next_start = 0  # document offset of the next chunk
+    page_starts: List[int] = []
+    page_numbers: List[int] = []
+
+    def page_at(offset: int) -> int:
+        return page_numbers[bisect.bisect_right(page_starts, offset) - 1]
+
+    def emit(start: int, end: int) -> Tuple[str, int, int]:
+        text = buffer[start - buffer_start:end - buffer_start]
+        return text, page_at(start), page_at(start + len(text) - 1)
+
+    for number, text in pages:
+        page_starts.append(buffer_start + len(buffer))
+        page_numbers.append(number)
+        buffer += text + "\n"
+        buffer_end = buffer_start + len(buffer)
+
+        while next_start + chunk_size <= buffer_end:
+            yield emit(next_start, next_start + chunk_size)
+            next_start += step
+
+        # Drop text no future chunk can reach
+        if next_start > buffer_start:
+            buffer = buffer[next_start - buffer_start:]
+            buffer_start = next_start
+
+    buffer_end = buffer_start + len(buffer)
+    while next_start < buffer_end:
+        yield emit(next_start, min(next_start + chunk_size, buffer_end))
+        next_start += step
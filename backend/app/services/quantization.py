@@ -0,0 +1,161 @@
+import numpy as np
+from typing import Optional, Tuple
+
+# Rows converted per block, so a memory-mapped index is never copied whole.
+# Small enough for a block's float32 copy to stay in cache while it is scored.
+QUANTIZE_BLOCK_ROWS = 1024
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def fit_dimensions(vectors: np.ndarray, dim: Optional[int]) -> np.ndarray:
+    """
+    Matryoshka truncation: keep the first ``dim`` components and re-normalize.
+
+    text-embedding-3 models are trained so that a prefix of the embedding is
+    itself a usable embedding (the API's ``dimensions`` parameter does the
+    same). Works on a single vector or a matrix; vectors that are already at
+    most ``dim`` wide are returned unchanged.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not dim or dim >= vectors.shape[-1]:
+        return vectors
+    truncated = np.array(vectors[..., :dim], dtype=np.float32, order="C")
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    truncated /= norms
+    return truncated
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-dimension scalar quantization to int8.
+
+    Each dimension's [min, max] over all rows is mapped onto the 256 codes,
+    so ``row ~= offset + scale * code`` with an error of at most scale / 2
+    per component.
+
+    Returns:
+        (codes, scale, offset): (count, dim) int8 codes and (dim,) float32
+        scale and offset
+    """
+    count, dim = vectors.shape
+    low = np.full(dim, np.inf, dtype=np.float32)
+    high = np.full(dim, -np.inf, dtype=np.float32)
+    for start in range(0, count, QUANTIZE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + QUANTIZE_BLOCK_ROWS], dtype=np.float32)
+        low = np.minimum(low, block.min(axis=0))
+        high = np.maximum(high, block.max(axis=0))
+    if count == 0:
+        low, high = np.zeros(dim, dtype=np.float32), np.zeros(dim, dtype=np.float32)
+
+    scale = (high - low) / 255.0
+    scale[scale == 0] = 1.0
+    offset = low + 128.0 * scale
+
+    codes = np.empty((count, dim), dtype=np.int8)
+    for start in range(0, count, QUANTIZE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + QUANTIZE_BLOCK_ROWS], dtype=np.float32)
+        codes[start:start + QUANTIZE_BLOCK_ROWS] = np.clip(np.rint((block - offset) / scale), -128, 127)
+    return codes, scale.astype(np.float32), offset.astype(np.float32)
+
+
+class Int8Vectors:
+    """
+    Read-only matrix of int8 scalar-quantized rows (see quantize_int8).
+
+    Indexing returns dequantized float32 rows, so it can stand in for the
+    float embedding matrix wherever rows are read. score() computes dot
+    products against the codes directly: ``q . (offset + scale * c)`` is
+    ``(q * scale) . c + q . offset``, one product per block of rows.
+    """
+    dtype = np.dtype(np.int8)
+    ndim = 2
+
+    def __init__(self, codes: np.ndarray, scale: np.ndarray, offset: np.ndarray):
+        self.codes = codes
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scale.nbytes + self.offset.nbytes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index) -> np.ndarray:
+        return np.asarray(self.codes[index], dtype=np.float32) * self.scale + self.offset
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        rows = self[:]
+        return rows if dtype is None else rows.astype(dtype, copy=False)
+
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """Dot product of every dequantized row with the query, as float32"""
+        query = np.asarray(query, dtype=np.float32)
+        scaled = query * self.scale
+        bias = np.float32(query @ self.offset)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), QUANTIZE_BLOCK_ROWS):
+            block = np.asarray(self.codes[start:start + QUANTIZE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + QUANTIZE_BLOCK_ROWS] = block @ scaled + bias
+        return scores
+
+
+def pack_signs(vectors: np.ndarray) -> np.ndarray:
+    """
+    1-bit quantization: the sign of every component, packed 8 per byte.
+
+    Rows are padded with zero bits to a multiple of 64 dimensions so they
+    can be compared as uint64 words (3072 dims -> 384 bytes per row).
+    """
+    vectors = vectors if vectors.ndim == 2 else np.asarray(vectors).reshape(1, -1)
+    count, dim = vectors.shape
+    width = (dim + 63) // 64 * 8
+    bits = np.zeros((count, width), dtype=np.uint8)
+    for start in range(0, count, QUANTIZE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + QUANTIZE_BLOCK_ROWS], dtype=np.float32)
+        packed = np.packbits(block > 0, axis=1)
+        bits[start:start + QUANTIZE_BLOCK_ROWS, :packed.shape[1]] = packed
+    return bits
+
+
+def _popcount64(words: np.ndarray) -> np.ndarray:
+    """
+    Set bits per uint64 word (bitwise_count on NumPy 2, SWAR otherwise).
+    Overwrites ``words``.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    shifted = np.right_shift(words, np.uint64(1))
+    shifted &= _M1
+    words -= shifted
+    np.right_shift(words, np.uint64(2), out=shifted)
+    shifted &= _M2
+    words &= _M2
+    words += shifted
+    np.right_shift(words, np.uint64(4), out=shifted)
+    words += shifted
+    words &= _M4
+    words *= _H01
+    words >>= np.uint64(56)
+    return words
+
+
+def hamming_distances(bits: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+    """Hamming distance between every packed row and the packed query"""
+    words = bits.view(np.uint64)
+    query_words = np.ascontiguousarray(query_bits).view(np.uint64).reshape(-1)
+    distances = np.empty(len(bits), dtype=np.int32)
+    for start in range(0, len(bits), QUANTIZE_BLOCK_ROWS):
+        block = np.bitwise_xor(words[start:start + QUANTIZE_BLOCK_ROWS], query_words)
+        distances[start:start + QUANTIZE_BLOCK_ROWS] = _popcount64(block).sum(axis=1, dtype=np.int32)
+    return distances
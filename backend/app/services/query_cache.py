@@ -0,0 +1,175 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# Query embeddings kept by exact question text (0 disables)
+DEFAULT_EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+# Answers kept by the semantic cache (0 disables)
+DEFAULT_ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "1000"))
+# Minimum cosine similarity between two questions for a cached answer to be reused
+DEFAULT_ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+# Seconds a cached answer is served
+DEFAULT_ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", str(24 * 3600)))
+
+
+def normalize_question(question: str) -> str:
+    """Key for the exact cache; surrounding and repeated whitespace is ignored"""
+    return " ".join(question.split())
+
+
+class QueryEmbeddingCache:
+    """
+    LRU of query embeddings keyed by normalized question text, so a repeated
+    question skips the embeddings request. ``saved_seconds`` estimates the
+    time saved from the average latency of the requests that did run.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._miss_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def get(self, question: str) -> Optional[np.ndarray]:
+        key = normalize_question(question)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self.misses:
+                self.saved_seconds += self._miss_seconds / self.misses
+            return vector
+
+    def put(self, question: str, vector: np.ndarray, seconds: float) -> None:
+        """Store the embedding of a question that took ``seconds`` to compute"""
+        if self.max_entries <= 0:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            self._miss_seconds += seconds
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedAnswer:
+    """A RAG answer with the question it was generated for"""
+
+    __slots__ = ("question", "scope", "answer", "chunks", "created_at", "cost_seconds")
+
+    def __init__(self, question: str, scope: Hashable, answer: str, chunks: List[dict], cost_seconds: float):
+        self.question = question
+        self.scope = scope
+        self.answer = answer
+        self.chunks = chunks
+        self.created_at = time.time()
+        self.cost_seconds = cost_seconds
+
+
+class SemanticAnswerCache:
+    """
+    Answers reused for questions whose embeddings are within a cosine
+    threshold of an earlier question.
+
+    Only entries with the same scope (model, top_k, temperature, search
+    parameters and index version) are candidates. Question embeddings sit in
+    one preallocated unit-norm matrix, so a lookup is a single matrix-vector
+    product over at most ``max_entries`` rows; when full, the least recently
+    used slot is overwritten.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_ANSWER_CACHE_SIZE,
+                 threshold: float = DEFAULT_ANSWER_CACHE_THRESHOLD, ttl: float = DEFAULT_ANSWER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None  # allocated on first store, once the dimension is known
+        self._entries: List[Optional[CachedAnswer]] = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def lookup(self, query: np.ndarray, scope: Hashable) -> Optional[Tuple[CachedAnswer, float]]:
+        """Return (closest cached answer in scope, cosine similarity) if above the threshold"""
+        now = time.time()
+        with self._lock:
+            best = None
+            if self._vectors is not None and self._vectors.shape[1] == query.shape[0]:
+                scores = self._vectors @ query
+                candidates = np.flatnonzero(scores >= self.threshold)
+                for slot in candidates[np.argsort(-scores[candidates])]:
+                    entry = self._entries[slot]
+                    if entry is None or entry.scope != scope:
+                        continue
+                    if now - entry.created_at > self.ttl:
+                        self._entries[slot] = None
+                        self._last_used[slot] = 0.0
+                        continue
+                    best = (entry, float(scores[slot]))
+                    self._last_used[slot] = now
+                    break
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_seconds += best[0].cost_seconds
+            return best
+
+    def store(self, query: np.ndarray, entry: CachedAnswer) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self._vectors = np.zeros((self.max_entries, query.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.max_entries
+                self._last_used[:] = 0.0
+            # Empty slots have last_used 0, so they are filled before anything is evicted
+            slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = query
+            self._entries[slot] = entry
+            self._last_used[slot] = time.time()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(entry is not None for entry in self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = [None] * self.max_entries
+            self._last_used[:] = 0.0
@@ -0,0 +1,254 @@
+import os
+import re
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.services.index_store import index_size_bytes, remove_index
+
+# Directory holding one subdirectory per collection
+DEFAULT_COLLECTIONS_DIR = os.getenv("RAG_COLLECTIONS_DIR", "rag_collections")
+# Collections kept open in memory; the least recently queried one is closed first
+DEFAULT_MAX_RESIDENT = int(os.getenv("RAG_MAX_RESIDENT_COLLECTIONS", "4"))
+
+# On-disk layout of a collection (e.g. ``rag_collections/nccn/``):
+#
+#   collection.json     name, creation time and the documents it contains
+#   <document_id>.index one index directory per document (index_store format,
+#                       with its own ANN and BM25 structures)
+#
+# Adding a document writes one new index directory and then the manifest;
+# removing one rewrites the manifest and deletes its directory. The other
+# documents are neither re-embedded nor rewritten.
+
+COLLECTION_FILE = "collection.json"
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+class CollectionNotFound(KeyError):
+    """Raised for a collection or document that does not exist"""
+
+
+def validate_collection_name(name: str) -> str:
+    if not _NAME.match(name or ""):
+        raise ValueError(
+            f"Invalid collection name '{name}': use up to 64 letters, digits, '-' or '_'"
+        )
+    return name
+
+
+class Collection:
+    """
+    A loaded collection: one IndexSnapshot per document. Like IndexSnapshot
+    it is never modified in place; adding or removing a document produces a
+    new Collection that reuses the other snapshots.
+
+    ``version`` comes from collection.json (creation time and a revision
+    bumped by every change), so cached answers stay valid when an evicted
+    collection is opened again unchanged.
+    """
+
+    def __init__(self, name: str, manifest: dict, segments: Dict[str, object]):
+        self.name = name
+        self.version = (manifest.get("created_at"), manifest.get("revision", 0))
+        self.documents = manifest["documents"]
+        self.segments = segments
+
+    @property
+    def chunks_count(self) -> int:
+        return sum(len(segment.chunks) for segment in self.segments.values())
+
+
+class CollectionManager:
+    """
+    Named collections of indexed documents, loaded on first use.
+
+    At most ``max_resident`` collections are kept open; opening another one
+    closes the least recently used. Snapshots are memory-mapped, so a closed
+    collection only gives up its heap structures (ANN graphs, BM25
+    vocabularies) and page cache that the OS can reclaim. Queries that
+    already hold a Collection keep using it after it is evicted.
+    """
+
+    def __init__(self, rag_system, root: str = DEFAULT_COLLECTIONS_DIR,
+                 max_resident: int = DEFAULT_MAX_RESIDENT):
+        self.rag_system = rag_system
+        self.root = root
+        self.max_resident = max(1, max_resident)
+        self._resident: "OrderedDict[str, Collection]" = OrderedDict()
+        # Guards the resident LRU and collection.json read-modify-write
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, validate_collection_name(name))
+
+    def _segment_path(self, name: str, document_id: str) -> str:
+        return os.path.join(self._path(name), f"{document_id}.index")
+
+    def _open_segment(self, name: str, document_id: str, document: dict):
+        source = {"collection": name, "document_id": document_id, "source_name": document.get("source_name")}
+        return self.rag_system.open_snapshot(self._segment_path(name, document_id), source)
+
+    def _read_manifest(self, name: str) -> dict:
+        path = os.path.join(self._path(name), COLLECTION_FILE)
+        if not os.path.exists(path):
+            raise CollectionNotFound(name)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, name: str, manifest: dict) -> None:
+        path = os.path.join(self._path(name), COLLECTION_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def exists(self, name: str) -> bool:
+        try:
+            return os.path.exists(os.path.join(self._path(name), COLLECTION_FILE))
+        except ValueError:
+            return False
+
+    def names(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if self.exists(name))
+
+    def resident_names(self) -> List[str]:
+        """Loaded collections, least recently used first"""
+        return list(self._resident)
+
+    def get(self, name: str) -> Collection:
+        """Return a loaded collection, opening it (and evicting another) if needed"""
+        with self._lock:
+            collection = self._resident.get(name)
+            if collection is not None:
+                self._resident.move_to_end(name)
+                return collection
+            manifest = self._read_manifest(name)
+            segments = {
+                document_id: self._open_segment(name, document_id, document)
+                for document_id, document in manifest["documents"].items()
+            }
+            collection = Collection(name, manifest, segments)
+            print(f"Opened collection '{name}' ({len(segments)} documents, {collection.chunks_count} chunks)")
+            self.loads += 1
+            self._resident[name] = collection
+            while len(self._resident) > self.max_resident:
+                evicted, _ = self._resident.popitem(last=False)
+                self.evictions += 1
+                print(f"Closed collection '{evicted}' (more than {self.max_resident} resident)")
+            return collection
+
+    def add_document(self, name: str, pdf_path: str, chunk_size: Optional[int] = None,
+                     overlap: Optional[int] = None,
+                     progress: Optional[Callable[[str, int, int], None]] = None,
+                     should_cancel: Optional[Callable[[], bool]] = None,
+                     source_name: Optional[str] = None, chunker: Optional[str] = None) -> dict:
+        """
+        Index a PDF into a collection, creating the collection if needed.
+
+        The document id is derived from the file's SHA-256, so adding the same
+        PDF again replaces its previous chunks. Only this document is
+        embedded; the embedding cache skips chunks seen before.
+
+        Returns:
+            Summary with collection, document_id, chunks_count and embedding cache hits/misses
+        """
+        validate_collection_name(name)
+        chunks, embeddings, page_ranges, metadata, cache_stats = self.rag_system.prepare_document(
+            pdf_path, chunk_size, overlap, progress, should_cancel, source_name, chunker
+        )
+        document_id = metadata["source_sha256"][:16]
+
+        with self._lock:
+            os.makedirs(self._path(name), exist_ok=True)
+            try:
+                manifest = self._read_manifest(name)
+            except CollectionNotFound:
+                manifest = {"name": name, "created_at": datetime.now().isoformat(), "documents": {}}
+
+            self.rag_system.save_index(self._segment_path(name, document_id), chunks, embeddings, metadata,
+                                       page_ranges)
+            manifest["revision"] = manifest.get("revision", 0) + 1
+            manifest["documents"][document_id] = {
+                "source_name": metadata["source_name"],
+                "source_sha256": metadata["source_sha256"],
+                "chunks_count": len(chunks),
+                "chunker": metadata["chunker"],
+                "chunk_size": metadata["chunk_size"],
+                "overlap": metadata["overlap"],
+                "added_at": datetime.now().isoformat(),
+            }
+            self._write_manifest(name, manifest)
+
+            resident = self._resident.get(name)
+            if resident is not None:
+                segments = dict(resident.segments)
+                segments[document_id] = self._open_segment(name, document_id, manifest["documents"][document_id])
+                self._resident[name] = Collection(name, manifest, segments)
+
+        print(f"Added {metadata['source_name']} to collection '{name}' as {document_id} ({len(chunks)} chunks)")
+        return {
+            "collection": name,
+            "document_id": document_id,
+            "chunks_count": len(chunks),
+            "chunker": metadata["chunker"],
+            "embedding_cache": cache_stats,
+        }
+
+    def remove_document(self, name: str, document_id: str) -> dict:
+        """Remove one document from a collection; the others stay as they are"""
+        with self._lock:
+            manifest = self._read_manifest(name)
+            document = manifest["documents"].pop(document_id, None)
+            if document is None:
+                raise CollectionNotFound(f"{name}/{document_id}")
+            manifest["revision"] = manifest.get("revision", 0) + 1
+            self._write_manifest(name, manifest)
+
+            resident = self._resident.get(name)
+            if resident is not None:
+                segments = {key: value for key, value in resident.segments.items() if key != document_id}
+                self._resident[name] = Collection(name, manifest, segments)
+            # Queries still holding the old snapshot keep their mapped pages
+            remove_index(self._segment_path(name, document_id))
+        return document
+
+    def delete(self, name: str) -> None:
+        """Delete a collection and all its documents"""
+        with self._lock:
+            if not self.exists(name):
+                raise CollectionNotFound(name)
+            self._resident.pop(name, None)
+            shutil.rmtree(self._path(name))
+
+    def describe(self, name: str) -> dict:
+        """Documents, chunk count, size on disk and whether the collection is loaded"""
+        manifest = self._read_manifest(name)
+        path = self._path(name)
+        documents = [
+            {"document_id": document_id, **info} for document_id, info in manifest["documents"].items()
+        ]
+        return {
+            "name": name,
+            "created_at": manifest.get("created_at"),
+            "documents": documents,
+            "chunks_count": sum(document["chunks_count"] for document in documents),
+            "size_bytes": sum(index_size_bytes(self._segment_path(name, d["document_id"])) for d in documents)
+            + os.path.getsize(os.path.join(path, COLLECTION_FILE)),
+            "resident": name in self._resident,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "collections": len(self.names()),
+            "resident": self.resident_names(),
+            "max_resident": self.max_resident,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
@@ -1,50 +1,705 @@
 import os
 import json
-import pickle
+import asyncio
+import hashlib
+import heapq
+import time
+import itertools
+import threading
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
 import numpy as np
-from typing import List, Tuple, Optional
-import PyPDF2
+from typing import AsyncIterator, Callable, List, Tuple, Optional
+
+from app.core.metrics import stage_timer, observe_stage, record_usage, TimedIterator
+from app.services.embedding_cache import EmbeddingCache, default_cache_path, text_sha256
+from app.services.embedding_pipeline import EmbeddingPipeline, run_sync
+from app.services.openai_clients import get_async_client, get_sync_client
+from app.services.query_cache import (
+    QueryEmbeddingCache, SemanticAnswerCache, CachedAnswer, DEFAULT_ANSWER_CACHE_SIZE
+)
+from app.services.index_store import (
+    index_path_for, index_size_bytes, write_index, open_index, read_pages,
+    read_legacy_pickle, remove_index, SUPPORTED_DTYPES
+)
+from app.services.pdf_extraction import extract_pages
+from app.services.quantization import Int8Vectors, fit_dimensions, pack_signs, hamming_distances
+from app.services.chunking import chunk_document, resolve_chunk_params
+from app.services.lexical_index import BM25Index, RETRIEVAL_MODES, reciprocal_rank_fusion
+from app.services.rag_collections import CollectionManager
+from app.services.reranking import (
+    mmr_order, pack_context, resolve_rerank, RERANK_FETCH_FACTOR, DEFAULT_CONTEXT_TOKENS
+)
 
 # Load environment variables
 load_dotenv()
 
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+# Rows scored per block when the index is stored in reduced precision
+SCORE_BLOCK_ROWS = 1024
+
+# Hamming shortlist of the binary index, as a multiple of top_k, rescored with the full vectors
+BINARY_RESCORE_FACTOR = int(os.getenv("RAG_BINARY_RESCORE_FACTOR", "20"))
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return a contiguous float32 matrix whose rows have unit L2 norm.
+
+    Zero rows are left as zeros so they score 0 against every query, which
+    matches the behaviour of the old per-chunk cosine similarity.
+    """
+    matrix = np.array(vectors, dtype=np.float32, order="C")
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.size == 0:
+        return matrix.reshape(len(matrix), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def score_rows(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Dot product of every row with the query, as float32.
+
+    float32 matrices go straight to BLAS. Reduced-precision (float16) matrices
+    are upcast block by block so a memory-mapped index is never copied whole;
+    int8 indexes are scored against their codes (see Int8Vectors.score).
+    """
+    if isinstance(matrix, Int8Vectors):
+        return matrix.score(query)
+    if matrix.dtype == np.float32:
+        return matrix @ query
+    scores = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], SCORE_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        scores[start:start + SCORE_BLOCK_ROWS] = block @ query
+    return scores
+
+
+def top_k_similar(matrix: np.ndarray, query: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """Score a unit-norm query against a row-normalized matrix and return the top_k rows.
+
+    Uses a single matrix-vector product and a partial selection (argpartition),
+    so only the k winners are sorted instead of the full score array.
+    """
+    n = matrix.shape[0]
+    if n == 0 or top_k <= 0:
+        return []
+    scores = score_rows(matrix, query)
+    k = min(top_k, n)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(int(i), float(scores[i])) for i in order]
+
+
+def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for every row, computed block by block"""
+    assign = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + SCORE_BLOCK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+class VectorIndex:
+    """
+    Nearest-neighbour search over the unit-norm embedding matrix.
+
+    Backends only own their auxiliary structures (centroids, graph); the
+    vectors stay in the memory-mapped index and are passed in. Subclasses
+    implement build/search and, if they have anything to persist, save/load
+    into ``file_name`` inside the index directory.
+    """
+    kind = "flat"
+    file_name: Optional[str] = None
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def build(self) -> "VectorIndex":
+        """Build auxiliary structures from self.vectors and return self"""
+        return self
+
+    def search(self, query: np.ndarray, top_k: int, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return (row index, similarity) pairs, best first"""
+        raise NotImplementedError
+
+    def save(self, directory: str) -> None:
+        """Persist auxiliary structures into an index directory"""
+
+    @classmethod
+    def load(cls, vectors: np.ndarray, directory: str) -> Optional["VectorIndex"]:
+        """Load persisted structures, or None if missing or built for other vectors"""
+        return cls(vectors)
+
+    def _save_arrays(self, directory: str, **arrays) -> None:
+        path = os.path.join(directory, self.file_name)
+        tmp_path = f"{path[:-len('.npz')]}.tmp.npz"
+        np.savez(tmp_path, kind=np.array(self.kind), count=np.array(len(self.vectors)), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def _load_arrays(cls, vectors: np.ndarray, directory: str):
+        path = os.path.join(directory, cls.file_name)
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        if str(data["kind"]) != cls.kind or int(data["count"]) != len(vectors):
+            return None
+        return data
+
+
+class BruteForceIndex(VectorIndex):
+    """Exact search: one matrix-vector product over every row"""
+    kind = "flat"
+
+    def search(self, query, top_k, nprobe=None, ef_search=None):
+        return top_k_similar(self.vectors, query, top_k)
+
+
+class IVFFlatIndex(VectorIndex):
+    """
+    Inverted-file index with a spherical k-means coarse quantizer.
+
+    Rows are grouped into ``nlist`` clusters; a query scores the centroids and
+    then only the rows of the ``nprobe`` closest clusters, exactly.
+    """
+    kind = "ivf"
+    file_name = "ivf.npz"
+    default_nprobe = 8
+
+    def __init__(self, vectors: np.ndarray, nlist: Optional[int] = None,
+                 n_iter: int = 10, seed: int = 0):
+        super().__init__(vectors)
+        self.nlist = nlist
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.list_order = np.empty(0, dtype=np.int64)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+
+    def build(self):
+        n = len(self.vectors)
+        if n == 0:
+            return self
+        nlist = min(self.nlist or max(1, int(4 * np.sqrt(n))), n)
+        rng = np.random.default_rng(self.seed)
+
+        # Train on a sample, then assign every row to its closest centroid
+        sample_rows = np.sort(rng.choice(n, size=min(n, max(64 * nlist, 10_000)), replace=False))
+        sample = np.asarray(self.vectors[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assign = _nearest_centroid(sample, centroids)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)))[filled]
+            sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty clusters with random sample rows
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+            centroids = normalize_rows(sums)
+
+        assign = _nearest_centroid(self.vectors, centroids)
+        self.centroids = centroids
+        self.list_order = np.argsort(assign, kind="stable").astype(np.int64)
+        self.list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        self.list_offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+        return self
+
+    def search(self, query, top_k, nprobe=None, ef_search=None):
+        if len(self.centroids) == 0:
+            return []
+        nprobe = min(nprobe or self.default_nprobe, len(self.centroids))
+        probes = [i for i, _ in top_k_similar(self.centroids, query, nprobe)]
+        candidates = np.sort(np.concatenate([
+            self.list_order[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes
+        ]))
+        if len(candidates) == 0:
+            return []
+        hits = top_k_similar(self.vectors[candidates], query, top_k)
+        return [(int(candidates[i]), score) for i, score in hits]
+
+    def save(self, directory):
+        self._save_arrays(directory, centroids=self.centroids,
+                          list_order=self.list_order, list_offsets=self.list_offsets)
+
+    @classmethod
+    def load(cls, vectors, directory):
+        data = cls._load_arrays(vectors, directory)
+        if data is None:
+            return None
+        index = cls(vectors, nlist=len(data["centroids"]))
+        index.centroids = data["centroids"]
+        index.list_order = data["list_order"]
+        index.list_offsets = data["list_offsets"]
+        return index
+
+
+class HNSWIndex(VectorIndex):
+    """
+    Hierarchical Navigable Small World graph (Malkov & Yashunin).
+
+    Built incrementally in Python with NumPy scoring of neighbour batches.
+    After build the graph is frozen into padded int32 adjacency arrays (one
+    per level, -1 = empty slot) which are what gets persisted and searched.
+    """
+    kind = "hnsw"
+    file_name = "hnsw.npz"
+    default_ef_search = 64
+
+    def __init__(self, vectors: np.ndarray, m: int = 16, ef_construction: int = 100, seed: int = 0):
+        super().__init__(vectors)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.seed = seed
+        self.entry_point = -1
+        self.levels = np.empty(0, dtype=np.int32)
+        self.level_nodes: List[np.ndarray] = []
+        self.adjacency: List[np.ndarray] = []
+        self._graph: Optional[List[dict]] = None
+        self._dense: Optional[np.ndarray] = None
+
+    def _capacity(self, level: int) -> int:
+        return 2 * self.m if level == 0 else self.m
+
+    def _neighbors(self, level: int, node: int) -> List[int]:
+        if self._graph is not None:
+            return self._graph[level][node]
+        if level == 0:
+            row = self.adjacency[0][node]
+        else:
+            row = self.adjacency[level][np.searchsorted(self.level_nodes[level], node)]
+        return row[row >= 0].tolist()
+
+    def _score(self, ids: List[int], query: np.ndarray) -> np.ndarray:
+        if self._dense is not None:
+            return self._dense[ids] @ query
+        return score_rows(self.vectors[ids], query)
+
+    def _search_layer(self, query: np.ndarray, entry_points: List[int], ef: int,
+                      level: int) -> List[Tuple[float, int]]:
+        visited = set(entry_points)
+        entry_scores = self._score(entry_points, query).tolist()
+        candidates = [(-s, e) for s, e in zip(entry_scores, entry_points)]
+        results = [(s, e) for s, e in zip(entry_scores, entry_points)]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_score, node = heapq.heappop(candidates)
+            if -neg_score < results[0][0] and len(results) >= ef:
+                break
+            fresh = [n for n in self._neighbors(level, node) if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for score, n in zip(self._score(fresh, query).tolist(), fresh):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, n))
+                    heapq.heappush(results, (score, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def _select_neighbors(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """Diversity heuristic: keep a candidate only if it is closer to the new
+        node than to every neighbour selected so far; top up with the rest."""
+        selected: List[int] = []
+        pruned: List[int] = []
+        for score, node in candidates:
+            if len(selected) >= m:
+                break
+            if not selected or np.all(self._dense[selected] @ self._dense[node] < score):
+                selected.append(node)
+            else:
+                pruned.append(node)
+        return selected + pruned[:m - len(selected)]
+
+    def _insert(self, node: int) -> None:
+        query = self._dense[node]
+        level = int(self.levels[node])
+        while len(self._graph) <= level:
+            self._graph.append({})
+
+        if self.entry_point < 0:
+            for lvl in range(level + 1):
+                self._graph[lvl][node] = []
+            self.entry_point = node
+            return
+
+        top_level = int(self.levels[self.entry_point])
+        entry = [self.entry_point]
+        for lvl in range(top_level, level, -1):
+            entry = [self._search_layer(query, entry, 1, lvl)[0][1]]
+
+        for lvl in range(level, -1, -1):
+            if lvl > top_level:
+                self._graph[lvl][node] = []
+                continue
+            candidates = self._search_layer(query, entry, self.ef_construction, lvl)
+            neighbors = self._select_neighbors(candidates, self.m)
+            self._graph[lvl][node] = neighbors
+            capacity = self._capacity(lvl)
+            for neighbor in neighbors:
+                links = self._graph[lvl][neighbor]
+                links.append(node)
+                if len(links) > capacity:
+                    sims = self._dense[links] @ self._dense[neighbor]
+                    keep = np.argsort(-sims)[:capacity]
+                    self._graph[lvl][neighbor] = [links[i] for i in keep]
+            entry = [n for _, n in candidates]
+
+        if level > top_level:
+            self.entry_point = node
+
+    def build(self):
+        n = len(self.vectors)
+        rng = np.random.default_rng(self.seed)
+        ml = 1 / np.log(self.m)
+        self.levels = np.floor(-np.log(1.0 - rng.random(n)) * ml).astype(np.int32)
+        self.entry_point = -1
+        self._graph = []
+        self._dense = np.asarray(self.vectors, dtype=np.float32)
+        try:
+            for node in range(n):
+                self._insert(node)
+            self._freeze()
+        finally:
+            self._graph = None
+            self._dense = None
+        return self
+
+    def _freeze(self) -> None:
+        self.level_nodes = []
+        self.adjacency = []
+        for lvl, links in enumerate(self._graph):
+            nodes = np.flatnonzero(self.levels >= lvl).astype(np.int64)
+            adjacency = np.full((len(nodes), self._capacity(lvl)), -1, dtype=np.int32)
+            for row, node in enumerate(nodes):
+                neighbors = links.get(int(node), [])
+                adjacency[row, :len(neighbors)] = neighbors
+            self.level_nodes.append(nodes)
+            self.adjacency.append(adjacency)
+
+    def search(self, query, top_k, nprobe=None, ef_search=None):
+        if self.entry_point < 0 or top_k <= 0:
+            return []
+        ef = max(ef_search or self.default_ef_search, top_k)
+        entry = [self.entry_point]
+        for lvl in range(len(self.adjacency) - 1, 0, -1):
+            entry = [self._search_layer(query, entry, 1, lvl)[0][1]]
+        results = self._search_layer(query, entry, ef, 0)[:top_k]
+        return [(int(node), float(score)) for score, node in results]
+
+    def save(self, directory):
+        arrays = {
+            "levels": self.levels,
+            "entry_point": np.array(self.entry_point),
+            "params": np.array([self.m, self.ef_construction]),
+            "num_levels": np.array(len(self.adjacency)),
+        }
+        for lvl, (nodes, adjacency) in enumerate(zip(self.level_nodes, self.adjacency)):
+            arrays[f"nodes_{lvl}"] = nodes
+            arrays[f"adjacency_{lvl}"] = adjacency
+        self._save_arrays(directory, **arrays)
+
+    @classmethod
+    def load(cls, vectors, directory):
+        data = cls._load_arrays(vectors, directory)
+        if data is None:
+            return None
+        m, ef_construction = (int(x) for x in data["params"])
+        index = cls(vectors, m=m, ef_construction=ef_construction)
+        index.levels = data["levels"]
+        index.entry_point = int(data["entry_point"])
+        num_levels = int(data["num_levels"])
+        index.level_nodes = [data[f"nodes_{lvl}"] for lvl in range(num_levels)]
+        index.adjacency = [data[f"adjacency_{lvl}"] for lvl in range(num_levels)]
+        return index
+
+
+class BinaryIndex(VectorIndex):
+    """
+    1-bit sign quantization with a Hamming pre-filter and float rescoring.
+
+    Every row is reduced to the signs of its components, packed 8 per byte
+    (384 bytes for 3072 dimensions against 12 KB of float32), and only these
+    bits are held in memory. A query ranks all rows by Hamming distance to
+    its own sign pattern and rescores the closest ``ef_search`` rows (default
+    BINARY_RESCORE_FACTOR x top_k) exactly against the stored vectors, so
+    only those rows of the memory-mapped index are read.
+    """
+    kind = "binary"
+    file_name = "binary.npz"
+
+    def __init__(self, vectors: np.ndarray, rescore_factor: int = BINARY_RESCORE_FACTOR):
+        super().__init__(vectors)
+        self.rescore_factor = rescore_factor
+        self.bits = np.empty((0, 0), dtype=np.uint8)
+
+    def build(self):
+        self.bits = pack_signs(self.vectors)
+        return self
+
+    def search(self, query, top_k, nprobe=None, ef_search=None):
+        n = len(self.bits)
+        if n == 0 or top_k <= 0:
+            return []
+        shortlist = min(max(ef_search or top_k * self.rescore_factor, top_k), n)
+        distances = hamming_distances(self.bits, pack_signs(query))
+        if shortlist < n:
+            candidates = np.sort(np.argpartition(distances, shortlist - 1)[:shortlist])
+        else:
+            candidates = np.arange(n)
+        hits = top_k_similar(self.vectors[candidates], query, top_k)
+        return [(int(candidates[i]), score) for i, score in hits]
+
+    def save(self, directory):
+        self._save_arrays(directory, bits=self.bits)
+
+    @classmethod
+    def load(cls, vectors, directory):
+        data = cls._load_arrays(vectors, directory)
+        if data is None:
+            return None
+        index = cls(vectors)
+        index.bits = data["bits"]
+        return index
+
+
+VECTOR_INDEXES = {
+    BruteForceIndex.kind: BruteForceIndex,
+    IVFFlatIndex.kind: IVFFlatIndex,
+    HNSWIndex.kind: HNSWIndex,
+    BinaryIndex.kind: BinaryIndex,
+}
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# (chunk text, similarity, source pages or None, source document or None)
+RetrievedChunk = Tuple[str, float, Optional[List[int]], Optional[dict]]
+
+
+class IndexingCancelled(Exception):
+    """Raised inside RAGSystem.build_index when the caller asked to stop"""
+
+
+_snapshot_versions = itertools.count(1)
+
+
+class IndexSnapshot:
+    """
+    One loaded index: chunk texts, unit-norm vectors, ANN structures and
+    metadata. RAGSystem replaces the whole snapshot with a single assignment,
+    so a query that grabbed it never mixes chunks of one index with vectors
+    of another while a rebuild is being swapped in.
+
+    ``pages`` is a (count, 2) array of the first/last source page of each
+    chunk, or None when the index predates page tracking. ``version`` is
+    unique per snapshot; cached answers are only reused for the same version.
+    The BM25 index is built on first use unless it was loaded with the rest.
+    ``source`` names the document (and collection) the chunks come from.
+    """
+
+    def __init__(self, chunks=None, embeddings: Optional[np.ndarray] = None,
+                 vector_index: Optional[VectorIndex] = None, metadata: Optional[dict] = None,
+                 pages: Optional[np.ndarray] = None, lexical_index: Optional[BM25Index] = None,
+                 source: Optional[dict] = None):
+        self.version = next(_snapshot_versions)
+        self.chunks = chunks if chunks is not None else []
+        self.embeddings = embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32)
+        self.vector_index = vector_index or BruteForceIndex(self.embeddings)
+        self.metadata = metadata or {}
+        self.pages = pages
+        self._lexical_index = lexical_index
+        self.source = source
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        if self._lexical_index is None:
+            self._lexical_index = BM25Index.build(self.chunks)
+        return self._lexical_index
+
+    def pages_of(self, index: int) -> Optional[List[int]]:
+        """Source page numbers of one chunk"""
+        if self.pages is None:
+            return None
+        first, last = self.pages[index]
+        return list(range(int(first), int(last) + 1))
+
+    def chunk_at(self, index: int, score: float) -> RetrievedChunk:
+        return self.chunks[index], float(score), self.pages_of(index), self.source
+
+    def fit_query(self, query: np.ndarray) -> np.ndarray:
+        """The query truncated to this index's dimensions, if it was stored with fewer"""
+        if len(self.embeddings) == 0:
+            return query
+        return fit_dimensions(query, self.embeddings.shape[1])
+
+
+def search_snapshots(snapshots: List[IndexSnapshot], query_embedding: np.ndarray, top_k: int,
+                     nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None) -> List[Tuple[int, int, float]]:
+    """
+    (snapshot position, chunk index, similarity) of the top_k closest chunks
+    over several snapshots. Each snapshot returns its own top_k, so merging
+    them gives the same result as one search over all chunks.
+    """
+    with stage_timer("vector_search"):
+        hits = [
+            (position, i, score)
+            for position, snapshot in enumerate(snapshots)
+            for i, score in snapshot.vector_index.search(snapshot.fit_query(query_embedding), top_k,
+                                                         nprobe=nprobe, ef_search=ef_search)
+        ]
+    return heapq.nlargest(top_k, hits, key=lambda hit: hit[2]) if len(snapshots) > 1 else hits
+
+
+def search_snapshots_lexical(snapshots: List[IndexSnapshot], query: str,
+                             top_k: int) -> List[Tuple[int, int, float]]:
+    """BM25 variant of search_snapshots; scores use each snapshot's own term statistics"""
+    with stage_timer("lexical_search"):
+        hits = [
+            (position, i, score)
+            for position, snapshot in enumerate(snapshots)
+            for i, score in snapshot.lexical_index.search(query, top_k)
+        ]
+    return heapq.nlargest(top_k, hits, key=lambda hit: hit[2]) if len(snapshots) > 1 else hits
+
+
+def candidate_vectors(snapshots: List[IndexSnapshot], hits: List[Tuple[int, int, float]]) -> np.ndarray:
+    """
+    (len(hits), dim) float32 embeddings of search hits, for reranking. Rows of
+    snapshots stored with more dimensions are truncated to the smallest.
+    """
+    if len(snapshots) == 1:
+        return np.asarray(snapshots[0].embeddings[[i for _, i, _ in hits]], dtype=np.float32)
+    rows = [np.asarray(snapshots[position].embeddings[i], dtype=np.float32) for position, i, _ in hits]
+    dim = min(len(row) for row in rows)
+    return np.stack([fit_dimensions(row, dim) for row in rows])
+
 
 class RAGSystem:
     """RAG system for querying PDF documents using Azure OpenAI"""
     
-    def __init__(self, embeddings_path: str = "embeddings.pkl"):
-        # Initialize Azure OpenAI clients
-        self.embedding_client = AzureOpenAI(
-            api_version=os.getenv("OPENAI_API_VERSION", "2025-01-01-preview"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY")
-        )
-        
-        self.chat_client = AzureOpenAI(
-            api_version=os.getenv("OPENAI_API_VERSION", "2025-01-01-preview"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY")
-        )
-        
-        # Storage for document chunks and embeddings
-        self.chunks = []
-        self.embeddings = []
+    def __init__(self, embeddings_path: str = "embeddings.pkl",
+                 index_dtype: Optional[str] = None, vector_index: Optional[str] = None):
+        # Storage for document chunks and embeddings. Embeddings are kept as a
+        # pre-normalized matrix (one row per chunk) so retrieval is a single
+        # matrix-vector product. After loading they are memory-mapped from
+        # the index directory, see app/services/index_store.py. Everything
+        # lives in one IndexSnapshot that is swapped atomically.
+        self._snapshot = IndexSnapshot()
+        # Serializes writes of the index directory (concurrent index builds)
+        self._index_lock = threading.Lock()
+
+        # embeddings_path names the legacy pickle; the index directory sits next to it
         self.embeddings_path = embeddings_path
+        self.index_path = index_path_for(embeddings_path)
+        self.index_dtype = index_dtype or os.getenv("RAG_INDEX_DTYPE", "float32")
+        if self.index_dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"RAG_INDEX_DTYPE must be one of {SUPPORTED_DTYPES}, got '{self.index_dtype}'")
+
+        # Retrieval used when a query does not name one: dense, lexical or hybrid
+        self.retrieval_mode = os.getenv("RAG_RETRIEVAL_MODE", "dense")
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"RAG_RETRIEVAL_MODE must be one of {RETRIEVAL_MODES}, got '{self.retrieval_mode}'")
+
+        # Matryoshka truncation of new indexes, e.g. 1024 or 256 (0 keeps all
+        # 3072 dimensions). Queries are truncated to match each index.
+        self.embedding_dimensions = int(os.getenv("RAG_EMBEDDING_DIMENSIONS", "0")) or None
+
+        # Nearest-neighbour backend used by search(): flat (exact), ivf, hnsw or binary
+        self.vector_index_kind = vector_index or os.getenv("RAG_VECTOR_INDEX", BruteForceIndex.kind)
+        if self.vector_index_kind not in VECTOR_INDEXES:
+            raise ValueError(f"RAG_VECTOR_INDEX must be one of {list(VECTOR_INDEXES)}, got '{self.vector_index_kind}'")
+
+        # Content-addressed cache so re-indexing only embeds new or changed chunks
+        cache_path = default_cache_path(embeddings_path)
+        self.embedding_cache = EmbeddingCache(cache_path) if cache_path else None
+        self.last_embedding_stats = {"cache_hits": 0, "cache_misses": 0}
+
+        # Repeated questions skip the embeddings request; similar questions
+        # against the same index reuse the earlier answer
+        self.query_embedding_cache = QueryEmbeddingCache()
+        self.answer_cache = SemanticAnswerCache() if DEFAULT_ANSWER_CACHE_SIZE > 0 else None
+
+        # Named collections of documents, opened on first query (see rag_collections.py)
+        self.collections = CollectionManager(self)
         
         # Try to load existing embeddings
         self.load_embeddings()
+
+    @property
+    def embedding_client(self) -> AzureOpenAI:
+        """Blocking client shared with the rest of the process (see openai_clients)"""
+        return get_sync_client()
+
+    @property
+    def chat_client(self) -> AzureOpenAI:
+        return get_sync_client()
+
+    @property
+    def chunks(self):
+        return self._snapshot.chunks
+
+    @chunks.setter
+    def chunks(self, chunks):
+        snapshot = self._snapshot
+        self._snapshot = IndexSnapshot(chunks, snapshot.embeddings, snapshot.vector_index, snapshot.metadata)
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self._snapshot.embeddings
+
+    @embeddings.setter
+    def embeddings(self, embeddings: np.ndarray):
+        snapshot = self._snapshot
+        self._snapshot = IndexSnapshot(snapshot.chunks, embeddings, None, snapshot.metadata, snapshot.pages,
+                                       snapshot._lexical_index)
+
+    @property
+    def index_metadata(self) -> dict:
+        return self._snapshot.metadata
+
+    @index_metadata.setter
+    def index_metadata(self, metadata: dict):
+        snapshot = self._snapshot
+        self._snapshot = IndexSnapshot(snapshot.chunks, snapshot.embeddings, snapshot.vector_index, metadata,
+                                       snapshot.pages, snapshot._lexical_index)
+
+    @property
+    def vector_index(self) -> VectorIndex:
+        return self._snapshot.vector_index
         
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF file"""
-        text = ""
+    def extract_text_from_pdf(self, pdf_path: str,
+                              progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Extract text from PDF file (pages joined with newlines)"""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            return text
+            with stage_timer("pdf_extract"):
+                return "".join(text + "\n" for _, text in extract_pages(pdf_path, progress))
+        except IndexingCancelled:
+            raise
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
     
@@ -62,31 +717,78 @@ class RAGSystem:
             
         return chunks
     
-    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def create_embeddings(self, texts: List[str],
+                          progress: Optional[Callable[[int], None]] = None,
+                          stats: Optional[dict] = None) -> List[List[float]]:
         """Create embeddings for text chunks"""
-        embeddings = []
-        
-        # Process in batches to avoid rate limits
-        batch_size = 10
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            response = self.embedding_client.embeddings.create(
-                input=batch,
-                model="text-embedding-3-large"
-            )
-            embeddings.extend([item.embedding for item in response.data])
-        
-        return embeddings
+        return run_sync(self.acreate_embeddings(texts, progress, stats))
+
+    async def acreate_embeddings(self, texts: List[str],
+                                 progress: Optional[Callable[[int], None]] = None,
+                                 stats: Optional[dict] = None) -> List[List[float]]:
+        """
+        Create embeddings concurrently with token-budgeted batches and
+        rate-limit aware retries (see EmbeddingPipeline). Chunks already in the
+        embedding cache are not sent to the API. Cache hit/miss counts for
+        this call are written into ``stats`` when given.
+        """
+        hashes = [text_sha256(text) for text in texts]
+        cached = self.embedding_cache.get_many(EMBEDDING_MODEL, hashes) if self.embedding_cache else {}
+
+        # Embed each missing text once, even if it occurs in several chunks
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+
+        hits = sum(1 for text_hash in hashes if text_hash in cached)
+        self.last_embedding_stats = {"cache_hits": hits, "cache_misses": len(texts) - hits}
+        if stats is not None:
+            stats.update(self.last_embedding_stats)
+        if self.embedding_cache:
+            self.embedding_cache.record(hits, len(texts) - hits)
+            print(f"Embedding cache: {hits} hits, {len(texts) - hits} misses")
+        if progress is not None and hits:
+            progress(hits)
 
-    def save_chunks_json(self, json_path: Optional[str] = None) -> str:
-        """Save the current chunks to a JSON file and return its path."""
+        if missing:
+            fresh = await self._embed_uncached(list(missing.values()), progress)
+            fresh_by_hash = dict(zip(missing.keys(), fresh))
+            if self.embedding_cache:
+                self.embedding_cache.put_many(EMBEDDING_MODEL, fresh_by_hash)
+            cached.update(fresh_by_hash)
+
+        return [cached[text_hash] for text_hash in hashes]
+
+    async def _embed_uncached(self, texts: List[str],
+                              progress: Optional[Callable[[int], None]] = None) -> List[List[float]]:
+        # A fresh async client per run keeps its connection pool bound to the
+        # event loop that uses it; retries are handled by the pipeline.
+        async with AsyncAzureOpenAI(
+            api_version=os.getenv("OPENAI_API_VERSION", "2025-01-01-preview"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            max_retries=0
+        ) as client:
+            pipeline = EmbeddingPipeline(client, model=EMBEDDING_MODEL)
+            embeddings = await pipeline.embed(texts, progress=progress)
+            if pipeline.retries:
+                print(f"Embedding pipeline retried {pipeline.retries} request(s)")
+            return embeddings
+
+    def save_chunks_json(self, json_path: Optional[str] = None, chunks: Optional[List[str]] = None) -> str:
+        """Save the current (or given) chunks to a JSON file and return its path."""
         if json_path is None:
             base, _ = os.path.splitext(self.embeddings_path)
             json_path = f"{base}_chunks.json"
+        if chunks is None:
+            chunks = list(self.chunks)
 
         try:
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump({'chunks': self.chunks}, f, ensure_ascii=False, indent=2)
+            tmp_path = f"{json_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'chunks': chunks}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, json_path)
             print(f"Chunks saved to JSON: {json_path}")
             return json_path
         except Exception as e:
@@ -118,36 +820,129 @@ class RAGSystem:
             raise ValueError("No chunks available to create embeddings from JSON")
 
         print("Creating embeddings from JSON chunks...")
-        self.embeddings = self.create_embeddings(self.chunks)
+        self.embeddings = normalize_rows(self.create_embeddings(self.chunks))
         print(f"Created {len(self.embeddings)} embeddings from JSON")
 
         # Persist embeddings along with chunks
         self.save_embeddings()
     
     def save_embeddings(self):
-        """Save embeddings and chunks to disk"""
-        data = {
-            'chunks': self.chunks,
-            'embeddings': self.embeddings
-        }
-        with open(self.embeddings_path, 'wb') as f:
-            pickle.dump(data, f)
-        print(f"Embeddings saved to {self.embeddings_path}")
+        """Write embeddings and chunks to the memory-mapped index directory"""
+        snapshot = self._snapshot
+        with self._index_lock:
+            self._write_and_swap(list(snapshot.chunks), snapshot.embeddings, snapshot.metadata, snapshot.pages)
+
+    def _write_and_swap(self, chunks: List[str], embeddings: np.ndarray, metadata: dict,
+                        pages: Optional[np.ndarray] = None) -> None:
+        """Persist a complete index and make it the live snapshot (caller holds _index_lock)"""
+        self.save_index(self.index_path, chunks, embeddings, metadata, pages)
+        # Re-open so this process shares pages with other workers instead of
+        # holding its own heap copy
+        self._snapshot = self.open_snapshot()
+
+    def save_index(self, index_path: str, chunks: List[str], embeddings: np.ndarray, metadata: dict,
+                   pages: Optional[np.ndarray] = None) -> dict:
+        """Write an index directory with its ANN and BM25 structures and return the manifest"""
+        embeddings = fit_dimensions(embeddings, self.embedding_dimensions)
+
+        def write_search_structures(directory: str):
+            self._build_vector_index(embeddings).save(directory)
+            BM25Index.build(chunks).save(directory)
+
+        manifest = write_index(
+            index_path, chunks, embeddings,
+            metadata=metadata, dtype=self.index_dtype,
+            extra_writer=write_search_structures,
+            pages=pages
+        )
+        print(f"Embeddings saved to {index_path} ({manifest['count']} x {manifest['dim']} {manifest['dtype']})")
+        return manifest
     
     def load_embeddings(self) -> bool:
-        """Load embeddings and chunks from disk"""
-        if os.path.exists(self.embeddings_path):
-            try:
-                with open(self.embeddings_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.chunks = data['chunks']
-                    self.embeddings = data['embeddings']
-                print(f"Loaded {len(self.chunks)} chunks from {self.embeddings_path}")
-                return True
-            except Exception as e:
-                print(f"Error loading embeddings: {str(e)}")
-                return False
-        return False
+        """Load embeddings and chunks from disk, migrating a legacy pickle once"""
+        try:
+            with self._index_lock:
+                if os.path.isdir(self.index_path):
+                    self._snapshot = self.open_snapshot()
+                elif os.path.exists(self.embeddings_path):
+                    self.migrate_legacy_embeddings()
+                else:
+                    return False
+            print(f"Loaded {len(self.chunks)} chunks from {self.index_path}")
+            return True
+        except Exception as e:
+            print(f"Error loading embeddings: {str(e)}")
+            return False
+
+    def migrate_legacy_embeddings(self) -> None:
+        """One-shot conversion of embeddings.pkl (+ *_chunks.json) into the index format"""
+        base, _ = os.path.splitext(self.embeddings_path)
+        chunks, embeddings = read_legacy_pickle(self.embeddings_path, f"{base}_chunks.json")
+        print(f"Migrating {len(chunks)} chunks from {self.embeddings_path} to {self.index_path}")
+        write_index(
+            self.index_path, chunks, fit_dimensions(normalize_rows(embeddings), self.embedding_dimensions),
+            metadata={"embedding_model": EMBEDDING_MODEL, "migrated_from": os.path.basename(self.embeddings_path)},
+            dtype=self.index_dtype
+        )
+        self._snapshot = self.open_snapshot()
+
+    def open_snapshot(self, index_path: Optional[str] = None, source: Optional[dict] = None) -> IndexSnapshot:
+        """Memory-map an index directory (default: the main index) as a snapshot"""
+        index_path = index_path or self.index_path
+        chunks, embeddings, manifest = open_index(index_path)
+        metadata = {
+            key: manifest[key]
+            for key in ("embedding_model", "chunker", "chunk_size", "overlap", "source_sha256", "source_name")
+            if key in manifest
+        }
+        if source is None:
+            source = {"collection": None, "document_id": None, "source_name": metadata.get("source_name")}
+        return IndexSnapshot(chunks, embeddings, self._load_vector_index(embeddings, index_path), metadata,
+                             read_pages(index_path, manifest), self._load_lexical_index(chunks, index_path),
+                             source)
+
+    def _build_vector_index(self, vectors: np.ndarray) -> VectorIndex:
+        if self.vector_index_kind != BruteForceIndex.kind:
+            print(f"Building {self.vector_index_kind} vector index over {len(vectors)} chunks...")
+        return VECTOR_INDEXES[self.vector_index_kind](vectors).build()
+
+    def _load_vector_index(self, embeddings: np.ndarray, index_path: str) -> VectorIndex:
+        """Load the configured ANN structures, building and persisting them if missing"""
+        index_cls = VECTOR_INDEXES[self.vector_index_kind]
+        index = index_cls.load(embeddings, index_path)
+        if index is None:
+            index = self._build_vector_index(embeddings)
+            index.save(index_path)
+        return index
+
+    def _load_lexical_index(self, chunks, index_path: str) -> BM25Index:
+        """Load the BM25 index, building and persisting it for indexes written without one"""
+        index = BM25Index.load(index_path, len(chunks))
+        if index is None:
+            print(f"Building BM25 index over {len(chunks)} chunks...")
+            index = BM25Index.build(chunks)
+            index.save(index_path)
+        return index
+
+    def delete_embeddings(self) -> None:
+        """Remove the persisted index (and any legacy pickle) and clear memory"""
+        with self._index_lock:
+            self.clear()
+            remove_index(self.index_path)
+            if os.path.exists(self.embeddings_path):
+                os.remove(self.embeddings_path)
+
+    def index_size_bytes(self) -> int:
+        """Size of the persisted index on disk"""
+        return index_size_bytes(self.index_path)
+
+    def clear(self) -> None:
+        """Drop all chunks and embeddings from memory"""
+        self._snapshot = IndexSnapshot()
+
+    def has_embeddings(self) -> bool:
+        """Whether an index is loaded and ready for queries"""
+        return len(self.embeddings) > 0
     
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
@@ -158,53 +953,571 @@ class RAGSystem:
             return 0
         return np.dot(vec1, vec2) / magnitude
     
-    def find_relevant_chunks(self, query: str, top_k: int = 3) -> List[Tuple[str, float]]:
-        """Find most relevant chunks for a query"""
-        if not self.embeddings:
+    def embed_query(self, query: str) -> np.ndarray:
+        """Create a unit-norm float32 embedding for a query"""
+        cached = self.query_embedding_cache.get(query)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        with stage_timer("embed_query"):
+            query_response = self.embedding_client.embeddings.create(
+                input=[query],
+                model=EMBEDDING_MODEL
+            )
+        record_usage("embeddings", EMBEDDING_MODEL, query_response.usage)
+        vector = normalize_rows(query_response.data[0].embedding)[0]
+        self.query_embedding_cache.put(query, vector, time.perf_counter() - start)
+        return vector
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return (chunk index, similarity) pairs for the top_k closest chunks.
+
+        nprobe (IVF) and ef_search (HNSW candidate list, binary rescoring
+        shortlist) trade recall for speed and are ignored by backends that do
+        not use them.
+        """
+        snapshot = self._snapshot
+        return snapshot.vector_index.search(snapshot.fit_query(query_embedding), top_k,
+                                            nprobe=nprobe, ef_search=ef_search)
+
+    def retrieve(self, query_embedding: np.ndarray, top_k: int = 3, nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None,
+                 snapshots: Optional[List[IndexSnapshot]] = None) -> List[RetrievedChunk]:
+        """Return (chunk text, similarity, pages, source) for the top_k closest chunks"""
+        # Search and chunk lookup must use the same snapshots
+        snapshots = snapshots or [self._snapshot]
+        hits = search_snapshots(snapshots, query_embedding, top_k, nprobe, ef_search)
+        return [snapshots[position].chunk_at(i, score) for position, i, score in hits]
+
+    def retrieve_lexical(self, query: str, top_k: int = 3,
+                         snapshots: Optional[List[IndexSnapshot]] = None) -> List[RetrievedChunk]:
+        """
+        Return (chunk text, relative score, pages, source) for the top_k chunks
+        by BM25. Needs no query embedding. Scores are scaled so the best chunk
+        has 1.0, as BM25 scores have no fixed range.
+        """
+        snapshots = snapshots or [self._snapshot]
+        hits = self._lexical_hits(query, top_k, snapshots)
+        return [snapshots[position].chunk_at(i, score) for position, i, score in hits]
+
+    def retrieve_hybrid(self, query: str, query_embedding: np.ndarray, top_k: int = 3,
+                        nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                        snapshots: Optional[List[IndexSnapshot]] = None) -> List[RetrievedChunk]:
+        """
+        Fuse dense and BM25 rankings with reciprocal rank fusion.
+
+        Each retriever contributes a deeper candidate list than top_k so that
+        chunks ranked moderately by both can win. The reported similarity is
+        the chunk's cosine similarity to the query.
+        """
+        snapshots = snapshots or [self._snapshot]
+        hits = self._hybrid_hits(query, query_embedding, top_k, nprobe, ef_search, snapshots)
+        return [snapshots[position].chunk_at(i, score) for position, i, score in hits]
+
+    @staticmethod
+    def _lexical_hits(query: str, top_k: int, snapshots: List[IndexSnapshot]) -> List[Tuple[int, int, float]]:
+        hits = search_snapshots_lexical(snapshots, query, top_k)
+        best = hits[0][2] if hits else 1.0
+        return [(position, i, score / best) for position, i, score in hits]
+
+    @staticmethod
+    def _hybrid_hits(query: str, query_embedding: np.ndarray, top_k: int, nprobe: Optional[int],
+                     ef_search: Optional[int], snapshots: List[IndexSnapshot]) -> List[Tuple[int, int, float]]:
+        depth = max(top_k * 4, 20)
+        dense = search_snapshots(snapshots, query_embedding, depth, nprobe, ef_search)
+        lexical = search_snapshots_lexical(snapshots, query, depth)
+        fused = reciprocal_rank_fusion([
+            [(position, i) for position, i, _ in dense],
+            [(position, i) for position, i, _ in lexical],
+        ])[:top_k]
+        if not fused:
+            return []
+        keys = [key for key, _ in fused]
+        vectors = candidate_vectors(snapshots, [(position, i, 0.0) for position, i in keys])
+        similarities = vectors @ fit_dimensions(query_embedding, vectors.shape[1])
+        return [(position, i, float(score)) for (position, i), score in zip(keys, similarities)]
+
+    def _retrieve_mode(self, mode: str, query: str, query_embedding: Optional[np.ndarray], top_k: int,
+                       nprobe: Optional[int], ef_search: Optional[int],
+                       snapshots: Optional[List[IndexSnapshot]] = None, rerank: str = "none",
+                       context_tokens: int = 0) -> List[RetrievedChunk]:
+        """
+        Retrieve with the given mode, then optionally rerank and pack.
+
+        With rerank "mmr" RERANK_FETCH_FACTOR x top_k candidates are fetched
+        and ordered by Maximal Marginal Relevance over their stored
+        embeddings, so near-duplicate neighbours (overlapping chunks) give way
+        to chunks that add something. With a ``context_tokens`` budget the
+        chunks are taken in that order until the budget is filled, however
+        many that is; otherwise the first top_k are kept.
+        """
+        snapshots = snapshots or [self._snapshot]
+        depth = top_k * RERANK_FETCH_FACTOR if rerank == "mmr" else top_k
+        if mode == "lexical":
+            hits = self._lexical_hits(query, depth, snapshots)
+        elif mode == "hybrid":
+            hits = self._hybrid_hits(query, query_embedding, depth, nprobe, ef_search, snapshots)
+        else:
+            hits = search_snapshots(snapshots, query_embedding, depth, nprobe, ef_search)
+
+        if rerank == "mmr" and len(hits) > 1:
+            with stage_timer("rerank"):
+                order = mmr_order(candidate_vectors(snapshots, hits), [score for _, _, score in hits],
+                                  len(hits) if context_tokens else top_k)
+            hits = [hits[j] for j in order]
+
+        chunks = [snapshots[position].chunk_at(i, score) for position, i, score in hits]
+        if context_tokens:
+            return [chunks[j] for j in pack_context([chunk for chunk, _, _, _ in chunks], context_tokens)]
+        return chunks[:top_k]
+
+    def _resolve_mode(self, retrieval_mode: Optional[str]) -> str:
+        mode = retrieval_mode or self.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode must be one of {RETRIEVAL_MODES}, got '{mode}'")
+        return mode
+
+    @staticmethod
+    def _resolve_rerank(rerank: Optional[str], context_tokens: Optional[int]) -> Tuple[str, int]:
+        """Reranker and context token budget of a query, defaulting to RAG_RERANK / RAG_CONTEXT_TOKENS"""
+        context_tokens = DEFAULT_CONTEXT_TOKENS if context_tokens is None else context_tokens
+        if context_tokens < 0:
+            raise ValueError("context_tokens must not be negative")
+        return resolve_rerank(rerank), context_tokens
+
+    def _resolve_snapshots(self, collections: Optional[List[str]]) -> Tuple[List[IndexSnapshot], tuple]:
+        """
+        Snapshots a query searches: the main index, or every document of the
+        named collections (opened if not resident). Also returns the versions
+        that identify them in the answer cache.
+        """
+        if not collections:
+            snapshot = self._snapshot
+            snapshots, versions = [snapshot], (snapshot.version,)
+        else:
+            loaded = [self.collections.get(name) for name in dict.fromkeys(collections)]
+            snapshots = [segment for collection in loaded for segment in collection.segments.values()]
+            versions = tuple((collection.name, collection.version) for collection in loaded)
+        snapshots = [snapshot for snapshot in snapshots if len(snapshot.chunks)]
+        if not snapshots:
             raise ValueError("No embeddings loaded. Please index a PDF first.")
+        return snapshots, versions
+
+    def find_relevant_chunks(self, query: str, top_k: int = 3, nprobe: Optional[int] = None,
+                             ef_search: Optional[int] = None,
+                             retrieval_mode: Optional[str] = None,
+                             collections: Optional[List[str]] = None, rerank: Optional[str] = None,
+                             context_tokens: Optional[int] = None) -> List[RetrievedChunk]:
+        """Find most relevant chunks for a query in the main index or the given collections"""
+        snapshots, _ = self._resolve_snapshots(collections)
+        mode = self._resolve_mode(retrieval_mode)
+        rerank, context_tokens = self._resolve_rerank(rerank, context_tokens)
         
-        # Create embedding for query
-        query_response = self.embedding_client.embeddings.create(
-            input=[query],
-            model="text-embedding-3-large"
-        )
-        query_embedding = query_response.data[0].embedding
-        
-        # Calculate similarities
-        similarities = []
-        for i, chunk_embedding in enumerate(self.embeddings):
-            similarity = self.cosine_similarity(query_embedding, chunk_embedding)
-            similarities.append((self.chunks[i], similarity))
+        # Create embedding for query (lexical retrieval does not need one)
+        query_embedding = None if mode == "lexical" else self.embed_query(query)
         
-        # Sort by similarity and return top k
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:top_k]
+        # Score chunks through the configured vector index and/or BM25 and keep the top k
+        return self._retrieve_mode(mode, query, query_embedding, top_k, nprobe, ef_search, snapshots,
+                                   rerank, context_tokens)
     
-    def load_pdf(self, pdf_path: str, chunk_size: int = 1000, overlap: int = 200):
+    def load_pdf(self, pdf_path: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None,
+                 chunker: Optional[str] = None):
         """Load and process PDF document"""
-        print(f"Loading PDF: {pdf_path}")
-        text = self.extract_text_from_pdf(pdf_path)
-        
-        print("Chunking text...")
-        self.chunks = self.chunk_text(text, chunk_size, overlap)
-        print(f"Created {len(self.chunks)} chunks")
+        return self.build_index(pdf_path, chunk_size, overlap, chunker=chunker)
 
-        # Save chunks to JSON first (two-step process)
-        chunks_json_path = self.save_chunks_json()
+    def build_index(self, pdf_path: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None,
+                    progress: Optional[Callable[[str, int, int], None]] = None,
+                    should_cancel: Optional[Callable[[], bool]] = None,
+                    source_name: Optional[str] = None, chunker: Optional[str] = None) -> dict:
+        """
+        Extract, chunk and embed a PDF off to the side, then swap it in.
 
-        # Create embeddings from the JSON file we just wrote
-        self.create_embeddings_from_json(chunks_json_path)
+        The live index keeps serving queries until the new one is completely
+        written; only then is the snapshot replaced. Arguments are those of
+        prepare_document.
+
+        Returns:
+            Summary with chunks_count and embedding cache hits/misses
+        """
+        chunks, embeddings, page_ranges, metadata, cache_stats = self.prepare_document(
+            pdf_path, chunk_size, overlap, progress, should_cancel, source_name, chunker
+        )
+
+        with self._index_lock:
+            # Keep the chunks JSON in step with the live index
+            self.save_chunks_json(chunks=chunks)
+            self._write_and_swap(chunks, embeddings, metadata, page_ranges)
 
         print("PDF loaded and indexed successfully!")
+        return {"chunks_count": len(chunks), "chunker": metadata["chunker"], "embedding_cache": cache_stats}
+
+    def prepare_document(self, pdf_path: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None,
+                         progress: Optional[Callable[[str, int, int], None]] = None,
+                         should_cancel: Optional[Callable[[], bool]] = None,
+                         source_name: Optional[str] = None,
+                         chunker: Optional[str] = None) -> Tuple[List[str], np.ndarray, np.ndarray, dict, dict]:
+        """
+        Extract, chunk and embed a PDF without touching any index.
+
+        Args:
+            pdf_path: PDF to index
+            chunk_size: Size of text chunks, in tokens for the structure
+                chunker and characters for the chars chunker (default per chunker)
+            overlap: Overlap between chunks in the same unit
+            progress: Optional callback (stage, done, total) with stage
+                "extracting" (pages) or "embedding" (chunks)
+            should_cancel: Optional callback polled between steps; returning
+                True aborts with IndexingCancelled and leaves the live index as is
+            source_name: Name recorded in the index metadata (defaults to the
+                file name of pdf_path)
+            chunker: "structure" or "chars" (default RAG_CHUNKER), see
+                app/services/chunking.py
+
+        Returns:
+            (chunks, unit-norm embeddings, (first, last) page per chunk,
+            index metadata, embedding cache hits/misses)
+        """
+        chunker, chunk_size, overlap = resolve_chunk_params(chunker, chunk_size, overlap)
+
+        def check_cancelled():
+            if should_cancel is not None and should_cancel():
+                raise IndexingCancelled()
+
+        def on_pages(done: int, total: int):
+            if progress is not None:
+                progress("extracting", done, total)
+            check_cancelled()
+
+        print(f"Loading PDF: {pdf_path}")
+        chunks = []
+        page_ranges = []
+        start = time.perf_counter()
+        try:
+            # Pages stream from the extractor straight into the chunker, so
+            # the full document text is never held as one string. The time
+            # spent waiting for pages is the extraction stage, the rest chunking.
+            pages = TimedIterator(extract_pages(pdf_path, on_pages))
+            for chunk, first_page, last_page in chunk_document(pages, chunker, chunk_size, overlap):
+                chunks.append(chunk)
+                page_ranges.append((first_page, last_page))
+        except (IndexingCancelled, ValueError):
+            raise
+        except Exception as e:
+            raise Exception(f"Error extracting text from PDF: {str(e)}")
+        observe_stage("pdf_extract", pages.seconds)
+        observe_stage("chunk", time.perf_counter() - start - pages.seconds)
+        print(f"Created {len(chunks)} chunks ({chunker} chunker)")
+        if not chunks:
+            raise ValueError("No text could be extracted from the PDF")
+
+        metadata = {
+            "embedding_model": EMBEDDING_MODEL,
+            "chunker": chunker,
+            "chunk_size": chunk_size,
+            "overlap": overlap,
+            "source_sha256": file_sha256(pdf_path),
+            "source_name": source_name or os.path.basename(pdf_path),
+        }
+
+        embedded = 0
+
+        def on_embedded(count: int):
+            nonlocal embedded
+            embedded += count
+            if progress is not None:
+                progress("embedding", embedded, len(chunks))
+            check_cancelled()
+
+        if progress is not None:
+            progress("embedding", 0, len(chunks))
+        cache_stats = {}
+        embeddings = normalize_rows(self.create_embeddings(chunks, progress=on_embedded, stats=cache_stats))
+        check_cancelled()
+        return chunks, embeddings, np.asarray(page_ranges, dtype=np.int32), metadata, cache_stats
     
     def query(self, question: str, model: str = "gpt-4o-mini", 
-              temperature: float = 0.3, top_k: int = 3) -> Tuple[str, List[dict]]:
-        """Query the RAG system"""
+              temperature: float = 0.3, top_k: int = 3, nprobe: Optional[int] = None,
+              ef_search: Optional[int] = None, force_refresh: bool = False,
+              retrieval_mode: Optional[str] = None,
+              collections: Optional[List[str]] = None, rerank: Optional[str] = None,
+              context_tokens: Optional[int] = None) -> Tuple[str, List[dict], Optional[dict]]:
+        """
+        Query the RAG system.
+
+        Args:
+            collections: Collections to search instead of the main index
+            rerank: "mmr" or "none" (default RAG_RERANK), see _retrieve_mode
+            context_tokens: Token budget for the retrieved chunks; 0 keeps
+                top_k chunks (default RAG_CONTEXT_TOKENS)
+
+        Returns:
+            (answer, relevant chunks, cache info or None), see lookup_answer
+        """
+        snapshots, versions = self._resolve_snapshots(collections)
+        mode = self._resolve_mode(retrieval_mode)
+        rerank, context_tokens = self._resolve_rerank(rerank, context_tokens)
+        query_embedding = None if mode == "lexical" else self.embed_query(question)
+        scope = self._answer_scope(model, temperature, top_k, nprobe, ef_search, mode, rerank, context_tokens,
+                                   versions)
+        cached = None if force_refresh else self.lookup_answer(query_embedding, scope)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
         # Find relevant chunks
-        relevant_chunks = self.find_relevant_chunks(question, top_k=top_k)
+        relevant_chunks = self._retrieve_mode(mode, question, query_embedding, top_k, nprobe, ef_search, snapshots,
+                                              rerank, context_tokens)
         
+        # Get response from LLM
+        with stage_timer("llm_call"):
+            response = self.chat_client.chat.completions.create(
+                model=model,
+                messages=self._build_messages(question, relevant_chunks),
+                temperature=temperature,
+                max_tokens=1000
+            )
+        record_usage("chat", model, response.usage)
+        
+        answer = response.choices[0].message.content
+        chunks = self._format_chunks(relevant_chunks)
+        self.store_answer(question, query_embedding, scope, answer, chunks, time.perf_counter() - start)
+        return answer, chunks, None
+
+    @staticmethod
+    def _answer_scope(model: str, temperature: float, top_k: int, nprobe: Optional[int],
+                      ef_search: Optional[int], mode: str, rerank: str, context_tokens: int,
+                      versions: tuple) -> tuple:
+        """Everything besides the question that determines a RAG answer"""
+        return (model, float(temperature), top_k, nprobe, ef_search, mode, rerank, context_tokens, versions)
+
+    def lookup_answer(self, query_embedding: Optional[np.ndarray],
+                      scope: tuple) -> Optional[Tuple[str, List[dict], dict]]:
+        """
+        Cached answer of a similar enough question in the same scope. Lexical
+        queries have no embedding and are never cached.
+
+        Returns:
+            (answer, relevant chunks, {"question", "similarity", "age_seconds"}) or None
+        """
+        if self.answer_cache is None or query_embedding is None:
+            return None
+        found = self.answer_cache.lookup(query_embedding, scope)
+        if found is None:
+            return None
+        entry, similarity = found
+        return entry.answer, entry.chunks, {
+            "question": entry.question,
+            "similarity": round(similarity, 4),
+            "age_seconds": round(time.time() - entry.created_at, 1),
+        }
+
+    def store_answer(self, question: str, query_embedding: Optional[np.ndarray], scope: tuple, answer: str,
+                     chunks: List[dict], seconds: float) -> None:
+        """Add an answer that took ``seconds`` (retrieval and completion) to the semantic cache"""
+        if self.answer_cache is None or query_embedding is None or not answer:
+            return
+        self.answer_cache.store(query_embedding, CachedAnswer(question, scope, answer, chunks, seconds))
+
+    def query_cache_stats(self) -> dict:
+        """Hit rates and estimated seconds saved by the query caches"""
+        return {
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "answers": self.answer_cache.stats() if self.answer_cache is not None else None,
+        }
+
+    async def aembed_query(self, query: str) -> np.ndarray:
+        """Async variant of embed_query using the shared pooled client"""
+        cached = self.query_embedding_cache.get(query)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        with stage_timer("embed_query"):
+            query_response = await get_async_client().embeddings.create(
+                input=[query],
+                model=EMBEDDING_MODEL
+            )
+        record_usage("embeddings", EMBEDDING_MODEL, query_response.usage)
+        vector = normalize_rows(query_response.data[0].embedding)[0]
+        self.query_embedding_cache.put(query, vector, time.perf_counter() - start)
+        return vector
+
+    async def afind_relevant_chunks(self, query: str, top_k: int = 3, nprobe: Optional[int] = None,
+                                    ef_search: Optional[int] = None,
+                                    retrieval_mode: Optional[str] = None,
+                                    collections: Optional[List[str]] = None, rerank: Optional[str] = None,
+                                    context_tokens: Optional[int] = None) -> List[RetrievedChunk]:
+        """Async variant of find_relevant_chunks"""
+        snapshots, _ = await self._aresolve_snapshots(collections)
+        mode = self._resolve_mode(retrieval_mode)
+        rerank, context_tokens = self._resolve_rerank(rerank, context_tokens)
+
+        query_embedding = None if mode == "lexical" else await self.aembed_query(query)
+
+        return await self._aretrieve_mode(mode, query, query_embedding, top_k, nprobe, ef_search, snapshots,
+                                          rerank, context_tokens)
+
+    async def aembed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Embeddings of several queries; those not in the query embedding cache share one request"""
+        vectors = [self.query_embedding_cache.get(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            start = time.perf_counter()
+            with stage_timer("embed_query"):
+                response = await get_async_client().embeddings.create(
+                    input=[queries[i] for i in missing],
+                    model=EMBEDDING_MODEL
+                )
+            record_usage("embeddings", EMBEDDING_MODEL, response.usage)
+            embedded = normalize_rows([item.embedding for item in sorted(response.data, key=lambda item: item.index)])
+            seconds = (time.perf_counter() - start) / len(missing)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                self.query_embedding_cache.put(queries[i], vector, seconds)
+        return vectors
+
+    async def afind_relevant_chunks_many(self, queries: List[str], top_k: int = 3, nprobe: Optional[int] = None,
+                                         ef_search: Optional[int] = None,
+                                         retrieval_mode: Optional[str] = None,
+                                         collections: Optional[List[str]] = None, rerank: Optional[str] = None,
+                                         context_tokens: Optional[int] = None
+                                         ) -> Tuple[List[List[RetrievedChunk]], dict]:
+        """
+        afind_relevant_chunks for several queries at once. The snapshots are
+        resolved once, the query embeddings come from a single embeddings
+        request and the searches run concurrently.
+
+        Returns:
+            (chunks per query, {"embed_ms", "search_ms"})
+        """
+        snapshots, _ = await self._aresolve_snapshots(collections)
+        mode = self._resolve_mode(retrieval_mode)
+        rerank, context_tokens = self._resolve_rerank(rerank, context_tokens)
+
+        start = time.perf_counter()
+        embeddings = [None] * len(queries) if mode == "lexical" else await self.aembed_queries(queries)
+        embedded = time.perf_counter()
+        results = await asyncio.gather(*[
+            self._aretrieve_mode(mode, query, query_embedding, top_k, nprobe, ef_search, snapshots,
+                                 rerank, context_tokens)
+            for query, query_embedding in zip(queries, embeddings)
+        ])
+        end = time.perf_counter()
+        return list(results), {
+            "embed_ms": round((embedded - start) * 1000, 2),
+            "search_ms": round((end - embedded) * 1000, 2),
+        }
+
+    async def _aretrieve_mode(self, mode: str, query: str, query_embedding: Optional[np.ndarray], top_k: int,
+                              nprobe: Optional[int], ef_search: Optional[int],
+                              snapshots: Optional[List[IndexSnapshot]] = None, rerank: str = "none",
+                              context_tokens: int = 0) -> List[RetrievedChunk]:
+        if mode == "lexical":
+            # Postings lookups and MMR over a few dozen candidates take well
+            # under a millisecond; a thread hop would cost more
+            return self._retrieve_mode(mode, query, query_embedding, top_k, nprobe, ef_search, snapshots,
+                                       rerank, context_tokens)
+        # The scan is CPU-bound; keep it off the event loop for large indexes
+        return await asyncio.to_thread(self._retrieve_mode, mode, query, query_embedding, top_k, nprobe, ef_search,
+                                       snapshots, rerank, context_tokens)
+
+    async def _aresolve_snapshots(self, collections: Optional[List[str]]) -> Tuple[List[IndexSnapshot], tuple]:
+        if collections and any(name not in self.collections.resident_names() for name in collections):
+            # Opening a collection reads manifests and may build missing structures
+            return await asyncio.to_thread(self._resolve_snapshots, collections)
+        return self._resolve_snapshots(collections)
+
+    async def aquery(self, question: str, model: str = "gpt-4o-mini",
+                     temperature: float = 0.3, top_k: int = 3, nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None, force_refresh: bool = False,
+                     retrieval_mode: Optional[str] = None,
+                     collections: Optional[List[str]] = None, rerank: Optional[str] = None,
+                     context_tokens: Optional[int] = None) -> Tuple[str, List[dict], Optional[dict]]:
+        """Async variant of query that never blocks the event loop"""
+        snapshots, versions = await self._aresolve_snapshots(collections)
+        mode = self._resolve_mode(retrieval_mode)
+        rerank, context_tokens = self._resolve_rerank(rerank, context_tokens)
+        query_embedding = None if mode == "lexical" else await self.aembed_query(question)
+        scope = self._answer_scope(model, temperature, top_k, nprobe, ef_search, mode, rerank, context_tokens,
+                                   versions)
+        cached = None if force_refresh else self.lookup_answer(query_embedding, scope)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        relevant_chunks = await self._aretrieve_mode(mode, question, query_embedding, top_k, nprobe, ef_search,
+                                                     snapshots, rerank, context_tokens)
+
+        with stage_timer("llm_call"):
+            response = await get_async_client().chat.completions.create(
+                model=model,
+                messages=self._build_messages(question, relevant_chunks),
+                temperature=temperature,
+                max_tokens=1000
+            )
+        record_usage("chat", model, response.usage)
+
+        answer = response.choices[0].message.content
+        chunks = self._format_chunks(relevant_chunks)
+        self.store_answer(question, query_embedding, scope, answer, chunks, time.perf_counter() - start)
+        return answer, chunks, None
+
+    async def astream_query(self, question: str, model: str = "gpt-4o-mini",
+                            temperature: float = 0.3, top_k: int = 3, nprobe: Optional[int] = None,
+                            ef_search: Optional[int] = None, force_refresh: bool = False,
+                            retrieval_mode: Optional[str] = None,
+                            collections: Optional[List[str]] = None, rerank: Optional[str] = None,
+                            context_tokens: Optional[int] = None) -> AsyncIterator[dict]:
+        """
+        Stream a RAG answer.
+
+        Yields a {"type": "chunks", "chunks": [...], "cache": ...} event as
+        soon as retrieval finishes, then {"type": "token", "content": "..."}
+        events as the completion is generated. A cached answer (``cache`` not
+        None, see lookup_answer) is sent as a single token.
+        """
+        snapshots, versions = await self._aresolve_snapshots(collections)
+        mode = self._resolve_mode(retrieval_mode)
+        rerank, context_tokens = self._resolve_rerank(rerank, context_tokens)
+        query_embedding = None if mode == "lexical" else await self.aembed_query(question)
+        scope = self._answer_scope(model, temperature, top_k, nprobe, ef_search, mode, rerank, context_tokens,
+                                   versions)
+        cached = None if force_refresh else self.lookup_answer(query_embedding, scope)
+        if cached is not None:
+            answer, chunks, cache_info = cached
+            yield {"type": "chunks", "chunks": chunks, "cache": cache_info}
+            yield {"type": "token", "content": answer}
+            return
+
+        start = time.perf_counter()
+        relevant_chunks = await self._aretrieve_mode(mode, question, query_embedding, top_k, nprobe, ef_search,
+                                                     snapshots, rerank, context_tokens)
+        chunks = self._format_chunks(relevant_chunks)
+        yield {"type": "chunks", "chunks": chunks, "cache": None}
+
+        pieces = []
+        # Timed until the last token, including the time the client takes to read them
+        with stage_timer("llm_call"):
+            stream = await get_async_client().chat.completions.create(
+                model=model,
+                messages=self._build_messages(question, relevant_chunks),
+                temperature=temperature,
+                max_tokens=1000,
+                stream=True
+            )
+            async for event in stream:
+                record_usage("chat", model, getattr(event, "usage", None))
+                # Azure sends a leading chunk with no choices (content filter results)
+                if event.choices and event.choices[0].delta.content:
+                    pieces.append(event.choices[0].delta.content)
+                    yield {"type": "token", "content": event.choices[0].delta.content}
+        self.store_answer(question, query_embedding, scope, "".join(pieces), chunks, time.perf_counter() - start)
+
+    @staticmethod
+    def _build_messages(question: str, relevant_chunks: List[RetrievedChunk]) -> List[dict]:
+        """Build the chat messages for a question and its retrieved chunks"""
         # Build context from relevant chunks
-        context = "\n\n".join([chunk for chunk, _ in relevant_chunks])
+        context = "\n\n".join([chunk for chunk, _, _, _ in relevant_chunks])
         
         # Create prompt with context
         system_prompt = """You are a helpful assistant that answers questions about breast cancer guidelines and treatment recommendations.
@@ -217,22 +1530,21 @@ Provide evidence-based, clinical guidance based on the S3 Guideline Breast Cance
 Question: {question}
 
 Answer based on the context above:"""
-        
-        # Get response from LLM
-        response = self.chat_client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=temperature,
-            max_tokens=1000
-        )
-        
-        # Format relevant chunks for response
-        chunks_data = [
-            {"text": chunk[:300] + "..." if len(chunk) > 300 else chunk, "similarity": float(score)}
-            for chunk, score in relevant_chunks
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    @staticmethod
+    def _format_chunks(relevant_chunks: List[RetrievedChunk]) -> List[dict]:
+        """Format relevant chunks for response"""
+        return [
+            {
+                "text": chunk[:300] + "..." if len(chunk) > 300 else chunk,
+                "similarity": float(score),
+                "pages": pages,
+                "source": source
+            }
+            for chunk, score, pages, source in relevant_chunks
         ]
-        
-        return response.choices[0].message.content, chunks_data
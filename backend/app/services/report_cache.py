@@ -0,0 +1,114 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+# Set REPORT_CACHE_PATH to an empty string to disable report caching
+DEFAULT_CACHE_PATH = os.getenv("REPORT_CACHE_PATH", "report_cache.sqlite3")
+# Seconds a cached report is served before it is regenerated
+DEFAULT_TTL = float(os.getenv("REPORT_CACHE_TTL", str(7 * 24 * 3600)))
+# Least recently used reports beyond this count are evicted
+DEFAULT_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "10000"))
+
+
+class ReportCache:
+    """
+    Persistent cache of generated clinical reports.
+
+    Reports are generated at temperature 0, so the same prompt gives the same
+    report; the caller derives the key from everything that shapes the prompt
+    (deployment, template version, normalized patient fields). Entries expire
+    after ``ttl`` seconds and the least recently used ones are evicted beyond
+    ``max_entries``. Stored in SQLite so the cache survives restarts and is
+    shared by all workers.
+    """
+
+    def __init__(self, db_path: str, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                key TEXT PRIMARY KEY,
+                deployment TEXT,
+                template_version INTEGER NOT NULL,
+                report TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_last_used ON reports (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (report, age in seconds), or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT report, created_at FROM reports WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM reports WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE reports SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return row[0], now - row[1]
+
+    def put(self, key: str, report: str, deployment: Optional[str], template_version: int) -> None:
+        """Store a report and evict the least recently used beyond max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports (key, deployment, template_version, report, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, deployment, template_version, report, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM reports WHERE key IN "
+                "(SELECT key FROM reports ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Lifetime hit/miss counters and entry count"""
+        lookups = self.hits + self.misses
+        return {
+            "path": self.db_path,
+            "entries": self.count(),
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM reports")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,73 @@
+import os
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.chunking import count_tokens
+
+RERANKERS = ("mmr", "none")
+# Post-retrieval reranking: "mmr" (Maximal Marginal Relevance) or "none" (raw top_k)
+DEFAULT_RERANK = os.getenv("RAG_RERANK", "mmr")
+# Candidates retrieved per requested chunk before reranking
+RERANK_FETCH_FACTOR = int(os.getenv("RAG_RERANK_FETCH_FACTOR", "4"))
+# Weight of relevance against novelty; 1.0 ranks by relevance only
+DEFAULT_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# Token budget for the retrieved context; 0 keeps top_k chunks instead
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "0"))
+
+
+def mmr_order(vectors: np.ndarray, relevance: np.ndarray, k: int,
+              lambda_mult: float = DEFAULT_MMR_LAMBDA) -> List[int]:
+    """
+    Order candidates by Maximal Marginal Relevance and return the first k.
+
+    Each step picks the candidate maximizing
+    ``lambda * relevance - (1 - lambda) * max similarity to those already
+    picked``. ``vectors`` are the candidates' unit-norm embeddings; their
+    pairwise similarities are one (n, n) product, after which every step is
+    O(n) in NumPy.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    similarity = vectors @ vectors.T
+    relevance = np.asarray(relevance, dtype=np.float32)
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    order = []
+    for _ in range(k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        order.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return order
+
+
+def pack_context(texts: Sequence[str], budget: int,
+                 count: Callable[[str], int] = count_tokens) -> List[int]:
+    """
+    Positions of the chunks to send, taken in order while they fit ``budget``
+    tokens. A chunk that does not fit is skipped so a later, shorter one can
+    still use the remaining room. The first chunk is always kept.
+    """
+    selected = []
+    used = 0
+    for position, text in enumerate(texts):
+        tokens = count(text)
+        if selected and used + tokens > budget:
+            continue
+        selected.append(position)
+        used += tokens
+        if used >= budget:
+            break
+    return selected
+
+
+def resolve_rerank(rerank: Optional[str]) -> str:
+    rerank = rerank or DEFAULT_RERANK
+    if rerank not in RERANKERS:
+        raise ValueError(f"rerank must be one of {RERANKERS}, got '{rerank}'")
+    return rerank
@@ -0,0 +1 @@
+"""Offline performance scripts, run with python -m benchmarks.<name> from the backend directory."""
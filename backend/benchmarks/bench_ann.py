@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Recall@k and latency of the RAG vector index backends against exact search.
+
+Uses synthetic clustered unit vectors by default (closer to real embeddings
+than uniform noise), or the vectors of an existing index directory.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ann
+    python -m benchmarks.bench_ann --n 20000 --dim 768 --nprobe 4 8 16 --ef-search 32 64 128
+    python -m benchmarks.bench_ann --index embeddings.index
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.index_store import open_index
+from app.services.rag_service import (
+    BruteForceIndex, IVFFlatIndex, HNSWIndex, normalize_rows
+)
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return normalize_rows(centers[labels] + 0.6 * rng.standard_normal((n, dim), dtype=np.float32))
+
+
+def make_queries(vectors: np.ndarray, count: int, rng) -> np.ndarray:
+    """Perturbed copies of random rows, so each query has real near neighbours"""
+    rows = np.asarray(vectors[rng.choice(len(vectors), size=count, replace=False)], dtype=np.float32)
+    noise = rng.standard_normal(rows.shape, dtype=np.float32) * (0.5 / np.sqrt(rows.shape[1]))
+    return normalize_rows(rows + noise)
+
+
+def evaluate(index, queries, truth, top_k, **params):
+    recalls = []
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        got = {i for i, _ in index.search(query, top_k, **params)}
+        recalls.append(len(got & expected) / len(expected))
+    latency_ms = (time.perf_counter() - start) / len(queries) * 1000
+    return float(np.mean(recalls)), latency_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ANN recall@k vs brute force")
+    parser.add_argument("--index", help="Use the vectors of an existing index directory")
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--skip-hnsw", action="store_true", help="HNSW build is pure Python and slow for large n")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.index:
+        _, vectors, _ = open_index(args.index)
+    else:
+        vectors = clustered_vectors(args.n, args.dim, args.clusters, rng)
+    queries = make_queries(vectors, min(args.queries, len(vectors)), rng)
+    print(f"vectors={vectors.shape} queries={len(queries)} top_k={args.top_k}\n")
+
+    exact = BruteForceIndex(vectors)
+    truth = [{i for i, _ in exact.search(q, args.top_k)} for q in queries]
+    _, flat_ms = evaluate(exact, queries, truth, args.top_k)
+
+    print(f"{'backend':<8} {'param':<14} {'recall@k':>9} {'ms/query':>9} {'speedup':>8}")
+    print("-" * 52)
+    print(f"{'flat':<8} {'-':<14} {1.0:>9.3f} {flat_ms:>9.3f} {1.0:>7.1f}x")
+
+    start = time.perf_counter()
+    ivf = IVFFlatIndex(vectors).build()
+    print(f"  (ivf build {time.perf_counter() - start:.1f}s, nlist={len(ivf.centroids)})")
+    for nprobe in args.nprobe:
+        recall, ms = evaluate(ivf, queries, truth, args.top_k, nprobe=nprobe)
+        print(f"{'ivf':<8} {'nprobe=' + str(nprobe):<14} {recall:>9.3f} {ms:>9.3f} {flat_ms / ms:>7.1f}x")
+
+    if not args.skip_hnsw:
+        start = time.perf_counter()
+        hnsw = HNSWIndex(vectors).build()
+        print(f"  (hnsw build {time.perf_counter() - start:.1f}s, levels={len(hnsw.adjacency)})")
+        for ef in args.ef_search:
+            recall, ms = evaluate(hnsw, queries, truth, args.top_k, ef_search=ef)
+            print(f"{'hnsw':<8} {'ef_search=' + str(ef):<14} {recall:>9.3f} {ms:>9.3f} {flat_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+/fallnummer lookup throughput: the previous per-request DataFrame scan vs
+the CaseStore hash index, on synthetic Tumorboard-like tables.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_case_lookup
+    python -m benchmarks.bench_case_lookup --rows 1000 100000 1000000 --lookups 20000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.excel_service import CaseStore
+
+DIAGNOSES = ("Breast carcinoma left", "Breast carcinoma right", "DCIS", "Kidney tumor", "Lobular carcinoma")
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Columns and dtypes shaped like Tumorboard_final_eng.xlsx, short texts"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, rows), unit="D")
+    curative = rng.integers(0, 2, rows)
+    uicc = np.array(["IA", "IB", "IIA", "IIB", "IIIA", "IV", None], dtype=object)[rng.integers(0, 7, rows)]
+    return pd.DataFrame({
+        "Case number": np.arange(10_000_000, 10_000_000 + rows) * 7 % 90_000_000,
+        "G": np.where(rng.integers(0, 2, rows) == 1, "W", "M"),
+        "Date": dates,
+        "Tumor diagnosis": np.array(DIAGNOSES, dtype=object)[rng.integers(0, len(DIAGNOSES), rows)],
+        "Staging Clinic UICC": uicc,
+        "Question": "Adjuvant therapy? Radiotherapy after breast-conserving surgery?",
+        "curative": curative,
+        "palliative": 1 - curative,
+        "Old": rng.integers(25, 95, rows),
+    })
+
+
+def legacy_lookup(frame: pd.DataFrame, fallnummer: str):
+    """The previous ExcelService.get_data_by_fallnummer"""
+    possible_columns = ['Case number', 'Fallnummer', 'fallnummer', 'Fall-Nr', 'Fall Nr', 'Case Number', 'Case_Number']
+    column = next((col for col in possible_columns if col in frame.columns), frame.columns[0])
+    matching_rows = frame[frame[column].astype(str) == str(fallnummer)]
+    if matching_rows.empty:
+        return None
+    result = matching_rows.iloc[0].to_dict()
+    for key, value in result.items():
+        if pd.isna(value):
+            result[key] = None
+    return result
+
+
+def throughput(fn, keys, budget_s: float) -> float:
+    """Lookups per second, stopping early once the time budget is used"""
+    start = time.perf_counter()
+    done = 0
+    for key in keys:
+        fn(key)
+        done += 1
+        if time.perf_counter() - start > budget_s:
+            break
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark case number lookups")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--legacy-budget", type=float, default=5.0, help="Seconds spent on the slow path per size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    print(f"{'rows':>9} {'build s':>8} {'legacy/s':>10} {'index/s':>11} {'json/s':>11} {'speedup':>9}")
+    print("-" * 63)
+    for rows in args.rows:
+        frame = synthetic_frame(rows)
+        keys = [str(k) for k in frame["Case number"].to_numpy()[rng.integers(0, rows, args.lookups)]]
+
+        start = time.perf_counter()
+        store = CaseStore(frame)
+        build_s = time.perf_counter() - start
+
+        for key in keys[:50]:
+            if store.get(key) is None or store.get(key)["Case number"] != legacy_lookup(frame, key)["Case number"]:
+                raise SystemExit(f"lookup mismatch for {key}")
+
+        legacy = throughput(lambda key: legacy_lookup(frame, key), keys, args.legacy_budget)
+        indexed = throughput(store.get, keys, 60)
+        serialized = throughput(store.get_json, keys, 60)
+        print(f"{rows:>9} {build_s:>8.2f} {legacy:>10.1f} {indexed:>11.0f} {serialized:>11.0f} {indexed / legacy:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Workbook load time: pd.read_excel (openpyxl) vs the columnar snapshot cache.
+
+Writes a synthetic Tumorboard-like workbook (200k rows by default), then
+times the first load (parse + snapshot write), later loads from the Arrow
+snapshot and, for comparison, from the pickle fallback. Checks that every
+case record is identical whichever way the data was loaded.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_excel_startup
+    python -m benchmarks.bench_excel_startup --rows 50000 --repeat 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.services import excel_snapshot
+from app.services.excel_service import CaseStore
+from benchmarks.bench_case_lookup import synthetic_frame
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def best_of(fn, repeat: int):
+    return min(timed(fn)[1] for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark workbook startup load")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, "Tumorboard_synthetic.xlsx")
+        cache_dir = os.path.join(tmp, "excel_cache")
+        _, write_s = timed(lambda: synthetic_frame(args.rows).to_excel(excel_path, index=False))
+        print(f"rows={args.rows} xlsx={os.path.getsize(excel_path) / 1e6:.1f} MB (written in {write_s:.1f}s)\n")
+
+        (frame, source), first_s = timed(lambda: excel_snapshot.read_excel_cached(excel_path, cache_dir))
+        assert source == "xlsx"
+        snapshot = os.listdir(cache_dir)[0]
+        parse_s = best_of(lambda: excel_snapshot.read_excel_cached(excel_path, None), 1)
+        cached, source = excel_snapshot.read_excel_cached(excel_path, cache_dir)
+        assert source == "snapshot"
+        arrow_s = best_of(lambda: excel_snapshot.read_excel_cached(excel_path, cache_dir), args.repeat)
+
+        pickle_path = os.path.join(tmp, "snapshot.pkl")
+        frame.to_pickle(pickle_path)
+        pickle_s = best_of(lambda: excel_snapshot.read_snapshot(pickle_path), args.repeat)
+
+        if CaseStore(frame).records != CaseStore(cached).records:
+            raise SystemExit("records loaded from the snapshot differ from the xlsx")
+
+        print(f"{'load':<32} {'seconds':>8} {'speedup':>8}")
+        print("-" * 50)
+        print(f"{'read_excel (openpyxl)':<32} {parse_s:>8.2f} {1.0:>7.1f}x")
+        print(f"{'first start (parse + snapshot)':<32} {first_s:>8.2f} {parse_s / first_s:>7.1f}x")
+        print(f"{'snapshot: ' + os.path.splitext(snapshot)[1]:<32} {arrow_s:>8.3f} {parse_s / arrow_s:>7.1f}x")
+        print(f"{'snapshot: .pkl (no pyarrow)':<32} {pickle_s:>8.3f} {parse_s / pickle_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: guideline-grounded report in one call vs report plus manual RAG questions.
+
+Starts the fake Azure OpenAI server (chat completions sleep --llm-latency-ms)
+in a separate process and the API on a background thread, indexes a
+synthetic guideline and then, for --cases cases from the workbook, compares
+
+- the manual flow: /getCombinedReport followed by one /queryRAG per question
+  a board member would ask about the case (the queries the pipeline derives),
+  one after another
+- /getCombinedReport/grounded: derived queries retrieved concurrently, one
+  completion
+
+and prints the per-stage timings reported by the grounded endpoint.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_grounded_report
+    python -m benchmarks.bench_grounded_report --cases 10 --llm-latency-ms 2000 --retrieval-mode hybrid
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.fake_openai_server import BackgroundServer
+from benchmarks.load_fallnummer_latency import start_fake_server
+from benchmarks.synthetic_pdf import write_guideline_pdf
+
+
+async def index_guideline(client, pdf_path):
+    with open(pdf_path, "rb") as f:
+        response = await client.post("/api/v1/indexPDF", files={"file": ("guideline.pdf", f, "application/pdf")})
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = (await client.get(f"/api/v1/indexJobs/{job_id}")).json()
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        await asyncio.sleep(0.1)
+
+
+async def run(base_url, cases, retrieval_mode, pdf_path):
+    from app.services.grounded_report import derive_queries
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        job = await index_guideline(client, pdf_path)
+        print(f"indexed guideline: {job['status']}, {job.get('chunks_total')} chunks\n")
+
+        fallnummers = (await client.get("/api/v1/excel/fallnummers")).json()["fallnummers"]
+        records = []
+        for fallnummer in [str(f) for f in fallnummers]:
+            data = (await client.get(f"/api/v1/fallnummer/{fallnummer}")).json()["data"]
+            try:
+                records.append((fallnummer, data, derive_queries(data)))
+            except ValueError:
+                continue
+            if len(records) == cases:
+                break
+
+        manual_times, grounded_times, round_trips, stages = [], [], [], {}
+        for fallnummer, data, queries in records:
+            # First, so its query embeddings are not already cached
+            start = time.perf_counter()
+            response = await client.post("/api/v1/getCombinedReport/grounded",
+                                         json={"fallnummer": fallnummer, "data": data,
+                                               "retrieval_mode": retrieval_mode})
+            response.raise_for_status()
+            grounded_times.append(time.perf_counter() - start)
+            for stage, ms in response.json()["timings"].items():
+                stages.setdefault(stage, []).append(ms)
+
+            start = time.perf_counter()
+            (await client.post("/api/v1/getCombinedReport",
+                               json={"fallnummer": fallnummer, "data": data})).raise_for_status()
+            for question in queries:
+                (await client.post("/api/v1/queryRAG",
+                                   json={"question": question, "retrieval_mode": retrieval_mode})).raise_for_status()
+            manual_times.append(time.perf_counter() - start)
+            round_trips.append(1 + len(queries))
+
+        manual, grounded = statistics.median(manual_times), statistics.median(grounded_times)
+        print(f"{'manual report + /queryRAG':<30} median {manual:6.2f}s per case "
+              f"({statistics.mean(round_trips):.1f} completions)")
+        print(f"{'/getCombinedReport/grounded':<30} median {grounded:6.2f}s per case (1 completion)")
+        print(f"speedup x{manual / grounded:.1f}\n")
+        print("grounded stages (median ms): " + ", ".join(
+            f"{stage.replace('_ms', '')}={statistics.median(values):.1f}" for stage, values in stages.items()
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grounded report vs report plus manual RAG questions")
+    parser.add_argument("--cases", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=1000)
+    parser.add_argument("--retrieval-mode", choices=["dense", "lexical", "hybrid"], default="dense")
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--fake-port", type=int, default=8099)
+    parser.add_argument("--api-port", type=int, default=8014)
+    args = parser.parse_args()
+
+    fake_process = start_fake_server(args.fake_port, args.llm_latency_ms)
+    try:
+        os.environ.update(
+            AZURE_OPENAI_ENDPOINT=f"http://127.0.0.1:{args.fake_port}",
+            AZURE_OPENAI_API_KEY="fake",
+            OPENAI_API_VERSION="2025-01-01-preview",
+            OPENAI_DEPLOYMENT_NAME="gpt-4o-mini",
+            EMBEDDING_CACHE_PATH="",
+            REPORT_CACHE_PATH="",
+            RAG_ANSWER_CACHE_SIZE="0",
+            EXCEL_RELOAD_INTERVAL="0",
+        )
+        # Keep index files created by the run out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="agathon-grounded-"))
+        write_guideline_pdf("guideline.pdf", args.sections)
+
+        from app.main import app
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+        print(f"cases={args.cases} llm_latency={args.llm_latency_ms:.0f}ms retrieval_mode={args.retrieval_mode}")
+        with BackgroundServer(app, args.api_port) as api_server:
+            asyncio.run(run(api_server.url, args.cases, args.retrieval_mode, "guideline.pdf"))
+    finally:
+        fake_process.terminate()
+        fake_process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the BM25 lexical index.
+
+Builds BM25Index over synthetic guideline-like chunks (a vocabulary of
+generic words plus clinical tokens such as "pT1a", "ypN0", "CDK4/6") and
+reports build time, on-disk size and query latency, next to a dense
+flat scan over the same number of chunks for reference. The dense numbers
+exclude the query embedding request, which lexical mode does not need.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_lexical
+    python -m benchmarks.bench_lexical --sizes 1000 10000 50000 --dim 3072
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.lexical_index import BM25Index
+from app.services.rag_service import normalize_rows, top_k_similar
+
+CLINICAL_TOKENS = ["pT1a", "pT2", "ypN0", "cN1", "M0", "G3", "CDK4/6", "HER2+", "HER2-positive", "Ki-67",
+                   "trastuzumab", "pertuzumab", "tamoxifen", "letrozole", "abemaciclib", "olaparib", "5-FU"]
+QUERIES = ["adjuvant therapy HER2+ early stage", "CDK4/6 inhibitor abemaciclib", "ypN0 after neoadjuvant",
+           "pT1a sentinel node", "Ki-67 endocrine therapy letrozole"]
+
+
+def synthetic_chunks(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(5000)] + ["adjuvant", "therapy", "early", "stage", "inhibitor",
+                                                 "sentinel", "node", "endocrine", "neoadjuvant", "after"]
+    chunks = []
+    for _ in range(n):
+        tokens = [rng.choice(words) for _ in range(150)]
+        tokens += rng.sample(CLINICAL_TOKENS, 3)
+        rng.shuffle(tokens)
+        chunks.append(" ".join(tokens))
+    return chunks
+
+
+def time_queries(fn, repeats: int) -> float:
+    """Median milliseconds per call over all QUERIES, repeated"""
+    samples = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            start = time.perf_counter()
+            fn(query)
+            samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1000
+
+
+def run(sizes, dim, top_k, repeats, seed):
+    print(f"top_k={top_k} dense dim={dim}")
+    print(f"{'chunks':>8} | {'build s':>8} | {'disk MB':>8} | {'bm25 ms':>8} | {'dense ms':>9}")
+    print("-" * 54)
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        chunks = synthetic_chunks(n, seed)
+        start = time.perf_counter()
+        index = BM25Index.build(chunks)
+        build = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory)
+            size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+            loaded = BM25Index.load(directory, n)
+            lexical_ms = time_queries(lambda q: loaded.search(q, top_k), repeats)
+
+        vectors = normalize_rows(rng.standard_normal((n, dim), dtype=np.float32))
+        queries = normalize_rows(rng.standard_normal((len(QUERIES), dim), dtype=np.float32))
+        dense_ms = time_queries(lambda q: top_k_similar(vectors, queries[QUERIES.index(q)], top_k), repeats)
+
+        print(f"{n:>8} | {build:>8.2f} | {size / 1e6:>8.2f} | {lexical_ms:>8.3f} | {dense_ms:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 lexical index benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.top_k, args.repeats, args.seed)
+
+
+if __name__ == "__main__":
+    main()
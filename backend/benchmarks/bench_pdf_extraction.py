@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+PDF text extraction throughput: the old single-core ``text +=`` loop vs the
+page generator in-process and fanned out over a process pool.
+
+Also checks that the streaming page chunker produces exactly the chunks of
+RAGSystem.chunk_text on the joined text.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pdf_extraction
+    python -m benchmarks.bench_pdf_extraction --pages 1000 --workers 2 4 8
+    python -m benchmarks.bench_pdf_extraction --pdf ../asset/S3_Guideline_Breast_Cancer.pdf
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import PyPDF2
+
+from app.services.pdf_extraction import extract_pages, chunk_pages, count_pages
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def legacy_extract(pdf_path: str) -> str:
+    """The previous extract_text_from_pdf"""
+    text = ""
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            text += page.extract_text() + "\n"
+    return text
+
+
+def legacy_chunks(text: str, chunk_size: int, overlap: int) -> list:
+    """The previous chunk_text"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunks.append(text[start:start + chunk_size])
+        start += chunk_size - overlap
+    return chunks
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction")
+    parser.add_argument("--pdf", help="Use an existing PDF instead of a synthetic one")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--overlap", type=int, default=150)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or write_synthetic_pdf(os.path.join(tmp, "synthetic.pdf"), args.pages)
+        pages = count_pages(pdf_path)
+        print(f"pdf={pdf_path} pages={pages} cpus={os.cpu_count()}\n")
+
+        baseline_text, baseline_s = timed(lambda: legacy_extract(pdf_path))
+        print(f"{'variant':<22} {'seconds':>8} {'pages/s':>9} {'speedup':>8}")
+        print("-" * 50)
+        print(f"{'legacy text +=':<22} {baseline_s:>8.2f} {pages / baseline_s:>9.1f} {1.0:>7.2f}x")
+
+        variants = [("generator, 1 process", 1)] + [(f"process pool, {n}", n) for n in sorted(set(args.workers)) if n > 1]
+        for label, workers in variants:
+            texts, seconds = timed(lambda: [text for _, text in extract_pages(pdf_path, max_workers=workers)])
+            if "".join(text + "\n" for text in texts) != baseline_text:
+                raise SystemExit(f"{label}: extracted text differs from the legacy implementation")
+            print(f"{label:<22} {seconds:>8.2f} {pages / seconds:>9.1f} {baseline_s / seconds:>7.2f}x")
+
+        expected = legacy_chunks(baseline_text, args.chunk_size, args.overlap)
+        streamed = list(chunk_pages(extract_pages(pdf_path, max_workers=1), args.chunk_size, args.overlap))
+        if [chunk for chunk, _, _ in streamed] != expected:
+            raise SystemExit("chunk_pages output differs from chunk_text")
+        spanning = sum(1 for _, first, last in streamed if last > first)
+        print(f"\n{len(streamed)} chunks identical to chunk_text; {spanning} span a page break")
+
+
+if __name__ == "__main__":
+    main()
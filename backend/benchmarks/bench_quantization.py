@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Memory per chunk, query latency and recall@k of the quantized index storages
+against exact float32 search.
+
+Each configuration is written with write_index into a scratch directory and
+searched through the memory-mapped files, as the API does:
+
+- float32 / float16 / int8 (per-dimension scalar) flat scans
+- binary: 1-bit signs with a Hamming shortlist of top_k x --rescore,
+  rescored against the float32 or int8 vectors
+- Matryoshka truncation to each of --dimensions, float32 and int8
+
+"scan B/chunk" is what a query touches for every chunk (the vectors for flat
+scans, the sign bits for binary); "disk B/chunk" is the whole vector storage.
+
+The synthetic vectors are clustered and carry most of their energy in the
+leading dimensions, like Matryoshka-trained embeddings; truncation recall on
+them is only indicative. Use --index with a real text-embedding-3-large index
+for numbers that hold for the guideline.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_quantization
+    python -m benchmarks.bench_quantization --n 50000 --top-k 10 --rescore 4 10 20 --dimensions 1024 256
+    python -m benchmarks.bench_quantization --index embeddings.index
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.index_store import open_index, write_index, QUANTIZATION_FILE
+from app.services.quantization import fit_dimensions
+from app.services.rag_service import BruteForceIndex, BinaryIndex, normalize_rows
+from benchmarks.bench_ann import make_queries
+
+
+def matryoshka_vectors(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    """Clustered unit vectors whose variance decays along the dimensions"""
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dim), dtype=np.float32)
+    vectors *= (1.0 + np.arange(dim, dtype=np.float32) / 64.0) ** -0.5
+    return normalize_rows(vectors)
+
+
+def evaluate(index, queries, truth, top_k, dim=None):
+    recalls = []
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        got = {i for i, _ in index.search(fit_dimensions(query, dim), top_k)}
+        recalls.append(len(got & expected) / len(expected))
+    latency_ms = (time.perf_counter() - start) / len(queries) * 1000
+    return float(np.mean(recalls)), latency_ms
+
+
+def stored(directory, name, vectors, dtype):
+    """Write an index with the given storage and memory-map it back"""
+    path = os.path.join(directory, f"{name}.index")
+    write_index(path, [""] * len(vectors), vectors, dtype=dtype)
+    _, mapped, _ = open_index(path)
+    disk = os.path.getsize(os.path.join(path, "vectors.npy"))
+    if dtype == "int8":
+        disk += os.path.getsize(os.path.join(path, QUANTIZATION_FILE))
+    return mapped, disk / len(vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized index storage: memory, latency, recall@k")
+    parser.add_argument("--index", help="Use the vectors of an existing index directory")
+    parser.add_argument("--n", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[4, 10, 20])
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1024, 256])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.index:
+        _, vectors, _ = open_index(args.index)
+        vectors = np.asarray(vectors, dtype=np.float32)
+    else:
+        vectors = matryoshka_vectors(args.n, args.dim, args.clusters, rng)
+    queries = make_queries(vectors, min(args.queries, len(vectors)), rng)
+    dim = vectors.shape[1]
+    print(f"vectors={vectors.shape} queries={len(queries)} top_k={args.top_k}\n")
+
+    with tempfile.TemporaryDirectory(prefix="agathon-quant-") as directory:
+        float32, float32_disk = stored(directory, "float32", vectors, "float32")
+        exact = BruteForceIndex(float32)
+        truth = [{i for i, _ in exact.search(q, args.top_k)} for q in queries]
+        _, baseline_ms = evaluate(exact, queries, truth, args.top_k)
+
+        print(f"{'storage':<26} {'scan B/chunk':>12} {'disk B/chunk':>12} {'recall@k':>9} {'ms/query':>9}")
+        print("-" * 72)
+
+        def report(label, index, scan_bytes, disk_bytes, dims=None):
+            recall, ms = evaluate(index, queries, truth, args.top_k, dims)
+            print(f"{label:<26} {scan_bytes:>12.0f} {disk_bytes:>12.0f} {recall:>9.3f} {ms:>9.3f}")
+
+        report("float32", exact, float32_disk, float32_disk)
+        stores = {"float32": (float32, float32_disk)}
+        for dtype in ("float16", "int8"):
+            stores[dtype] = stored(directory, dtype, vectors, dtype)
+            mapped, disk = stores[dtype]
+            report(dtype, BruteForceIndex(mapped), disk, disk)
+
+        for dtype in ("float32", "int8"):
+            mapped, disk = stores[dtype]
+            binary = BinaryIndex(mapped).build()
+            bits = binary.bits.shape[1]
+            for factor in args.rescore:
+                binary.rescore_factor = factor
+                report(f"binary x{factor} + {dtype}", binary, bits, disk + bits)
+
+        for dims in args.dimensions:
+            if dims >= dim:
+                continue
+            truncated = fit_dimensions(vectors, dims)
+            for dtype in ("float32", "int8"):
+                mapped, disk = stored(directory, f"{dtype}-{dims}", truncated, dtype)
+                report(f"{dtype} @ {dims} dims", BruteForceIndex(mapped), disk, disk, dims)
+
+        print(f"\nfloat32 baseline: {baseline_ms:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reports for a whole board session, one request per case vs one batch.
+
+Starts the fake Azure OpenAI server (chat completions sleep --llm-latency-ms)
+in a separate process and the API on a background thread, then generates
+--cases reports twice: one /getCombinedReport call after another, as the
+frontend does today, and once through /getCombinedReport/batch. With enough
+concurrency the batch should take about as long as the slowest single report.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_report_batch
+    python -m benchmarks.bench_report_batch --cases 30 --llm-latency-ms 1500 --max-concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.fake_openai_server import BackgroundServer
+from benchmarks.load_fallnummer_latency import start_fake_server
+
+
+async def run(base_url, cases, max_concurrency):
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        fallnummers = (await client.get("/api/v1/excel/fallnummers")).json()["fallnummers"]
+        fallnummers = [str(f) for f in (fallnummers * cases)[:cases]]
+
+        # Warm-up so connection setup is not attributed to either run
+        (await client.post("/api/v1/getCombinedReport/batch",
+                           json={"fallnummers": fallnummers[:1]})).raise_for_status()
+
+        start = time.perf_counter()
+        for fallnummer in fallnummers:
+            data = (await client.get(f"/api/v1/fallnummer/{fallnummer}")).json()["data"]
+            (await client.post("/api/v1/getCombinedReport",
+                               json={"fallnummer": fallnummer, "data": data})).raise_for_status()
+        serial = time.perf_counter() - start
+        print(f"{'serial /getCombinedReport':<28} {serial:7.2f}s  ({serial / cases:.2f}s per case)")
+
+        start = time.perf_counter()
+        first = None
+        done = None
+        async with client.stream("POST", "/api/v1/getCombinedReport/batch",
+                                 json={"fallnummers": fallnummers, "max_concurrency": max_concurrency}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if first is None:
+                    first = time.perf_counter() - start
+                if record["type"] == "done":
+                    done = record
+        batch = time.perf_counter() - start
+        print(f"{'/getCombinedReport/batch':<28} {batch:7.2f}s  (first report after {first:.2f}s, "
+              f"{done['completed']} completed, {done['failed']} failed)")
+        print(f"speedup x{serial / batch:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs batch report generation")
+    parser.add_argument("--cases", type=int, default=30)
+    parser.add_argument("--llm-latency-ms", type=float, default=1000)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--fake-port", type=int, default=8099)
+    parser.add_argument("--api-port", type=int, default=8012)
+    args = parser.parse_args()
+
+    fake_process = start_fake_server(args.fake_port, args.llm_latency_ms)
+    try:
+        os.environ.update(
+            AZURE_OPENAI_ENDPOINT=f"http://127.0.0.1:{args.fake_port}",
+            AZURE_OPENAI_API_KEY="fake",
+            OPENAI_API_VERSION="2025-01-01-preview",
+            OPENAI_DEPLOYMENT_NAME="gpt-4o-mini",
+            EMBEDDING_CACHE_PATH="",
+            REPORT_CACHE_PATH="",
+            EXCEL_RELOAD_INTERVAL="0",
+        )
+        # Keep index files created at startup out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="agathon-batch-"))
+
+        from app.main import app
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+        print(f"cases={args.cases} llm_latency={args.llm_latency_ms:.0f}ms "
+              f"max_concurrency={args.max_concurrency}\n")
+        with BackgroundServer(app, args.api_port) as api_server:
+            asyncio.run(run(api_server.url, args.cases, args.max_concurrency))
+    finally:
+        fake_process.terminate()
+        fake_process.wait()
+
+
+if __name__ == "__main__":
+    main()
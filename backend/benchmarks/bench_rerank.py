@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Cost and effect of the MMR rerank stage.
+
+Builds a synthetic index in which neighbouring chunks are near-duplicates,
+like the overlapping windows of the character chunker: each embedding is
+the previous one plus a little noise. Queries are noisy copies of random
+chunks, so plain top-k returns a run of adjacent chunks. Reports per
+top_k the latency of exact search alone and with the rerank stage
+(over-fetch, candidate vectors, MMR), the mean pairwise similarity of the
+chunks that would go into the prompt and how many of them are adjacent
+to another selected chunk.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_rerank
+    python -m benchmarks.bench_rerank --chunks 20000 --dim 3072 --top-k 3 5 10 --lambda 0.5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.rag_service import IndexSnapshot, normalize_rows, search_snapshots, candidate_vectors
+from app.services.reranking import mmr_order, pack_context, RERANK_FETCH_FACTOR
+
+
+def overlapping_embeddings(n: int, dim: int, drift: float, rng) -> np.ndarray:
+    vectors = np.empty((n, dim), dtype=np.float32)
+    current = rng.standard_normal(dim).astype(np.float32)
+    for i in range(n):
+        if i % 200 == 0:
+            # New section: unrelated to the previous chunk
+            current = rng.standard_normal(dim).astype(np.float32)
+        current = current + drift * rng.standard_normal(dim).astype(np.float32)
+        vectors[i] = current
+    return normalize_rows(vectors)
+
+
+def redundancy(snapshot: IndexSnapshot, ids) -> tuple:
+    """(mean pairwise cosine, selected chunks adjacent to another selected chunk)"""
+    vectors = np.asarray(snapshot.embeddings[ids], dtype=np.float32)
+    pairs = vectors @ vectors.T
+    k = len(ids)
+    mean = (pairs.sum() - k) / (k * (k - 1)) if k > 1 else 0.0
+    adjacent = sum(any(abs(a - b) == 1 for b in ids if b != a) for a in ids)
+    return float(mean), adjacent
+
+
+def run(chunks, dim, top_ks, queries, lambda_mult, seed):
+    rng = np.random.default_rng(seed)
+    snapshot = IndexSnapshot([f"chunk {i}" for i in range(chunks)],
+                             overlapping_embeddings(chunks, dim, 0.35, rng))
+    targets = rng.integers(0, chunks, queries)
+    query_vectors = normalize_rows(
+        np.asarray(snapshot.embeddings[targets], dtype=np.float32) + 0.05 * rng.standard_normal((queries, dim))
+    )
+    print(f"chunks={chunks} dim={dim} queries={queries} lambda={lambda_mult} fetch={RERANK_FETCH_FACTOR}x top_k\n")
+    print(f"{'top_k':>5} | {'search ms':>9} | {'+rerank ms':>10} | {'stage ms':>8} | "
+          f"{'sim top-k':>9} | {'sim mmr':>7} | {'adj top-k':>9} | {'adj mmr':>7}")
+    print("-" * 86)
+    for top_k in top_ks:
+        plain_times, rerank_times, stage_times = [], [], []
+        plain_stats, mmr_stats = [], []
+        for query in query_vectors:
+            start = time.perf_counter()
+            hits = search_snapshots([snapshot], query, top_k)
+            plain_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            pool = search_snapshots([snapshot], query, top_k * RERANK_FETCH_FACTOR)
+            searched = time.perf_counter()
+            order = mmr_order(candidate_vectors([snapshot], pool), [score for _, _, score in pool], top_k, lambda_mult)
+            selected = [pool[j] for j in order]
+            end = time.perf_counter()
+            rerank_times.append(end - start)
+            stage_times.append(end - searched)
+
+            plain_stats.append(redundancy(snapshot, [i for _, i, _ in hits]))
+            mmr_stats.append(redundancy(snapshot, [i for _, i, _ in selected]))
+
+        plain_stats, mmr_stats = np.array(plain_stats), np.array(mmr_stats)
+        print(f"{top_k:>5} | {np.median(plain_times) * 1000:>9.3f} | {np.median(rerank_times) * 1000:>10.3f} | "
+              f"{np.median(stage_times) * 1000:>8.3f} | {plain_stats[:, 0].mean():>9.3f} | {mmr_stats[:, 0].mean():>7.3f} | "
+              f"{plain_stats[:, 1].mean():>9.2f} | {mmr_stats[:, 1].mean():>7.2f}")
+
+    texts = ["word " * 300] * 40
+    start = time.perf_counter()
+    for _ in range(100):
+        pack_context(texts, 1200)
+    print(f"\npack_context over 40 chunks of ~300 tokens: {(time.perf_counter() - start) * 10:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MMR rerank stage benchmark")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--lambda", dest="lambda_mult", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.chunks, args.dim, args.top_k, args.queries, args.lambda_mult, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time from process start to a ready API.
+
+Writes a synthetic RAG index (--chunks x --dim) into a scratch directory and
+starts uvicorn there --runs times, once per warm-up mode. For each start it
+records when the first request is answered and when /health/ready turns
+200, and prints the import-to-ready time and per-service warm-up seconds the
+app reports. No Azure OpenAI calls are made at startup, so no server is
+needed.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --chunks 50000 --runs 5 --modes blocking background
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from app.services.index_store import write_index
+from app.services.rag_service import normalize_rows
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_synthetic_index(directory: str, chunks: int, dim: int) -> None:
+    rng = np.random.default_rng(0)
+    texts = [f"Synthetic guideline chunk {i} about adjuvant therapy and staging." for i in range(chunks)]
+    write_index(os.path.join(directory, "embeddings.index"), texts,
+                normalize_rows(rng.standard_normal((chunks, dim)).astype(np.float32)),
+                metadata={"embedding_model": "text-embedding-3-large"})
+
+
+def start_once(directory: str, port: int, mode: str) -> dict:
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND_DIR,
+        STARTUP_WARMUP=mode,
+        AZURE_OPENAI_ENDPOINT="http://127.0.0.1:9",
+        AZURE_OPENAI_API_KEY="fake",
+        OPENAI_API_VERSION="2025-01-01-preview",
+        OPENAI_DEPLOYMENT_NAME="gpt-4o-mini",
+        EXCEL_RELOAD_INTERVAL="0",
+    )
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {"serving": None, "ready": None, "report": None}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while time.perf_counter() - start < 120:
+                try:
+                    response = client.get("/health/ready")
+                except httpx.HTTPError:
+                    time.sleep(0.01)
+                    continue
+                now = time.perf_counter() - start
+                if result["serving"] is None:
+                    result["serving"] = now
+                if response.status_code == 404:
+                    # Builds without readiness probes are ready once they serve
+                    result["ready"] = now
+                    break
+                if response.status_code == 200:
+                    result["ready"] = now
+                    result["report"] = response.json()
+                    break
+                time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process start to ready API")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=["blocking", "background"])
+    parser.add_argument("--port", type=int, default=8015)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="agathon-startup-") as directory:
+        write_synthetic_index(directory, args.chunks, args.dim)
+        print(f"index: {args.chunks} x {args.dim}, {args.runs} runs per mode\n")
+        # One untimed start writes the workbook snapshot and warms the page cache
+        start_once(directory, args.port, args.modes[0])
+        for mode in args.modes:
+            results = [start_once(directory, args.port, mode) for _ in range(args.runs)]
+            serving = statistics.median(r["serving"] for r in results)
+            ready = statistics.median(r["ready"] for r in results)
+            print(f"{mode:<10} first response {serving:6.2f}s   ready {ready:6.2f}s")
+            report = results[-1]["report"]
+            if report:
+                services = ", ".join(f"{name} {info['seconds']}s" for name, info in report["services"].items())
+                print(f"{'':<10} import-to-ready {report['import_to_ready_seconds']}s, "
+                      f"warm-up {report['warm_up_seconds']}s ({services})")
+
+
+if __name__ == "__main__":
+    main()
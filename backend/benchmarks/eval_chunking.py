@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Offline retrieval eval: character-window chunks vs structure-aware chunks.
+
+Chunks the same PDF with each chunker, indexes the chunks with BM25 (no
+embeddings requests, so the eval runs offline and is deterministic) and
+for every question checks whether a top-k chunk contains the complete
+answer sentence. Also reports the prompt tokens the top-k chunks would add
+to the completion request.
+
+By default a synthetic guideline with recommendation boxes, evidence rows
+and background prose is generated. For the real guideline pass --pdf and
+a JSONL file of {"question": ..., "answer": ...} lines, where answer is a
+sentence copied from the PDF.
+
+Usage (from the backend directory):
+    python -m benchmarks.eval_chunking
+    python -m benchmarks.eval_chunking --sections 80 --top-k 5
+    python -m benchmarks.eval_chunking --pdf ../asset/S3_Guideline_Breast_Cancer.pdf --queries queries.jsonl
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from app.services.chunking import chunk_document, count_tokens, tiktoken
+from app.services.lexical_index import BM25Index
+from app.services.pdf_extraction import extract_pages
+from benchmarks.synthetic_pdf import write_guideline_pdf
+
+CONFIGS = [
+    ("chars", 1000, 200),
+    ("structure", 300, 50),
+    ("structure", 500, 80),
+]
+
+
+def squash(text: str) -> str:
+    """Compare text ignoring whitespace and line-break hyphenation"""
+    return "".join(text.split()).replace("-", "").lower()
+
+
+def load_queries(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [(q["question"], q["answer"]) for q in map(json.loads, f) if q]
+
+
+def evaluate(pages, pairs, chunker, chunk_size, overlap, top_k):
+    start = time.perf_counter()
+    chunks = [text for text, _, _ in chunk_document(pages, chunker, chunk_size, overlap)]
+    seconds = time.perf_counter() - start
+    tokens = [count_tokens(chunk) for chunk in chunks]
+    squashed = [squash(chunk) for chunk in chunks]
+    index = BM25Index.build(chunks)
+
+    hits = [0] * top_k
+    prompt_tokens = 0
+    for question, answer in pairs:
+        results = index.search(question, top_k)
+        target = squash(answer)
+        for rank, (i, _) in enumerate(results):
+            if target in squashed[i]:
+                for k in range(rank, top_k):
+                    hits[k] += 1
+                break
+        prompt_tokens += sum(tokens[i] for i, _ in results)
+
+    n = len(pairs)
+    split = sum(not any(squash(answer) in chunk for chunk in squashed) for _, answer in pairs)
+    return {
+        "chunks": len(chunks),
+        "avg_tokens": sum(tokens) / len(tokens),
+        "max_tokens": max(tokens),
+        "seconds": seconds,
+        "hit_rate": [h / n for h in hits],
+        "prompt_tokens": prompt_tokens / n,
+        "answers_split": split / n,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunker retrieval eval")
+    parser.add_argument("--pdf", help="PDF to chunk (default: synthetic guideline)")
+    parser.add_argument("--queries", help="JSONL of question/answer pairs for --pdf")
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if bool(args.pdf) != bool(args.queries):
+        parser.error("--pdf and --queries go together")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.pdf:
+            pdf_path, pairs = args.pdf, load_queries(args.queries)
+        else:
+            pdf_path = os.path.join(tmp, "guideline.pdf")
+            pairs = write_guideline_pdf(pdf_path, args.sections, seed=args.seed)
+        pages = list(extract_pages(pdf_path))
+
+    print(f"{len(pages)} pages, {len(pairs)} questions, top_k={args.top_k}, "
+          f"tokens {'cl100k (tiktoken)' if tiktoken else 'estimated'}\n")
+    hit_columns = " | ".join(f"{f'hit@{k}':>6}" for k in range(1, args.top_k + 1))
+    header = (f"{'chunker':<18} | {'chunks':>6} | {'avg tok':>7} | {'max tok':>7} | {'split':>6} | "
+              f"{hit_columns} | {'prompt tok':>10} | {'chunk s':>7}")
+    print(header)
+    print("-" * len(header))
+    for chunker, size, overlap in CONFIGS:
+        result = evaluate(pages, pairs, chunker, size, overlap, args.top_k)
+        hit_rates = " | ".join(f"{rate:>6.1%}" for rate in result["hit_rate"])
+        print(f"{f'{chunker} {size}/{overlap}':<18} | {result['chunks']:>6} | {result['avg_tokens']:>7.0f} | "
+              f"{result['max_tokens']:>7} | {result['answers_split']:>6.1%} | {hit_rates} | "
+              f"{result['prompt_tokens']:>10.0f} | {result['seconds']:>7.3f}")
+    print("\nsplit = answer sentence not contained whole in any chunk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Azure OpenAI embeddings and chat completions endpoints.
+
+Injects latency, 429 throttling (with Retry-After) and transient 5xx errors so
+the embedding pipeline can be exercised without a real deployment. Vectors are
+derived from a hash of each input, so callers can verify ordering. Chat
+completions sleep for --chat-latency-ms to stand in for a slow LLM; with
+"stream": true the answer is spread over that time as SSE chunks.
+
+Run standalone (from the backend directory):
+    python -m benchmarks.fake_openai_server --port 8099 --latency-ms 200 --throttle-every 5
+
+Then point the app at it:
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8099 AZURE_OPENAI_API_KEY=fake ...
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def fake_embedding(text: str, dim: int) -> list:
+    """Deterministic unit vector for a text"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_app(latency_ms: float = 100, jitter_ms: float = 50, throttle_every: int = 0,
+               retry_after: float = 0.5, error_rate: float = 0.0, dim: int = 256,
+               chat_latency_ms: float = 2000, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Fake Azure OpenAI")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "throttled": 0, "errors": 0, "inputs": 0, "in_flight": 0, "max_in_flight": 0,
+             "chat_requests": 0}
+    app.state.stats = stats
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(deployment: str, request: Request):
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep((latency_ms + rng.uniform(0, jitter_ms)) / 1000)
+
+            if throttle_every and stats["requests"] % throttle_every == 0:
+                stats["throttled"] += 1
+                return JSONResponse(
+                    status_code=429,
+                    headers={"Retry-After": str(retry_after)},
+                    content={"error": {"code": "429", "message": "Rate limit exceeded (fake)"}},
+                )
+            if error_rate and rng.random() < error_rate:
+                stats["errors"] += 1
+                return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable (fake)"}})
+
+            body = await request.json()
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            stats["inputs"] += len(inputs)
+            data = [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text, dim)}
+                for i, text in enumerate(inputs)
+            ]
+            # Return items out of order to prove the client reassembles by index
+            rng.shuffle(data)
+            return {
+                "object": "list",
+                "data": data,
+                "model": deployment,
+                "usage": {"prompt_tokens": sum(len(t) // 4 for t in inputs),
+                          "total_tokens": sum(len(t) // 4 for t in inputs)},
+            }
+        finally:
+            stats["in_flight"] -= 1
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        stats["chat_requests"] += 1
+        body = await request.json()
+        question = body["messages"][-1]["content"]
+        answer = f"Fake answer from {deployment} for a prompt of {len(question)} characters."
+        completion_id = f"chatcmpl-fake-{stats['chat_requests']}"
+
+        if body.get("stream"):
+            words = answer.split(" ")
+
+            async def chunks():
+                for i, word in enumerate(words):
+                    await asyncio.sleep(chat_latency_ms / 1000 / len(words))
+                    delta = {"content": word if i == 0 else " " + word}
+                    if i == 0:
+                        delta["role"] = "assistant"
+                    payload = {"id": completion_id, "object": "chat.completion.chunk",
+                               "created": int(time.time()), "model": deployment,
+                               "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                    yield f"data: {json.dumps(payload)}\n\n"
+                final = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": deployment, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+
+        await asyncio.sleep(chat_latency_ms / 1000)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": len(question) // 4, "completion_tokens": len(answer) // 4,
+                      "total_tokens": (len(question) + len(answer)) // 4},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+class BackgroundServer:
+    """Run a FastAPI app with uvicorn on a background thread"""
+
+    def __init__(self, app: FastAPI, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Azure OpenAI embeddings server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--throttle-every", type=int, default=0, help="Return 429 for every Nth request (0 = never)")
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 503 response")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--chat-latency-ms", type=float, default=2000)
+    args = parser.parse_args()
+    app = create_app(args.latency_ms, args.jitter_ms, args.throttle_every,
+                     args.retry_after, args.error_rate, args.dim, args.chat_latency_ms)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
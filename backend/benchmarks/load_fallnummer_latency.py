@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Load test: /fallnummer latency while report generation runs against a slow LLM.
+
+Starts the fake Azure OpenAI server (chat completions sleep --llm-latency-ms)
+in a separate process and the API itself on a background thread, fires --reports concurrent /getCombinedReport requests,
+and meanwhile polls /fallnummer/{id}. With the async OpenAI path the lookup
+p99 should stay close to the idle baseline; --blocking patches the route back
+to the synchronous client to show the old behaviour.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_fallnummer_latency
+    python -m benchmarks.load_fallnummer_latency --reports 20 --llm-latency-ms 3000 --blocking
+"""
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_openai_server import BackgroundServer
+
+
+def start_fake_server(port: int, chat_latency_ms: float) -> subprocess.Popen:
+    """Run the fake LLM in its own process so it does not share our GIL"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai_server", "--port", str(port),
+         "--chat-latency-ms", str(chat_latency_ms)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Fake OpenAI server did not start")
+
+
+def percentiles(samples_ms):
+    values = np.asarray(samples_ms)
+    return {p: float(np.percentile(values, p)) for p in (50, 90, 99)} | {"max": float(values.max())}
+
+
+def report(label, samples_ms):
+    stats = percentiles(samples_ms)
+    print(f"{label:<26} n={len(samples_ms):<5} p50={stats[50]:7.2f}ms  p90={stats[90]:7.2f}ms  "
+          f"p99={stats[99]:8.2f}ms  max={stats['max']:8.2f}ms")
+
+
+async def poll_lookups(client, fallnummer, stop: asyncio.Event, interval: float):
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get(f"/api/v1/fallnummer/{fallnummer}")
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def run(base_url, reports, interval, baseline_requests):
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        fallnummer = (await client.get("/api/v1/excel/fallnummers")).json()["fallnummers"][0]
+        case = (await client.get(f"/api/v1/fallnummer/{fallnummer}")).json()["data"]
+
+        # One warm-up report so one-off costs (connection setup, first response
+        # parse) are not attributed to the steady state
+        (await client.post("/api/v1/getCombinedReport", json={"fallnummer": str(fallnummer), "data": case})).raise_for_status()
+
+        baseline = []
+        for _ in range(baseline_requests):
+            start = time.perf_counter()
+            (await client.get(f"/api/v1/fallnummer/{fallnummer}")).raise_for_status()
+            baseline.append((time.perf_counter() - start) * 1000)
+        report("idle /fallnummer", baseline)
+
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_lookups(client, fallnummer, stop, interval))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/getCombinedReport", json={"fallnummer": str(fallnummer), "data": case})
+            for _ in range(reports)
+        ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        under_load = await poller
+
+        failed = [r.status_code for r in responses if r.status_code != 200]
+        report(f"/fallnummer + {reports} reports", under_load)
+        print(f"{reports} reports finished in {elapsed:.2f}s ({len(failed)} failed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lookup latency under concurrent report generation")
+    parser.add_argument("--reports", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=3000)
+    parser.add_argument("--poll-interval-ms", type=float, default=20)
+    parser.add_argument("--baseline-requests", type=int, default=200)
+    parser.add_argument("--fake-port", type=int, default=8099)
+    parser.add_argument("--api-port", type=int, default=8011)
+    parser.add_argument("--blocking", action="store_true",
+                        help="Call the synchronous OpenAI client inside the async route (pre-change behaviour)")
+    args = parser.parse_args()
+
+    fake_process = start_fake_server(args.fake_port, args.llm_latency_ms)
+    try:
+        os.environ.update(
+            AZURE_OPENAI_ENDPOINT=f"http://127.0.0.1:{args.fake_port}",
+            AZURE_OPENAI_API_KEY="fake",
+            OPENAI_API_VERSION="2025-01-01-preview",
+            OPENAI_DEPLOYMENT_NAME="gpt-4o-mini",
+            EMBEDDING_CACHE_PATH="",
+            REPORT_CACHE_PATH="",
+        )
+        # Keep index files created at startup out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="agathon-load-"))
+
+        from app.main import app
+        from app.services.openai_service import openai_service
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        if args.blocking:
+            async def blocking_report(patient_data):
+                return openai_service.generate_clinical_report(patient_data)
+            openai_service.agenerate_clinical_report = blocking_report
+
+        mode = "blocking sync client" if args.blocking else "async client"
+        print(f"mode={mode} reports={args.reports} llm_latency={args.llm_latency_ms:.0f}ms\n")
+        with BackgroundServer(app, args.api_port) as api_server:
+            asyncio.run(run(api_server.url, args.reports, args.poll_interval_ms / 1000, args.baseline_requests))
+    finally:
+        fake_process.terminate()
+        fake_process.wait()
+
+if __name__ == "__main__":
+    main()
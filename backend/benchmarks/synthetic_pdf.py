@@ -0,0 +1,131 @@
+"""
+Minimal PDF writer for benchmarks: N pages of guideline-like text in
+Helvetica, no dependencies beyond the standard library.
+"""
+import itertools
+import random
+import textwrap
+
+WORDS = ("adjuvant", "endocrine", "therapy", "HER2-positive", "pT1a", "sentinel", "node", "biopsy",
+         "recommendation", "evidence", "level", "consensus", "radiotherapy", "tamoxifen", "aromatase",
+         "inhibitor", "premenopausal", "mastectomy", "breast-conserving", "surgery")
+
+
+def page_lines(page: int, lines: int, words_per_line: int = 12) -> list:
+    return [
+        f"{page + 1}.{line + 1} " + " ".join(
+            WORDS[(page * 7 + line * 3 + word) % len(WORDS)] for word in range(words_per_line)
+        )
+        for line in range(lines)
+    ]
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 45) -> str:
+    """Write a text-only PDF with ``pages`` pages and return its path"""
+    return write_pdf_pages(path, [page_lines(page, lines_per_page) for page in range(pages)])
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf_pages(path: str, pages: list) -> str:
+    """Write a text-only PDF with one page per list of lines and return its path"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        text = " ".join(f"({_escape(line)}) '" for line in lines)
+        stream = f"BT /F1 9 Tf 40 800 Td 11 TL {text} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    objects[1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids)
+                  + b"] /Count %d >>" % len(pages))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
+
+
+CONDITIONS = ("HER2-positive early breast cancer", "triple-negative disease", "hormone receptor-positive tumours",
+              "premenopausal patients", "postmenopausal patients", "BRCA1/2 mutation carriers",
+              "ductal carcinoma in situ", "locally advanced disease", "pT1a pN0 tumours", "ypN0 after neoadjuvant therapy")
+TREATMENTS = ("trastuzumab", "pertuzumab", "tamoxifen", "letrozole", "anastrozole", "abemaciclib", "olaparib",
+              "capecitabine", "whole-breast radiotherapy", "sentinel node biopsy", "axillary dissection",
+              "ovarian function suppression")
+SETTINGS = ("adjuvant", "neoadjuvant", "metastatic", "maintenance")
+DURATIONS = ("six months", "one year", "two years", "three years", "five years", "ten years")
+GRADES = ("A", "B", "0")
+EVIDENCE = ("1a", "1b", "2a", "2b", "3", "4")
+
+
+def guideline_lines(sections: int, recommendations_per_section: int = 4, seed: int = 0,
+                    line_width: int = 95) -> tuple:
+    """
+    Lines of an S3-guideline-like document and its question/answer pairs.
+
+    Each section has a numbered heading and recommendation boxes (statement,
+    grade, evidence and consensus rows) followed by background prose that
+    reuses the same drug and population names, so retrieval has to rank
+    rather than just match. Every recommendation contains one answer sentence
+    unique in the document.
+
+    Returns:
+        (lines, [(question, answer sentence)])
+    """
+    rng = random.Random(seed)
+    # Each recommendation covers a distinct (population, drug, setting) so every question has one answer
+    topics = list(itertools.product(CONDITIONS, TREATMENTS, SETTINGS))
+    if sections * recommendations_per_section > len(topics):
+        raise ValueError(f"at most {len(topics)} recommendations")
+    rng.shuffle(topics)
+    lines = []
+    pairs = []
+    for section in range(1, sections + 1):
+        lines.append(f"{section}.{rng.randint(1, 9)} Therapy recommendations part {section}")
+        for number in range(1, recommendations_per_section + 1):
+            condition, treatment, setting = topics.pop()
+            duration = rng.choice(DURATIONS)
+            trial = f"AGO-{section:02d}{number:02d}"
+            answer = (f"In {condition} {treatment} should be given in the {setting} setting for {duration} "
+                      f"according to trial {trial}.")
+            pairs.append((f"How long should {treatment} be given in the {setting} setting in {condition}?", answer))
+            lines.append(f"Recommendation {section}.{number}")
+            lines.extend(textwrap.wrap(
+                f"{answer} The indication must be discussed in the multidisciplinary tumour board "
+                f"and documented before the start of therapy.", line_width))
+            lines.append(f"Grade of recommendation {rng.choice(GRADES)}")
+            lines.append(f"Level of evidence {rng.choice(EVIDENCE)}")
+            lines.append("Strong consensus")
+            background = " ".join(
+                f"Data on {rng.choice(TREATMENTS)} were reviewed (see Tab. {rng.randint(1, 40)}, e.g. "
+                f"study {rng.randint(100, 999)} vs. placebo). Toxicity and adherence in "
+                f"{rng.choice(CONDITIONS)} were reported inconsistently."
+                for _ in range(rng.randint(4, 12))
+            )
+            lines.extend(textwrap.wrap(background, line_width))
+    return lines, pairs
+
+
+def write_guideline_pdf(path: str, sections: int, lines_per_page: int = 45, seed: int = 0) -> list:
+    """Write a structured guideline-like PDF; return its (question, answer sentence) pairs"""
+    lines, pairs = guideline_lines(sections, seed=seed)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    # Printed page numbers, which the structure chunker drops
+    write_pdf_pages(path, [page + [str(number)] for number, page in enumerate(pages, start=1)])
+    return pairs
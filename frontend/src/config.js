@@ -11,6 +11,8 @@ export const API_ENDPOINTS = {
   getFallnummer: (fallnummer) =>
     `${API_BASE_URL}/api/v1/fallnummer/${fallnummer}`,
   getAllFallnummers: `${API_BASE_URL}/api/v1/excel/fallnummers`,
+  listCases: (params) =>
+    `${API_BASE_URL}/api/v1/excel/cases?${new URLSearchParams(params)}`,
 
   // Combined Report
   getCombinedReport: `${API_BASE_URL}/api/v1/getCombinedReport`,
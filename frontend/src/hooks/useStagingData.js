@@ -24,14 +24,6 @@ export function useStagingData() {
       try {
         setLoading(true);
 
-        // Fetch all Fallnummers
-        const response = await fetch(API_ENDPOINTS.getAllFallnummers);
-        if (!response.ok) {
-          throw new Error(`Failed to fetch Fallnummers: ${response.status}`);
-        }
-
-        const { fallnummers } = await response.json();
-
         // Initialize counters
         const stagingCounts = {
           "Staging clinic cT": {},
@@ -43,33 +35,32 @@ export function useStagingData() {
           "Staging Path M": {},
           "Staging Path UICC": {},
         };
+        const fields = Object.keys(stagingCounts).join(",");
+
+        // Page through all cases, fetching only the staging columns
+        let cursor = null;
+        do {
+          const params = { fields, limit: 500 };
+          if (cursor) params.cursor = cursor;
+
+          const response = await fetch(API_ENDPOINTS.listCases(params));
+          if (!response.ok) {
+            throw new Error(`Failed to fetch cases: ${response.status}`);
+          }
 
-        // Fetch data for each Fallnummer and aggregate staging values
-        for (const fallnummer of fallnummers) {
-          try {
-            const dataResponse = await fetch(
-              API_ENDPOINTS.getFallnummer(fallnummer)
-            );
-            if (dataResponse.ok) {
-              const { data } = await dataResponse.json();
-              if (data) {
-                // Count occurrences of each staging value
-                Object.keys(stagingCounts).forEach((key) => {
-                  const value = data[key];
-                  if (value !== null && value !== undefined && value !== "") {
-                    stagingCounts[key][value] =
-                      (stagingCounts[key][value] || 0) + 1;
-                  }
-                });
+          const page = await response.json();
+          for (const data of page.items) {
+            // Count occurrences of each staging value
+            Object.keys(stagingCounts).forEach((key) => {
+              const value = data[key];
+              if (value !== null && value !== undefined && value !== "") {
+                stagingCounts[key][value] =
+                  (stagingCounts[key][value] || 0) + 1;
               }
-            }
-          } catch (err) {
-            console.warn(
-              `Failed to fetch data for Fallnummer ${fallnummer}:`,
-              err
-            );
+            });
           }
-        }
+          cursor = page.next_cursor;
+        } while (cursor);
 
         setStagingData(stagingCounts);
       } catch (err) {